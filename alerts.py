@@ -0,0 +1,231 @@
+import os
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import requests
+
+from history import holdings_on
+
+""" Alert rules evaluated on every portfolio refresh.
+    Rules live in ALERTS_FILE (see alerts.example.json), for example:
+
+        {"name": "SCHD drift", "symbol": "SCHD", "field": "allocation", "target": 10, "band": 2}
+        {"name": "Drawdown", "field": "drawdown", "op": "<=", "value": -20}
+        {"name": "Cheap", "symbol": ["O", "VICI"], "field": "price_to_fair_value", "op": "<", "value": 0.9}
+
+    A rule without a symbol applies to every holding. Rule names (or an "id" when given)
+    must be unique, they key the alert state. All rules are compiled to arrays
+    (field, operator, bounds, symbols) and checked against a fields x symbols matrix of
+    the refreshed holdings in one pass. Alerts are edge triggered: the (rule, symbol)
+    pairs that were firing are kept in ALERTS_STATE_FILE and only alerts that start or
+    stop firing are reported, printed and posted to ALERT_WEBHOOK_URL when it is set.
+    refresh.py does the checking, the app only shows the state it saved.
+"""
+ALERTS_FILE = os.environ.get("ALERTS_FILE", "alerts.json")
+ALERTS_STATE_FILE = os.environ.get("ALERTS_STATE_FILE", "alerts_state.json")
+ALERT_WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL")
+# dividend_yield_change compares against the snapshot history this many days back
+YIELD_CHANGE_DAYS = int(os.environ.get("ALERT_YIELD_CHANGE_DAYS", "30"))
+
+# Fields rules can test, computed per symbol by alert_fields
+FIELDS = ['equity', 'allocation', 'return_pct', 'dividend_yield', 'dividend_yield_change', 'annual_dividend',
+          'price', 'high_52w', 'drawdown', 'fair_value', 'price_to_fair_value', 'beta']
+
+OPERATORS = ['>', '>=', '<', '<=', 'between', 'outside']
+
+def load_rules(path=ALERTS_FILE):
+    """Rules from the alerts file, [] without one."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)['rules']
+
+def alert_fields(holdings, prices=None, previous_yields=None):
+    """One row per symbol with every field in FIELDS (NaN where the data isn't there).
+
+    holdings is the holdings table, with price, fair_value and beta columns when the
+    refresh has them. prices (dates x symbols, a year of closes) gives the 52 week high
+    and the drawdown from it. previous_yields ({symbol: yield}, from baseline_yields)
+    gives the yield change.
+    """
+    grouped = holdings.groupby('symbol', sort=False)
+    frame = grouped[['equity', 'cost', 'gain_loss', 'annual_dividend']].sum()
+    total = frame['equity'].sum()
+    frame['allocation'] = frame['equity'] / total * 100 if total else 0.0
+    frame['return_pct'] = (frame['gain_loss'] / frame['cost'].where(frame['cost'] != 0) * 100)
+    frame['dividend_yield'] = frame['annual_dividend'] / frame['equity'].where(frame['equity'] != 0) * 100
+    frame['dividend_yield_change'] = frame['dividend_yield'] - frame.index.map(previous_yields or {}).astype(float)
+    for column in ('price', 'fair_value', 'beta'):
+        frame[column] = grouped[column].first() if column in holdings else np.nan
+
+    if prices is not None and not prices.empty:
+        closes = prices.reindex(columns=frame.index)
+        frame['price'] = frame['price'].fillna(closes.ffill().iloc[-1])
+        frame['high_52w'] = closes.max()
+    else:
+        frame['high_52w'] = np.nan
+    frame['drawdown'] = (frame['price'] / frame['high_52w'] - 1) * 100
+    frame['price_to_fair_value'] = frame['price'] / frame['fair_value'].where(frame['fair_value'] > 0)
+    return frame[FIELDS]
+
+def baseline_yields(days=YIELD_CHANGE_DAYS):
+    """Dividend yield (%) of every symbol in the history snapshot from days ago, {symbol: yield}."""
+    try:
+        past = holdings_on(pd.Timestamp.today() - pd.Timedelta(days=days))
+    except Exception as e:
+        print(f"Error reading yield history: {str(e)}")
+        return {}
+    if past.empty:
+        return {}
+    combined = past.groupby('symbol')[['equity', 'annual_dividend']].sum()
+    combined = combined[combined['equity'] > 0]
+    return (combined['annual_dividend'] / combined['equity'] * 100).to_dict()
+
+def compile_rules(rules, symbols):
+    """Rules as arrays over rules: field index, operator index, low and high bounds, plus a rules x symbols mask.
+
+    Rules with an unknown field or operator, or with the same name (id) as an earlier
+    rule, are skipped with a warning.
+    """
+    position = {symbol: i for i, symbol in enumerate(symbols)}
+    names, fields, ops, low, high = [], [], [], [], []
+    mask_rows, mask_cols, everyone = [], [], []
+    seen = set()
+    for rule in rules:
+        field = rule.get('field')
+        op = rule.get('op', 'outside' if 'target' in rule else None)
+        if field not in FIELDS or op not in OPERATORS:
+            print(f"Warning: Skipping alert rule {rule.get('name', rule)}: unknown field or operator")
+            continue
+        if 'target' in rule:
+            band = rule.get('band', 0)
+            bounds = (rule['target'] - band, rule['target'] + band)
+        elif op in ('between', 'outside'):
+            bounds = tuple(rule['value'])
+        else:
+            bounds = (rule['value'], rule['value'])
+
+        symbol = rule.get('symbol')
+        label = symbol if isinstance(symbol, str) else ','.join(symbol or ['all'])
+        name = str(rule.get('id') or rule.get('name') or f"{label} {field} {op} {rule.get('value', rule.get('target'))}")
+        if name in seen:
+            print(f"Warning: Skipping alert rule {name}: another rule has the same name")
+            continue
+        seen.add(name)
+
+        index = len(names)
+        names.append(name)
+        fields.append(FIELDS.index(field))
+        ops.append(OPERATORS.index(op))
+        low.append(float(bounds[0]))
+        high.append(float(bounds[1]))
+        everyone.append(symbol is None)
+        for s in ([symbol] if isinstance(symbol, str) else symbol or []):
+            if s in position:
+                mask_rows.append(index)
+                mask_cols.append(position[s])
+
+    mask = np.zeros((len(names), len(symbols)), dtype=bool)
+    mask[mask_rows, mask_cols] = True
+    mask[np.array(everyone, dtype=bool)] = True
+    return {
+        'names': names,
+        'field': np.array(fields, dtype=int),
+        'op': np.array(ops, dtype=int),
+        'low': np.array(low, dtype=float),
+        'high': np.array(high, dtype=float),
+        'mask': mask
+    }
+
+def evaluate(compiled, frame):
+    """Rules x symbols matrices of which rules fire for which symbol and of the values tested (NaN never fires)."""
+    values = frame[FIELDS].to_numpy(dtype=float).T[compiled['field']]
+    low = compiled['low'][:, None]
+    high = compiled['high'][:, None]
+    op = compiled['op'][:, None]
+    with np.errstate(invalid='ignore'):
+        fired = np.select(
+            [op == 0, op == 1, op == 2, op == 3, op == 4, op == 5],
+            [values > low, values >= low, values < low, values <= low,
+             (values >= low) & (values <= high), (values < low) | (values > high)],
+            default=False
+        )
+    return fired & compiled['mask'], values
+
+def _load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'firing': []}
+
+def check_alerts(holdings, prices=None, rules=None, state_path=ALERTS_STATE_FILE):
+    """Evaluate the rules on the holdings and return the alerts that started or stopped firing.
+
+    Each alert is a dict with rule, symbol, field, value, status ('fired' or
+    'resolved') and a message. The firing set is saved for the next run.
+    """
+    rules = load_rules() if rules is None else rules
+    if not rules:
+        return []
+    state = _load_state(state_path)
+    frame = alert_fields(holdings, prices, baseline_yields())
+    symbols = list(frame.index)
+    compiled = compile_rules(rules, symbols)
+    fired, values = evaluate(compiled, frame)
+    names = compiled['names']
+
+    rule_position = {name: i for i, name in enumerate(names)}
+    symbol_position = {symbol: j for j, symbol in enumerate(symbols)}
+    was_firing = np.zeros(fired.shape, dtype=bool)
+    for key in state.get('firing', []):
+        rule, symbol = key.split('|', 1)
+        # Pairs for rules or symbols that are gone aren't resolved, just dropped
+        if rule in rule_position and symbol in symbol_position:
+            was_firing[rule_position[rule], symbol_position[symbol]] = True
+    # Alerts on values this run doesn't have (fair values outside the refresh) keep their last state
+    fired = fired | (np.isnan(values) & was_firing)
+
+    events = []
+    for status, changed in (('fired', fired & ~was_firing), ('resolved', was_firing & ~fired)):
+        for r, s in zip(*np.nonzero(changed)):
+            rule, symbol, field, value = names[r], symbols[s], FIELDS[compiled['field'][r]], float(values[r, s])
+            if status == 'fired':
+                message = f"{rule}: {symbol} {field} is {value:,.2f}"
+            else:
+                message = f"{rule}: {symbol} no longer matches ({field} {value:,.2f})"
+            events.append({'rule': rule, 'symbol': symbol, 'field': field, 'value': value,
+                           'status': status, 'message': message})
+
+    rule_index, symbol_index = np.nonzero(fired)
+    state = {
+        'updated': datetime.now().isoformat(timespec='seconds'),
+        'firing': [f"{names[r]}|{symbols[s]}" for r, s in zip(rule_index.tolist(), symbol_index.tolist())]
+    }
+    try:
+        with open(state_path, 'w') as f:
+            json.dump(state, f, indent=2)
+    except OSError as e:
+        print(f"Error saving alert state: {str(e)}")
+    return events
+
+def last_checked(state_path=ALERTS_STATE_FILE):
+    """Time of the last check (ISO format), None before the first one."""
+    return _load_state(state_path).get('updated')
+
+def active_alerts(state_path=ALERTS_STATE_FILE):
+    """(rule, symbol) pairs firing as of the last check."""
+    return pd.DataFrame([key.split('|', 1) for key in _load_state(state_path).get('firing', [])],
+                        columns=['rule', 'symbol'])
+
+def notify(events, webhook_url=ALERT_WEBHOOK_URL):
+    """Print the alerts and post them to the webhook as JSON when one is set."""
+    for event in events:
+        print(f"[{event['status']}] {event['message']}")
+    if events and webhook_url:
+        try:
+            requests.post(webhook_url, json={'alerts': events}, timeout=10)
+        except requests.RequestException as e:
+            print(f"Error posting alerts: {str(e)}")
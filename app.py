@@ -1,9 +1,26 @@
 import streamlit as st
 import pandas as pd
-from backend import gs_reader, portfolio_analysis, stock_analysis, fire_calculator, get_dividend_info, calculate_fair_value
+import numpy as np
+from backend import HOLDINGS_SOURCE, ACCOUNTS, get_quote_engine, read_holdings, stream_holdings, portfolio_total, to_number, holdings_table, portfolio_analysis, stock_analysis, fire_calculator, get_dividend_info, calculate_fair_value
 import io
 import sys
 import altair as alt
+from history import record_snapshot, load_holdings
+from snapshot import load_snapshot
+from returns import history_returns
+from dividends import dividend_calendar, monthly_income
+from prices import price_history
+from exposure import exposure
+from optimizer import return_statistics, efficient_frontier, portfolio_point
+from backtest import BENCHMARK_SYMBOL, backtest, performance, benchmark_curve, compare_strategies
+from fire import fire_ledger, ledger_summary
+from retirement import market_history, retirement_windows, strategy_summary
+from goals import solve_fire, solve_compound
+from valuation import fair_value_grid, multiple_range
+from profiling import PROFILE_DIR, Profiler, profile_mode
+from whatif import WhatIf
+from drip import holding_assumptions, project_holdings, yearly
+from alerts import ALERTS_FILE, load_rules, active_alerts, last_checked
 
 
 st.set_page_config(page_title="Financial Planner", layout="wide")
@@ -22,42 +39,92 @@ def capture_output(func, *args):
     
     return output, result
 
+@st.fragment(run_every=15)
+def live_quotes(sheet_total):
+    """Latest values from the quote engine, redrawn every 15 seconds."""
+    state = get_quote_engine().start().state()
+    if not state['holdings']:
+        st.info("Waiting for the first quotes...")
+        return
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Live Portfolio Value", f"${state['total_equity']:,.2f}",
+                  f"${state['total_equity'] - sheet_total:,.2f} since the sheet was updated")
+    with col2:
+        st.metric("Live Gain/Loss", f"${state['total_gl']:,.2f}")
+    with col3:
+        st.metric("Last Quote", state['time'] or "N/A", "Market open" if state['market_open'] else "Market closed",
+                  delta_color="off")
+    live = pd.DataFrame(state['holdings']).rename(columns={
+        'account': 'Account', 'symbol': 'Symbol', 'price': 'Price', 'equity': 'Equity',
+        'gl': 'Gain/Loss', 'gl_percent': '% Gain/Loss'
+    })
+    st.dataframe(live, use_container_width=True, hide_index=True)
+
 def main():
     st.title("Financial Portfolio Dashboard")
 
     # Sidebar navigation
     page = st.sidebar.selectbox(
         "Select a Page",
-        ["Portfolio Overview", "FIRE Calculator", "Compound Interest Calculator", "Fair Value Calculator"]
+        ["Portfolio Overview", "FIRE Calculator", "Compound Interest Calculator", "Fair Value Calculator", "Portfolio Optimizer", "Backtest"]
     )
 
     if page == "Portfolio Overview":
         try:
-            total_equity, dataframes = gs_reader()
-            st.header("Portfolio Overview")
-            
-            # Create columns for portfolio values
-            cols = st.columns(len(dataframes) + 1)
-            
-            # Show total portfolio value in first column
-            with cols[0]:
-                st.metric("Total Portfolio", f"${total_equity:,.2f}")
-            
-            # Show individual portfolio values
-            for idx, (account_name, data) in enumerate(dataframes.items(), 1):
-                with cols[idx]:
-                    df = data['df']
-                    mapping = data['mapping']
+            if HOLDINGS_SOURCE == "sheets":
+                st.header("Portfolio Overview")
+
+                # Show each account as soon as its tab is read and its dividends are looked up
+                cols = st.columns(len(ACCOUNTS) + 1)
+                total_slot = cols[0].empty()
+                total_slot.metric("Total Portfolio", "Loading...")
+                slots = {name: cols[idx].empty() for idx, name in enumerate(ACCOUNTS, 1)}
+                for name in ACCOUNTS:
+                    slots[name].metric(name, "Loading...")
+
+                arrived = {}
+                for account_name, data, _ in stream_holdings():
+                    arrived[account_name] = data
                     try:
-                        if isinstance(mapping['equity'], int):
-                            equity = df[mapping['equity']].iloc[-1].replace("$", "").replace(",", "")
-                        else:
-                            equity = df[mapping['equity']].iloc[-1].replace("$", "").replace(",", "")
-                        equity_value = float(equity)
-                        st.metric(account_name, f"${equity_value:,.2f}")
+                        slots[account_name].metric(account_name, f"${to_number(data['df'][data['mapping']['equity']].iloc[-1]):,.2f}")
                     except Exception as e:
-                        st.metric(account_name, "Error")
+                        slots[account_name].metric(account_name, "Error")
+                if not arrived:
+                    raise ValueError("No data could be retrieved from any sheets")
+                for name in ACCOUNTS:
+                    if name not in arrived:
+                        slots[name].empty()
+
+                dataframes = {name: arrived[name] for name in ACCOUNTS if name in arrived}
+                total_equity = portfolio_total(dataframes)
+                total_slot.metric("Total Portfolio", f"${total_equity:,.2f}")
+            else:
+                total_equity, dataframes = read_holdings()
+                st.header("Portfolio Overview")
+                if HOLDINGS_SOURCE == "snapshot":
+                    st.caption(f"As of {load_snapshot()[1]['created_at']}")
+                
+                # Create columns for portfolio values
+                cols = st.columns(len(dataframes) + 1)
+                
+                # Show total portfolio value in first column
+                with cols[0]:
+                    st.metric("Total Portfolio", f"${total_equity:,.2f}")
+                
+                # Show individual portfolio values
+                for idx, (account_name, data) in enumerate(dataframes.items(), 1):
+                    with cols[idx]:
+                        df = data['df']
+                        mapping = data['mapping']
+                        try:
+                            equity_value = to_number(df[mapping['equity']].iloc[-1])
+                            st.metric(account_name, f"${equity_value:,.2f}")
+                        except Exception as e:
+                            st.metric(account_name, "Error")
 
+            if st.toggle("Live Prices", value=False, help="Reprice the holdings with quotes every 15 seconds while the market is open"):
+                live_quotes(total_equity)
             
             st.subheader("Quick Stock Analysis")
             col1, col2 = st.columns([3, 1])
@@ -186,6 +253,132 @@ def main():
                         # Show performance and dividend analysis
                         show_analysis(df_display)
 
+            with st.expander("What-If Trades"):
+                st.caption("Try buys and sells at today's prices. Only the traded symbols are recalculated and nothing is fetched.")
+                # The combined holdings are built once per load, each edit only applies the changed trades
+                holdings = holdings_table(dataframes)
+                key = (round(float(holdings['equity'].sum()), 2), len(holdings))
+                cached = st.session_state.get('whatif')
+                if cached is None or cached[0] != key:
+                    cached = (key, WhatIf(holdings))
+                    st.session_state['whatif'] = cached
+                whatif = cached[1]
+
+                trades_df = st.data_editor(
+                    pd.DataFrame({'Symbol': pd.Series(dtype=str), 'Action': pd.Series(dtype=str),
+                                  'Amount ($)': pd.Series(dtype=float), 'Yield (%)': pd.Series(dtype=float)}),
+                    num_rows="dynamic", use_container_width=True, key="whatif_trades",
+                    column_config={
+                        'Action': st.column_config.SelectboxColumn(options=["Buy", "Sell"], default="Buy"),
+                        'Amount ($)': st.column_config.NumberColumn(min_value=0.0, format="$%.2f"),
+                        'Yield (%)': st.column_config.NumberColumn(help="Dividend yield of a symbol you don't hold yet")
+                    }
+                )
+                trades = []
+                for row in trades_df.itertuples(index=False):
+                    if isinstance(row[0], str) and row[0].strip() and pd.notna(row[2]) and row[2] > 0:
+                        trades.append({
+                            'symbol': row[0].strip().upper(),
+                            'amount': float(row[2]) if row[1] != "Sell" else -float(row[2]),
+                            'dividend_yield': float(row[3]) if pd.notna(row[3]) else None
+                        })
+                whatif.set_trades(trades)
+
+                before, after = whatif.baseline_summary(), whatif.summary()
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Total Portfolio", f"${after['total_equity']:,.2f}",
+                              f"${after['total_equity'] - before['total_equity']:,.2f}")
+                with col2:
+                    st.metric("Annual Dividend Income", f"${after['annual_dividend']:,.2f}",
+                              f"${after['annual_dividend'] - before['annual_dividend']:,.2f}")
+                with col3:
+                    st.metric("Dividend Yield", f"{after['dividend_yield']:.2f}%",
+                              f"{after['dividend_yield'] - before['dividend_yield']:.2f}%")
+                with col4:
+                    st.metric("Total Return", f"{after['return_pct']:.2f}%",
+                              f"{after['return_pct'] - before['return_pct']:.2f}%")
+
+                if trades:
+                    columns = {'symbol': 'Symbol', 'name': 'Name', 'equity': 'Total Equity', 'allocation': 'Allocation (%)',
+                               'allocation_change': 'Change (%)', 'return_pct': '% Gain/Loss',
+                               'dividend_yield': 'Dividend Yield (%)', 'annual_dividend': 'Annual Dividend'}
+                    traded = whatif.table(sorted({trade['symbol'] for trade in trades}))
+                    st.write("Traded Holdings")
+                    st.dataframe(traded[list(columns)].rename(columns=columns).round(2), use_container_width=True, hide_index=True)
+
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.write("Largest Allocations")
+                        st.dataframe(whatif.ranked('equity')[['symbol', 'allocation']].rename(columns=columns).round(2),
+                                     use_container_width=True, hide_index=True)
+                    with col2:
+                        st.write("Top 5 Performers")
+                        st.dataframe(whatif.ranked('return_pct')[['symbol', 'return_pct']].rename(columns=columns).round(2),
+                                     use_container_width=True, hide_index=True)
+                    with col3:
+                        st.write("Bottom 5 Performers")
+                        st.dataframe(whatif.ranked('return_pct', largest=False)[['symbol', 'return_pct']].rename(columns=columns).round(2),
+                                     use_container_width=True, hide_index=True)
+
+            # Keep a snapshot of today's holdings for the history
+            record_snapshot(holdings_table(dataframes))
+
+            # Alerts are checked (and notified) by refresh.py, the page shows what was firing then
+            rules = load_rules()
+            if rules:
+                active = active_alerts()
+                with st.expander(f"Alerts ({len(active)} active)"):
+                    st.caption(f"{len(rules)} rules from {ALERTS_FILE}, last checked {last_checked() or 'never'} by refresh.py")
+                    st.dataframe(active, use_container_width=True, hide_index=True)
+
+            # Returns that account for when money was added, from the snapshot history
+            history = load_holdings()
+            if history['date'].nunique() > 1:
+                with st.expander("Time and Money Weighted Returns"):
+                    grouping = st.radio("Group by", ["Portfolio", "Account", "Symbol"], horizontal=True)
+                    returns_df = history_returns(history, by=grouping.lower()) * 100
+                    returns_df.columns = ['TWR (%)', 'TWR Annualized (%)', 'MWR / XIRR (%)']
+                    st.dataframe(returns_df.round(2), use_container_width=True)
+
+            with st.expander("Dividend Calendar"):
+                months = st.slider("Months to project", min_value=12, max_value=24, value=12)
+                calendar = dividend_calendar(holdings_table(dataframes), months=months)
+                by_account = monthly_income(calendar, by='account')
+                calendar_data = by_account.reset_index().melt(id_vars='account', var_name='Month', value_name='Dividends')
+                calendar_chart = alt.Chart(calendar_data).mark_bar().encode(
+                    x=alt.X('Month:O', title='Month'),
+                    y=alt.Y('Dividends:Q', title='Projected Dividends ($)'),
+                    color=alt.Color('account:N', title='Account')
+                ).properties(
+                    height=300
+                )
+                st.altair_chart(calendar_chart, use_container_width=True)
+                st.metric("Projected Dividends", f"${calendar.values.sum():,.2f}", f"next {months} months")
+                st.dataframe(monthly_income(calendar, by='symbol').round(2), use_container_width=True)
+
+            with st.expander("Exposure"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    dimension = st.selectbox("Group by", ["Sector", "Industry", "Asset Class", "Country"])
+                with col2:
+                    split_accounts = st.checkbox("Split by Account", value=False)
+                with col3:
+                    include_funds = st.checkbox("Look Through ETFs", value=False,
+                                                help="Split ETFs into their top holdings")
+                dimension_column = dimension.lower().replace(' ', '_')
+                group = ['account', dimension_column] if split_accounts else [dimension_column]
+                exposure_df = exposure(holdings_table(dataframes), by=group, include_funds=include_funds)
+                exposure_chart = alt.Chart(exposure_df).mark_bar().encode(
+                    x=alt.X('equity:Q', title='Equity ($)'),
+                    y=alt.Y(f'{dimension_column}:N', title=dimension, sort='-x'),
+                    color=alt.Color('account:N', title='Account') if split_accounts else alt.value('steelblue')
+                ).properties(
+                    height=300
+                )
+                st.altair_chart(exposure_chart, use_container_width=True)
+                st.dataframe(exposure_df.round(2), use_container_width=True)
+
         except Exception as e:
             st.error(f"Error loading portfolio data: {str(e)}")
 
@@ -221,6 +414,7 @@ def main():
                 
                 st.subheader("Income Sources")
                 social_security = st.number_input("Expected Monthly Social Security ($)", min_value=0, value=2000)
+                social_security_age = st.number_input("Social Security Start Age", min_value=62, max_value=70, value=67)
                 pension = st.number_input("Expected Monthly Pension ($)", min_value=0, value=0)
                 portfolio_dividend_yield = st.number_input("Expected Portfolio Dividend Yield (%)", 
                                                          min_value=0.0, max_value=10.0, value=2.0, step=0.1)
@@ -239,6 +433,8 @@ def main():
                 market_crash_scenario = st.checkbox("Include Market Crash Scenario", value=False)
                 if market_crash_scenario:
                     crash_impact = st.slider("Market Crash Impact (%)", min_value=10, max_value=50, value=30)
+                stock_allocation = st.slider("Stock Allocation in Retirement (%)", min_value=0, max_value=100, value=60,
+                                             help="Used by the historical stress test, the rest is in 10 year Treasuries")
 
         if st.button("Calculate FIRE"):
             try:
@@ -261,8 +457,32 @@ def main():
                 results = fire_calculator(
                     retirement_age, net_annual_expenses, current_age,
                     monthly_investment, monthly_cash_savings,
-                    current_cash_savings, portfolio_dividend_yield / 100
+                    current_cash_savings, portfolio_dividend_yield / 100, withdrawal_rate / 100
                 )
+
+                # Year by year cash flows from today until life expectancy
+                plan = {
+                    'current_age': current_age,
+                    'retirement_age': retirement_age,
+                    'life_expectancy': life_expectancy,
+                    'current_portfolio': results['current_portfolio'],
+                    'current_cash_savings': current_cash_savings,
+                    'annual_expenses': annual_expenses,
+                    'retirement_expenses_modifier': retirement_expenses_modifier / 100,
+                    'monthly_investment': monthly_investment,
+                    'monthly_cash_savings': monthly_cash_savings,
+                    'investment_return': investment_return / 100,
+                    'dividend_yield': portfolio_dividend_yield / 100,
+                    'inflation_rate': inflation_rate / 100,
+                    'account_for_inflation': account_for_inflation,
+                    'tax_rate': tax_rate / 100,
+                    'social_security': social_security if include_social_security else 0,
+                    'social_security_age': social_security_age,
+                    'pension': pension if include_pension else 0,
+                    'pension_age': retirement_age
+                }
+                ledger = fire_ledger(plan)
+                summary = ledger_summary(ledger).iloc[0]
                 
                 # Display results in an organized layout
                 st.subheader("FIRE Analysis Results")
@@ -296,18 +516,103 @@ def main():
                 # Show additional analysis
                 st.subheader("Detailed Analysis")
                 
-                # Calculate years of retirement coverage
+                # Years of retirement coverage from the ledger
                 retirement_years = life_expectancy - retirement_age
-                portfolio_depletion_rate = (net_annual_expenses - results['projected_dividend_income']) / results['total_future_value']
-                years_covered = 1 / portfolio_depletion_rate if portfolio_depletion_rate > 0 else float('inf')
+                if pd.isna(summary['depletion_age']):
+                    years_covered = retirement_years
+                else:
+                    years_covered = max(summary['depletion_age'] - retirement_age, 0)
                 
                 st.write(f"""
                 - You plan to retire in {results['years_to_fire']:.1f} years at age {retirement_age}
                 - Your portfolio needs to last {retirement_years} years (until age {life_expectancy})
-                - At current rates, your portfolio will cover {min(years_covered, retirement_years):.1f} years of retirement
+                - At current rates, your portfolio will cover {years_covered:.1f} years of retirement
                 - Your monthly investment needs to be ${results['required_monthly_investment']:,.2f} to reach your FIRE goal
+                - Your net worth at age {life_expectancy} would be ${summary['ending_net_worth']:,.2f} (${summary['ending_real_net_worth']:,.2f} in today's dollars) after ${summary['total_taxes']:,.2f} in taxes
                 """)
+
+                st.subheader("Year by Year Projection")
+                balances = ledger[['age', 'portfolio', 'cash']].copy()
+                if account_for_inflation:
+                    balances[['portfolio', 'cash']] = balances[['portfolio', 'cash']].div(ledger['inflation_index'], axis=0)
+                balances = balances.rename(columns={'portfolio': 'Portfolio', 'cash': 'Cash'}).melt('age', var_name='Balance', value_name='Value')
+                st.altair_chart(alt.Chart(balances).mark_area().encode(
+                    x=alt.X('age:Q', title='Age'),
+                    y=alt.Y('Value:Q', title="Balance (today's $)" if account_for_inflation else 'Balance ($)', stack=True),
+                    color=alt.Color('Balance:N', title=None),
+                    tooltip=['age:Q', 'Balance:N', alt.Tooltip('Value:Q', format='$,.0f')]
+                ).properties(height=350), use_container_width=True)
+
+                with st.expander("Cash Flow Ledger"):
+                    table = ledger.drop(columns=['scenario', 'period']).rename(columns=lambda c: c.replace('_', ' ').title())
+                    money = [c for c in table.columns if c not in ('Age', 'Retired', 'Inflation Index')]
+                    st.dataframe(table.style.format({**{c: "${:,.0f}" for c in money}, 'Age': "{:.0f}", 'Inflation Index': "{:.3f}"}),
+                                 use_container_width=True, hide_index=True)
                 
+                with st.expander("Historical Stress Test"):
+                    try:
+                        history = market_history()
+                        retirement_years = max(life_expectancy - retirement_age, 1)
+                        # Money at retirement in today's dollars, the windows are in real terms
+                        start_value = ledger.loc[ledger['age'] < retirement_age, 'real_net_worth']
+                        start_value = start_value.iloc[-1] if len(start_value) else ledger['real_net_worth'].iloc[0]
+                        rate = withdrawal_rate / 100
+                        strategies = [
+                            {'name': f"Fixed {withdrawal_rate:.1f}%", 'rule': 'fixed', 'rate': rate},
+                            {'name': f"Constant {withdrawal_rate:.1f}% of Balance", 'rule': 'percent', 'rate': rate},
+                            {'name': "Guardrails", 'rule': 'guardrails', 'rate': rate, 'band': 0.2, 'adjustment': 0.1}
+                        ]
+                        windows = retirement_windows(history, retirement_years, start_value,
+                                                     stock_allocation / 100, strategies)
+                        stress = strategy_summary(windows)
+
+                        st.write(f"Every {retirement_years} year retirement starting between "
+                                 f"{windows['start_year'].min()} and {windows['start_year'].max()}, "
+                                 f"starting with ${start_value:,.0f} in today's dollars.")
+                        st.dataframe(pd.DataFrame({
+                            'Success Rate': stress['success_rate'].map(lambda x: f"{x * 100:.1f}%"),
+                            'Worst Ending Value': stress['worst_terminal_value'].map(lambda x: f"${x:,.0f}"),
+                            'Median Ending Value': stress['median_terminal_value'].map(lambda x: f"${x:,.0f}"),
+                            'Worst Start Year': stress['worst_start_year'],
+                            'Lowest Withdrawal': stress['lowest_withdrawal'].map(lambda x: f"${x:,.0f}"),
+                            'Average Withdrawal': stress['average_withdrawal'].map(lambda x: f"${x:,.0f}")
+                        }), use_container_width=True)
+                        st.altair_chart(alt.Chart(windows).mark_line().encode(
+                            x=alt.X('start_year:O', title='Retirement Start Year', axis=alt.Axis(labelOverlap=True)),
+                            y=alt.Y('terminal_value:Q', title="Ending Value (today's $)"),
+                            color=alt.Color('strategy:N', title='Strategy'),
+                            tooltip=['strategy:N', 'start_year:O', alt.Tooltip('terminal_value:Q', format='$,.0f')]
+                        ).properties(height=350), use_container_width=True)
+                    except ValueError as e:
+                        st.info(str(e))
+
+                with st.expander("Goal Seek"):
+                    st.write("What it takes for the money to last until life expectancy, changing one input at a time.")
+                    earliest_age = solve_fire('retirement_age', plan)[0]
+                    needed_investment = solve_fire('monthly_investment', plan)[0]
+                    needed_return = solve_fire('investment_return', plan)[0]
+                    max_expenses = solve_fire('annual_expenses', plan)[0]
+
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Earliest Retirement Age", f"{earliest_age:.0f}" if pd.notna(earliest_age) else "Out of Reach")
+                    with col2:
+                        st.metric("Monthly Investment Needed", f"${needed_investment:,.2f}" if pd.notna(needed_investment) else "Out of Reach")
+                    with col3:
+                        st.metric("Return Needed", f"{needed_return * 100:.2f}%" if pd.notna(needed_return) else "Out of Reach")
+                    with col4:
+                        st.metric("Maximum Retirement Spending",
+                                  f"${max_expenses * retirement_expenses_modifier / 100:,.2f}/year" if pd.notna(max_expenses) else "Out of Reach")
+
+                    # Earliest retirement age for a range of monthly investments, solved in one batch
+                    investments = np.linspace(0, max(monthly_investment * 4, 2000), 21)
+                    ages = solve_fire('retirement_age', {**plan, 'monthly_investment': investments})
+                    st.altair_chart(alt.Chart(pd.DataFrame({'Monthly Investment': investments, 'Retirement Age': ages}).dropna()).mark_line(point=True).encode(
+                        x=alt.X('Monthly Investment:Q', title='Monthly Investment ($)'),
+                        y=alt.Y('Retirement Age:Q', title='Earliest Retirement Age', scale=alt.Scale(zero=False)),
+                        tooltip=[alt.Tooltip('Monthly Investment:Q', format='$,.0f'), 'Retirement Age:Q']
+                    ).properties(height=300), use_container_width=True)
+
                 if market_crash_scenario:
                     crash_portfolio = results['total_future_value'] * (1 - crash_impact/100)
                     st.warning(f"""
@@ -324,7 +629,7 @@ def main():
         
         # Try to get current portfolio value and dividend info
         try:
-            current_portfolio_value, dataframes = gs_reader()
+            current_portfolio_value, dataframes = read_holdings()
             has_portfolio_data = True
             
             # Calculate current dividend information
@@ -471,6 +776,71 @@ def main():
             else:
                 st.warning("No portfolio data available")
         
+        with st.expander("Goal Seek"):
+            target_value = st.number_input("Target Portfolio Value ($)", min_value=0.0, value=1000000.0, step=10000.0)
+            goal = dict(initial=initial_amount, monthly_contribution=monthly_contribution, years=investment_period,
+                        annual_return=annual_return / 100, dividend_yield=dividend_yield / 100,
+                        reinvest_dividends=reinvest_dividends)
+            needed_contribution = solve_compound('monthly_contribution', target_value, **goal)
+            needed_return = solve_compound('annual_return', target_value, **goal)
+            needed_years = solve_compound('years', target_value, **goal)
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Monthly Contribution Needed", f"${needed_contribution:,.2f}" if pd.notna(needed_contribution) else "Out of Reach")
+            with col2:
+                st.metric("Annual Return Needed", f"{needed_return * 100:.2f}%" if pd.notna(needed_return) else "Out of Reach")
+            with col3:
+                st.metric("Years Needed", f"{needed_years:.1f}" if pd.notna(needed_years) else "Over 100")
+
+        if has_portfolio_data:
+            with st.expander("Per-Holding DRIP Projection"):
+                st.caption("Each holding compounds with its own yield, payment schedule, dividend growth and price growth "
+                           "from the cached dividend and price history. New money is split by today's allocation.")
+                col1, col2 = st.columns(2)
+                with col1:
+                    drip_years = st.slider("Years to Project", min_value=1, max_value=50, value=max(1, min(int(investment_period), 50)))
+                with col2:
+                    max_growth = st.slider("Cap Growth Rates At (%)", min_value=0.0, max_value=30.0, value=15.0, step=0.5,
+                                           help="Past dividend and price growth above this is capped")
+                try:
+                    assumptions = holding_assumptions(holdings_table(dataframes), max_growth=max_growth / 100)
+                    projection = yearly(project_holdings(assumptions, drip_years, monthly_contribution, reinvest_dividends))
+                    total_value = projection['value'].sum()
+                    total_income = projection['income'].sum()
+
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Final Portfolio Value", f"${total_value.iloc[-1]:,.2f}")
+                    with col2:
+                        st.metric("Final Annual Dividend Income", f"${total_income.iloc[-1]:,.2f}")
+                    with col3:
+                        st.metric("Final Yield on Value", f"{total_income.iloc[-1] / total_value.iloc[-1] * 100:.2f}%")
+
+                    # Income by the largest payers at the end, the rest together
+                    top = projection['income'].iloc[:, -1].nlargest(8).index
+                    income = projection['income'].loc[top]
+                    income.loc['Other'] = projection['income'].drop(top).sum()
+                    income_data = income.rename_axis('Symbol').reset_index().melt(id_vars='Symbol', var_name='Year', value_name='Income')
+                    st.altair_chart(alt.Chart(income_data).mark_area().encode(
+                        x=alt.X('Year:Q', title='Year'),
+                        y=alt.Y('Income:Q', title='Annual Dividend Income ($)', stack=True),
+                        color=alt.Color('Symbol:N', title='Symbol')
+                    ).properties(height=350), use_container_width=True)
+
+                    drip_table = pd.DataFrame({
+                        'Equity Today': assumptions['equity'],
+                        'Yield (%)': assumptions['dividend_yield'] * 100,
+                        'Dividend Growth (%)': assumptions['dividend_growth'] * 100,
+                        'Price Growth (%)': assumptions['price_growth'] * 100,
+                        'Final Value': projection['value'].iloc[:, -1],
+                        'Final Annual Income': projection['income'].iloc[:, -1],
+                        'Share of Income (%)': projection['income'].iloc[:, -1] / total_income.iloc[-1] * 100 if total_income.iloc[-1] > 0 else 0.0
+                    }).sort_values('Final Annual Income', ascending=False)
+                    st.dataframe(drip_table.round(2), use_container_width=True)
+                except Exception as e:
+                    st.error(f"Error projecting holdings: {str(e)}")
+
         if st.button("Calculate Growth"):
             # Calculate compound interest with monthly contributions
             nominal_values = []
@@ -647,7 +1017,12 @@ def main():
             ticker = st.text_input("Enter Stock Ticker", "").upper()
             
             if ticker:
-                result, error = calculate_fair_value(ticker)
+                # Keep the fetched fundamentals so changing the sensitivity inputs doesn't fetch them again
+                cached = st.session_state.get('fair_value')
+                if cached is None or cached[0] != ticker:
+                    cached = (ticker, *calculate_fair_value(ticker))
+                    st.session_state['fair_value'] = cached
+                _, result, error = cached
                 
                 if error:
                     st.error(error)
@@ -735,6 +1110,62 @@ def main():
                         * Dividend Yield of {result['dividend_yield']:,.2f}%
                     """
                     st.write(interpretation)
+
+                    st.subheader("Sensitivity")
+                    growth_low, growth_high = st.slider(
+                        "EPS Growth Range (%)", 0.0, 100.0,
+                        (0.0, float(min(100.0, max(30.0, 2 * result['eps_growth']))))
+                    )
+                    default_peg = multiple_range(result)
+                    peg_low, peg_high = st.slider(
+                        "PEG Ratio Range", 0.1, 10.0,
+                        (float(max(0.1, default_peg[0])), float(min(10.0, default_peg[-1])))
+                    )
+                    grid = fair_value_grid(
+                        result,
+                        growth=np.linspace(growth_low, growth_high, 100),
+                        multiples=np.linspace(peg_low, peg_high, 100)
+                    )
+
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Median Fair Value", f"${grid['percentiles'].get(50, 0):,.2f}")
+                    with col2:
+                        st.metric("25th-75th Percentile", f"${grid['percentiles'].get(25, 0):,.0f} - ${grid['percentiles'].get(75, 0):,.0f}")
+                    with col3:
+                        st.metric("Above Current Price", f"{grid['undervalued_share']:.0%}")
+                    with col4:
+                        st.metric("Implied EPS Growth", f"{grid['implied_growth']:,.1f}%")
+
+                    growth_grid, peg_grid = np.meshgrid(grid['growth'], grid['multiples'])
+                    heatmap = pd.DataFrame({
+                        'EPS Growth (%)': growth_grid.ravel(),
+                        'PEG Ratio': peg_grid.ravel(),
+                        'Fair Value': grid['values'].ravel(),
+                        'Vs Price (%)': (grid['values'].ravel() / result['current_price'] - 1) * 100
+                    }).dropna()
+                    # Each cell spans half a step either side of its grid point
+                    growth_step = (growth_high - growth_low) / 99 / 2
+                    peg_step = (peg_high - peg_low) / 99 / 2
+                    heatmap = heatmap.assign(
+                        growth_start=heatmap['EPS Growth (%)'] - growth_step, growth_end=heatmap['EPS Growth (%)'] + growth_step,
+                        peg_start=heatmap['PEG Ratio'] - peg_step, peg_end=heatmap['PEG Ratio'] + peg_step
+                    )
+                    st.altair_chart(alt.Chart(heatmap).mark_rect().encode(
+                        x=alt.X('growth_start:Q', title='EPS Growth (%)'),
+                        x2='growth_end:Q',
+                        y=alt.Y('peg_start:Q', title='PEG Ratio'),
+                        y2='peg_end:Q',
+                        color=alt.Color('Vs Price (%):Q', scale=alt.Scale(scheme='redyellowgreen', domainMid=0, clamp=True,
+                                                                           domain=[-100, 100])),
+                        tooltip=['EPS Growth (%)', 'PEG Ratio', alt.Tooltip('Fair Value:Q', format='$,.2f'),
+                                 alt.Tooltip('Vs Price (%):Q', format=',.1f')]
+                    ).properties(height=400), use_container_width=True)
+                    st.caption(
+                        f"Green cells are assumptions under which the stock is worth more than ${result['current_price']:,.2f}. "
+                        f"The point estimate's PEG is {result['peg_ratio']:,.2f}; at that formula the current price implies "
+                        f"{grid['implied_growth']:,.1f}% EPS growth."
+                    )
                     
         with col2:
             st.subheader("About Fair Value")
@@ -755,6 +1186,161 @@ def main():
             - Overvalued: > 110% of fair value
             """)
 
+    elif page == "Portfolio Optimizer":
+        st.header("Portfolio Optimizer")
+
+        try:
+            total_equity, dataframes = read_holdings()
+            holdings = holdings_table(dataframes)
+            current = holdings.groupby('symbol')['equity'].sum()
+            current = current[current > 0]
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                lookback = st.selectbox("Price History", ["1 Year", "3 Years", "5 Years"], index=1)
+            with col2:
+                cap = st.slider("Maximum Position Size (%)", min_value=1, max_value=100, value=25)
+            with col3:
+                risk_free_rate = st.number_input("Risk Free Rate (%)", min_value=0.0, max_value=10.0, value=4.0, step=0.1)
+
+            with st.spinner("Building efficient frontier..."):
+                years = int(lookback.split()[0])
+                prices = price_history(current.index, pd.Timestamp.today() - pd.DateOffset(years=years))
+                mu, cov = return_statistics(prices)
+
+                # Start from the last frontier when the symbols haven't changed
+                previous = st.session_state.get('frontier_weights')
+                warm_start = previous.values if previous is not None and list(previous.columns) == list(mu.index) else None
+                frontier, weights = efficient_frontier(mu, cov, points=200, cap=cap / 100,
+                                                       risk_free_rate=risk_free_rate / 100, warm_start=warm_start)
+                st.session_state['frontier_weights'] = weights
+
+            current_risk, current_return = portfolio_point(current, mu, cov)
+            best = frontier['sharpe'].idxmax()
+            lowest = frontier['risk'].idxmin()
+
+            points = pd.DataFrame({
+                'Portfolio': ['Current', 'Maximum Sharpe', 'Minimum Variance'],
+                'Risk': [current_risk * 100, frontier.loc[best, 'risk'] * 100, frontier.loc[lowest, 'risk'] * 100],
+                'Return': [current_return * 100, frontier.loc[best, 'return'] * 100, frontier.loc[lowest, 'return'] * 100]
+            })
+            frontier_line = alt.Chart(frontier.assign(Risk=frontier['risk'] * 100, Return=frontier['return'] * 100)).mark_line().encode(
+                x=alt.X('Risk:Q', title='Volatility (%)'),
+                y=alt.Y('Return:Q', title='Expected Return (%)')
+            )
+            frontier_points = alt.Chart(points).mark_point(size=120, filled=True).encode(
+                x='Risk:Q',
+                y='Return:Q',
+                color=alt.Color('Portfolio:N', title='Portfolio'),
+                tooltip=['Portfolio', alt.Tooltip('Risk:Q', format='.2f'), alt.Tooltip('Return:Q', format='.2f')]
+            )
+            st.altair_chart((frontier_line + frontier_points).properties(height=400), use_container_width=True)
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Current Sharpe", f"{(current_return - risk_free_rate / 100) / current_risk:.2f}" if current_risk > 0 else "N/A")
+            with col2:
+                st.metric("Maximum Sharpe", f"{frontier.loc[best, 'sharpe']:.2f}")
+            with col3:
+                st.metric("Minimum Volatility", f"{frontier.loc[lowest, 'risk'] * 100:.2f}%")
+
+            st.subheader("Target Allocations")
+            allocations = pd.DataFrame({
+                'Current (%)': current.reindex(mu.index).fillna(0) / current.reindex(mu.index).sum() * 100,
+                'Maximum Sharpe (%)': weights.loc[best].values * 100,
+                'Minimum Variance (%)': weights.loc[lowest].values * 100
+            }, index=mu.index)
+            st.dataframe(allocations.sort_values('Maximum Sharpe (%)', ascending=False).round(2), use_container_width=True)
+
+            skipped = sorted(set(current.index) - set(mu.index))
+            if skipped:
+                st.info(f"Not enough price history for: {', '.join(skipped)}")
+
+        except Exception as e:
+            st.error(f"Error optimizing portfolio: {str(e)}")
+
+    elif page == "Backtest":
+        st.header("Historical Backtest")
+        st.write("How the current allocation would have done if it had been held over the chosen window.")
+
+        try:
+            total_equity, dataframes = read_holdings()
+            holdings = holdings_table(dataframes)
+            current = holdings.groupby('symbol')['equity'].sum()
+            current = current[current > 0]
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                window = st.selectbox("Window", ["1 Year", "3 Years", "5 Years", "10 Years", "20 Years"], index=2)
+            with col2:
+                strategy = st.selectbox("Rebalancing", ["Buy and Hold", "Monthly", "Quarterly", "Annually", "Threshold"])
+            with col3:
+                band = st.slider("Drift Threshold (%)", min_value=1, max_value=25, value=5,
+                                 disabled=strategy != "Threshold")
+            with col4:
+                initial = st.number_input("Starting Value ($)", min_value=1000, value=int(max(total_equity, 1000)), step=1000)
+
+            with st.spinner("Loading price history..."):
+                years = int(window.split()[0])
+                prices = price_history(list(current.index) + [BENCHMARK_SYMBOL],
+                                       pd.Timestamp.today() - pd.DateOffset(years=years))
+
+            rebalance = 'none' if strategy == "Buy and Hold" else strategy.lower()
+            curve, rebalance_dates = backtest(prices, current, rebalance, band / 100, initial)
+            benchmark = benchmark_curve(prices, curve.index, initial)
+
+            chart_data = pd.concat([curve, benchmark.rename('S&P 500')], axis=1).reset_index(names='Date')
+            chart_data = chart_data.melt('Date', var_name='Series', value_name='Value')
+            st.altair_chart(alt.Chart(chart_data).mark_line().encode(
+                x='Date:T',
+                y=alt.Y('Value:Q', title='Value ($)'),
+                color=alt.Color('Series:N', title=None),
+                tooltip=['Date:T', 'Series:N', alt.Tooltip('Value:Q', format='$,.0f')]
+            ).properties(height=400), use_container_width=True)
+
+            stats = performance(curve)
+            benchmark_stats = performance(benchmark)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Ending Value", f"${curve.iloc[-1]:,.2f}")
+            with col2:
+                st.metric("CAGR", f"{stats['cagr'] * 100:.2f}%",
+                          f"{(stats['cagr'] - benchmark_stats['cagr']) * 100:+.2f}% vs S&P 500")
+            with col3:
+                st.metric("Max Drawdown", f"{stats['max_drawdown'] * 100:.2f}%",
+                          f"{(stats['max_drawdown'] - benchmark_stats['max_drawdown']) * 100:+.2f}% vs S&P 500")
+            with col4:
+                st.metric("Rebalances", len(rebalance_dates))
+
+            st.subheader("Rebalancing Comparison")
+            comparison = compare_strategies(prices, current, [
+                ("Buy and Hold", 'none', 0),
+                ("Monthly", 'monthly', 0),
+                ("Quarterly", 'quarterly', 0),
+                ("Annually", 'annually', 0),
+                ("5% Threshold", 'threshold', 0.05),
+                ("10% Threshold", 'threshold', 0.10),
+                ("20% Threshold", 'threshold', 0.20)
+            ], initial)
+            comparison.loc["S&P 500"] = {**benchmark_stats, 'rebalances': 0, 'ending_value': benchmark.iloc[-1]}
+            table = pd.DataFrame({
+                'Ending Value': comparison['ending_value'].map(lambda x: f"${x:,.2f}"),
+                'CAGR': comparison['cagr'].map(lambda x: f"{x * 100:.2f}%"),
+                'Volatility': comparison['volatility'].map(lambda x: f"{x * 100:.2f}%"),
+                'Max Drawdown': comparison['max_drawdown'].map(lambda x: f"{x * 100:.2f}%"),
+                'Sharpe': comparison['sharpe'].map(lambda x: f"{x:.2f}"),
+                'Rebalances': comparison['rebalances'].astype(int)
+            })
+            st.dataframe(table, use_container_width=True)
+
+            skipped = sorted(set(current.index) - set(prices.columns[prices.ffill().iloc[0].notna()]))
+            if skipped:
+                st.info(f"No price history at the start of the window for: {', '.join(skipped)}. "
+                        "They are left out and the other weights are scaled up.")
+
+        except Exception as e:
+            st.error(f"Error running backtest: {str(e)}")
+
 def show_analysis(df_display):
     """Helper function to show performance and dividend analysis"""
     # Show top and worst performers
@@ -803,5 +1389,19 @@ def show_analysis(df_display):
         st.metric("Portfolio Dividend Yield", f"{portfolio_yield:.2f}%")
         st.metric("Total Annual Dividend Income", f"${total_annual_div:,.2f}")
 
+def profiled_main():
+    """Run main, profiled when ?profile=, the sidebar toggle or PROFILE asks for it."""
+    requested = st.query_params.get("profile") or st.session_state.get("profile_rerun")
+    mode = profile_mode(requested)
+    if mode:
+        with Profiler("streamlit-rerun", mode) as profile:
+            main()
+    else:
+        main()
+    st.sidebar.toggle("Profile Reruns", key="profile_rerun",
+                      help=f"Write a flame graph and the top allocation sites of each rerun to {PROFILE_DIR}/")
+    if mode and profile.paths:
+        st.sidebar.caption(f"Profile written to {', '.join(profile.paths)}")
+
 if __name__ == "__main__":
-    main()
+    profiled_main()
@@ -1,18 +1,38 @@
 import os
+import json
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from google.oauth2 import service_account
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
 import pandas as pd
 import gspread
 import csv
 import time
+import threading
+import queue
+import httplib2
+import requests
+from google_auth_httplib2 import AuthorizedHttp
 import yfinance as yf
 from yfinance import download
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request
 from flask_cors import CORS
-from functools import lru_cache
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from snapshot import load_snapshot
+from quotes import QuoteEngine, format_event
+from exports import EXPORT_FORMATS, EXPORT_SCHEMAS, export_tables, serialize
+from profiling import Profiler, profile_mode
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 """ Change this to your scope and spreadsheet id that you want to read from.
     You can find the spreadsheet id by going to goolge sheet and highlighint the url in the browser.
@@ -27,203 +47,573 @@ from functools import lru_cache
 SCOPES=["https://www.googleapis.com/auth/spreadsheets"]
 SPREADSHEET_ID="" #update your spreadsheet here
 
-# Cache for dividend data to avoid rate limiting
-@lru_cache(maxsize=1000)
-def get_dividend_info(symbol):
-    try:
-        stock = yf.Ticker(symbol)
-        info = stock.info
-        
-        
-        try:
-            hist = stock.history(period="1y")
-            if not hist.empty and 'Dividends' in hist.columns:
-                annual_div = hist['Dividends'].sum()
-                current_price = hist['Close'].iloc[-1]
-                if current_price > 0:
-                    return annual_div / current_price
-        except:
-            pass
+# For headless servers point this at a service account key instead of using creds.json/token.json.
+# Share the spreadsheet with the service account's email address so it can read it.
+SERVICE_ACCOUNT_FILE=os.environ.get("GOOGLE_SERVICE_ACCOUNT_FILE", "")
 
-        try:
-            info = stock.fast_info
-            if hasattr(info, 'last_dividend') and info.last_dividend:
-                annual_div = info.last_dividend * 4  
-                current_price = info.last_price
-                if current_price > 0:
-                    return annual_div / current_price
-        except:
-            pass
+# Accounts are read from this file when it exists (see accounts.example.json).
+# Each account has a name, the spreadsheet and tab it lives in, its column mapping,
+# whether the tab's first row is a header row, whether the tab has its own dividend
+# columns (annual_div and div_yield in the mapping) and optionally a local export file.
+ACCOUNTS_FILE=os.environ.get("ACCOUNTS_FILE", "accounts.json")
 
-        try:
-            info = stock.info
-            if 'dividendYield' in info and info['dividendYield'] is not None:
-                return info['dividendYield']
-            elif 'trailingAnnualDividendYield' in info and info['trailingAnnualDividendYield'] is not None:
-                return info['trailingAnnualDividendYield']
-            elif 'dividendRate' in info and info['dividendRate'] is not None and 'regularMarketPrice' in info and info['regularMarketPrice'] is not None:
-                return info['dividendRate'] / info['regularMarketPrice']
-        except:
-            pass
+# Accounts used when there is no accounts file
+""" This could differ for other spreadsheets"""
+DEFAULT_ACCOUNTS = [
+    {
+        'name': 'M1_Finance',
+        'mapping': {
+            'symbol': 0,      # Symbol column index
+            'name': 1,        # Name column index
+            'equity': 5,      # Equity column index
+            'cost': 6,        # Cost column index
+            'gl': 7,          # G/L column index
+            'allocation': 9,  # Allocation column index
+            'annual_div': 10, # Annual Dividend column index
+            'div_yield': 11   # Dividend Yield column index
+        },
+        'own_dividends': True
+    },
+    {
+        'name': 'Robinhood',
+        'mapping': {
+            'symbol': 0,  # Symbol column index
+            'name': 1,    # Name column index
+            'equity': 5,  # Equity column index
+            'cost': 6,    # Cost column index
+            'gl': 7,      # G/L column index
+            'allocation': 9  # Allocation column index
+        }
+    },
+    {
+        'name': 'Schwab',
+        'mapping': {
+            'symbol': 'Ticker',
+            'name': 'Name',
+            'equity': 'Total Equity',
+            'cost': 'Total Cost',
+            'gl': 'Total Gain/Loss',
+            'allocation': 'Allocation'
+        }
+    }
+]
+
+# Extra columns sync.py reads (shares, avg_cost) and keeps current (price, gl_percent),
+# for tabs laid out like the recommended sheet in the README. Accounts can override
+# them with a "sync" mapping in the accounts file.
+DEFAULT_SYNC_COLUMNS = {'shares': 2, 'avg_cost': 3, 'price': 4, 'gl_percent': 8}
+DEFAULT_SYNC_COLUMN_NAMES = {'shares': 'Shares', 'avg_cost': 'Average Cost', 'price': 'Share Price', 'gl_percent': '%Gain / Loss'}
+
+def load_accounts(path=ACCOUNTS_FILE):
+    """Account settings by name from the accounts file, or DEFAULT_ACCOUNTS without one."""
+    accounts = DEFAULT_ACCOUNTS
+    if os.path.exists(path):
+        with open(path) as f:
+            accounts = json.load(f)['accounts']
+
+    settings = {}
+    for account in accounts:
+        named = any(isinstance(value, str) for value in account['mapping'].values())
+        settings[account['name']] = {
+            'name': account['name'],
+            'spreadsheet_id': account.get('spreadsheet_id') or SPREADSHEET_ID,
+            'tab': account.get('tab', account['name']),
+            'mapping': account['mapping'],
+            'header': account.get('header', True),
+            'own_dividends': account.get('own_dividends', False),
+            'export': account.get('export'),
+            'sync': account.get('sync', DEFAULT_SYNC_COLUMN_NAMES if named else DEFAULT_SYNC_COLUMNS)
+        }
+    return settings
+
+ACCOUNT_SETTINGS = load_accounts()
+
+# Accounts to read, in display order
+ACCOUNTS = list(ACCOUNT_SETTINGS)
+
+# Column mapping for each account
+COLUMN_MAPPINGS = {name: account['mapping'] for name, account in ACCOUNT_SETTINGS.items()}
+
+# Reads of different spreadsheets run in parallel, up to this many at a time
+SHEETS_WORKERS = 8
+
+# Set HOLDINGS_SOURCE=local to read broker exports from disk instead of Google Sheets,
+# or HOLDINGS_SOURCE=snapshot to serve the file written by refresh.py
+HOLDINGS_SOURCE=os.environ.get("HOLDINGS_SOURCE", "sheets")
+
+# Broker export (.csv, .xlsx or .parquet) for each account, used when HOLDINGS_SOURCE=local.
+# Exports use the same column mapping as the account's sheet tab. The "export" setting
+# of an account in the accounts file is added here.
+LOCAL_EXPORTS = {
+    # 'Robinhood': 'exports/robinhood.csv',
+}
+LOCAL_EXPORTS.update({name: a['export'] for name, a in ACCOUNT_SETTINGS.items() if a['export']})
 
-        if symbol in ['VTI', 'SCHD', 'VXUS', 'VIG']:
+# How long a dividend yield, and a "pays no dividend" result, are reused before asking again
+DIVIDEND_TTL = 6 * 60 * 60
+NO_DIVIDEND_TTL = 24 * 60 * 60
+# When no source answered because they raised (network, rate limits), ask again after this
+DIVIDEND_RETRY_TTL = 5 * 60
+
+def _dividend_from_history(stock):
+    hist = stock.history(period="1y")
+    if not hist.empty and 'Dividends' in hist.columns:
+        annual_div = hist['Dividends'].sum()
+        current_price = hist['Close'].iloc[-1]
+        if current_price > 0:
+            return annual_div / current_price
+    return None
+
+def _dividend_from_fast_info(stock):
+    info = stock.fast_info
+    if hasattr(info, 'last_dividend') and info.last_dividend:
+        annual_div = info.last_dividend * 4
+        current_price = info.last_price
+        if current_price > 0:
+            return annual_div / current_price
+    return None
+
+def _dividend_from_info(stock):
+    info = stock.info
+    if 'dividendYield' in info and info['dividendYield'] is not None:
+        return info['dividendYield']
+    elif 'trailingAnnualDividendYield' in info and info['trailingAnnualDividendYield'] is not None:
+        return info['trailingAnnualDividendYield']
+    elif 'dividendRate' in info and info['dividendRate'] is not None and 'regularMarketPrice' in info and info['regularMarketPrice'] is not None:
+        return info['dividendRate'] / info['regularMarketPrice']
+    return None
+
+DIVIDEND_SOURCES = {
+    'history': _dividend_from_history,
+    'fast_info': _dividend_from_fast_info,
+    'info': _dividend_from_info
+}
+
+# Cache for dividend data to avoid rate limiting: symbol -> (yield, expires at)
+_dividend_cache = {}
+# Source that last found a dividend for each symbol
+_dividend_source = {}
+# Per source: calls, seconds spent and successful lookups
+_dividend_source_stats = {name: {'calls': 0, 'seconds': 0.0, 'hits': 0} for name in DIVIDEND_SOURCES}
+_dividend_lock = threading.Lock()
+
+# fast_info guesses the yearly dividend as four times the last one, which is wrong for
+# monthly and annual payers, so it is only asked after the trailing 12 month history
+SOURCE_PRECEDENCE = [('history', 'fast_info')]
+
+def _source_order(symbol):
+    """The symbol's last winning source first, then the rest by time spent per hit.
+
+    Pairs in SOURCE_PRECEDENCE keep their order whatever the timings.
+    """
+    def cost(name):
+        stats = _dividend_source_stats[name]
+        if stats['hits']:
+            return stats['seconds'] / stats['hits']
+        # Untried sources go first so they get timed, sources that never work go last
+        return float('inf') if stats['calls'] else 0
+    order = sorted(DIVIDEND_SOURCES, key=cost)
+    winner = _dividend_source.get(symbol)
+    if winner in order:
+        order.remove(winner)
+        order.insert(0, winner)
+    for first, later in SOURCE_PRECEDENCE:
+        if order.index(first) > order.index(later):
+            order.remove(first)
+            order.insert(order.index(later), first)
+    return order
+
+def get_dividend_info(symbol):
+    now = time.time()
+    with _dividend_lock:
+        cached = _dividend_cache.get(symbol)
+        if cached and cached[1] > now:
+            return cached[0]
+        order = _source_order(symbol)
+
+    failed = False
+    try:
+        stock = yf.Ticker(symbol)
+        for name in order:
+            started = time.perf_counter()
             try:
-                hist = stock.history(period="1y")
-                if not hist.empty and 'Dividends' in hist.columns:
-                    annual_div = hist['Dividends'].sum()
-                    current_price = hist['Close'].iloc[-1]
-                    if current_price > 0:
-                        return annual_div / current_price
+                div_yield = DIVIDEND_SOURCES[name](stock)
             except:
-                pass
+                div_yield = None
+                failed = True
+            elapsed = time.perf_counter() - started
 
-       
+            with _dividend_lock:
+                stats = _dividend_source_stats[name]
+                stats['calls'] += 1
+                stats['seconds'] += elapsed
+                if div_yield is not None:
+                    stats['hits'] += 1
+                    _dividend_source[symbol] = name
+                    # A source that answers 0 knows the symbol doesn't pay, cache that longer
+                    ttl = DIVIDEND_TTL if div_yield else NO_DIVIDEND_TTL
+                    _dividend_cache[symbol] = (div_yield, time.time() + ttl)
+            if div_yield is not None:
+                return div_yield
+
+        with _dividend_lock:
+            if failed:
+                # Sources erred rather than found nothing, keep the winner and retry soon
+                _dividend_cache[symbol] = (0, time.time() + DIVIDEND_RETRY_TTL)
+            else:
+                # No source knows about a dividend, don't ask again for a while
+                _dividend_source.pop(symbol, None)
+                _dividend_cache[symbol] = (0, time.time() + NO_DIVIDEND_TTL)
         return 0
     except Exception as e:
         print(f"Error getting dividend for {symbol}: {str(e)}")
+        with _dividend_lock:
+            _dividend_cache[symbol] = (0, time.time() + DIVIDEND_RETRY_TTL)
         return 0
 
+def dividend_source_stats():
+    """Calls, hits and average seconds per call for each dividend source."""
+    with _dividend_lock:
+        stats = pd.DataFrame.from_dict(_dividend_source_stats, orient='index')
+        winners = pd.Series(_dividend_source, dtype=object).value_counts()
+    stats['avg_seconds'] = (stats['seconds'] / stats['calls']).where(stats['calls'] > 0, 0)
+    stats['symbols'] = winners.reindex(stats.index).fillna(0).astype(int)
+    return stats
+
+# Number of rows requested per call when reading a tab
+SHEET_CHUNK_ROWS = 5000
+
+def column_letter(index):
+    """Convert a zero based column index into a sheet column letter (0 -> A, 27 -> AB)."""
+    letters = ""
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def column_runs(indices):
+    """Group sorted column indices into contiguous (first, last) runs so each run is one range."""
+    runs = []
+    for index in sorted(set(indices)):
+        if runs and index == runs[-1][1] + 1:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    return runs
+
+def sheet_dimensions(sheet, spreadsheet_id):
+    """Return {tab title: (row_count, column_count)} from the spreadsheet metadata."""
+    metadata = sheet.get(
+        spreadsheetId=spreadsheet_id,
+        fields="sheets(properties(title,gridProperties(rowCount,columnCount)))"
+    ).execute()
+
+    dimensions = {}
+    for tab in metadata.get("sheets", []):
+        properties = tab.get("properties", {})
+        grid = properties.get("gridProperties", {})
+        dimensions[properties.get("title")] = (grid.get("rowCount", 0), grid.get("columnCount", 0))
+    return dimensions
+
+def read_sheet_columns(sheet, spreadsheet_id, sheet_name, mapping, dimensions, header=None, chunk_rows=SHEET_CHUNK_ROWS,
+                       value_render=None):
+    """Read only the mapped columns of a tab, SHEET_CHUNK_ROWS rows at a time.
+
+    Integer mappings keep their column index as the column label. Name mappings look
+    up the header row first and use the header names as labels. With header=True the
+    first row is skipped, header=None only skips it for name mappings. value_render is
+    passed on as the valueRenderOption (e.g. "UNFORMATTED_VALUE" for raw numbers).
+    Each chunk is turned into a small frame right away so the raw values are never
+    held twice, and reading stops at the first chunk that comes back short.
+    """
+    row_count, column_count = dimensions
+    if row_count == 0 or column_count == 0:
+        return pd.DataFrame()
+
+    fields = [value for value in mapping.values() if value is not None]
+    header_mode = any(isinstance(value, str) for value in fields)
+    first_row = 2 if header or header_mode else 1
+
+    if header_mode:
+        header = sheet.values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{sheet_name}!A1:{column_letter(column_count - 1)}1"
+        ).execute().get("values", [[]])
+        header = [str(h).strip() for h in (header[0] if header else [])]
+        labels = {}
+        for field in fields:
+            if field in header:
+                labels[header.index(field)] = field
+            else:
+                print(f"Warning: Column {field} not found in {sheet_name} header")
+    else:
+        labels = {index: index for index in fields if index < column_count}
+
+    if not labels:
+        return pd.DataFrame()
+
+    runs = column_runs(labels.keys())
+    chunks = []
+    start = first_row
+    while start <= row_count:
+        end = min(start + chunk_rows - 1, row_count)
+        ranges = [f"{sheet_name}!{column_letter(a)}{start}:{column_letter(b)}{end}" for a, b in runs]
+        options = {'valueRenderOption': value_render} if value_render else {}
+        response = sheet.values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            majorDimension="COLUMNS",
+            **options
+        ).execute()
+
+        columns = {}
+        longest = 0
+        for (a, b), value_range in zip(runs, response.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            for offset, column in enumerate(values):
+                index = a + offset
+                if index in labels:
+                    columns[labels[index]] = pd.Series(column, dtype=object)
+                    longest = max(longest, len(column))
+
+        if longest == 0:
+            break
+        chunks.append(pd.DataFrame(columns, columns=list(labels.values())))
+        if longest < end - start + 1:
+            break
+        start = end + 1
+
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
+def to_number(value):
+    """Parse a sheet or export cell like "$1,234.50" or "12.5%" into a float (0 when blank)."""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return 0.0 if pd.isna(value) else float(value)
+    text = str(value).replace('$', '').replace(',', '').replace('%', '').strip()
+    if not text or text.lower() == 'nan':
+        return 0.0
+    return float(text)
+
+def clean_names(df, mapping):
+    """Strip share counts and percentages from the name column so only the company name is left."""
+    name_col = mapping['name']
+    if name_col in df.columns:
+        df[name_col] = df[name_col].apply(lambda x: ' '.join([p for p in str(x).split() if not any(c.isdigit() for c in p) and '%' not in p]))
+
+def portfolio_total(dataframes):
+    """Sum the equity in the totals (last) row of every account."""
+    total_equity = 0
+    for account_name, data in dataframes.items():
+        try:
+            df = data['df']
+            mapping = data['mapping']
+            total_equity += to_number(df[mapping['equity']].iloc[-1])
+        except Exception as e:
+            print(f"Error processing totals for {account_name}: {str(e)}")
+    return total_equity
+
+class SheetsClient:
+    """Process wide holder for the Google Sheets credentials and service.
+
+    Credentials are loaded once and kept in memory. A background thread refreshes them
+    shortly before they expire so refreshing never happens on the request path. The
+    service is built from the static discovery document that ships with
+    google-api-python-client, and every thread keeps its own HTTP connection for reuse
+    (httplib2 connections are not thread safe).
+    """
+
+    def __init__(self, scopes=SCOPES, token_file="token.json", creds_file="creds.json",
+                 service_account_file=SERVICE_ACCOUNT_FILE, refresh_margin=300):
+        self.scopes = scopes
+        self.token_file = token_file
+        self.creds_file = creds_file
+        self.service_account_file = service_account_file
+        self.refresh_margin = refresh_margin
+        self._credentials = None
+        self._discovery_doc = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._refresher = None
+
+    def _load_credentials(self):
+        if self.service_account_file:
+            return service_account.Credentials.from_service_account_file(
+                self.service_account_file, scopes=self.scopes
+            )
 
-def gs_reader():
-    try:
         credentials = None
         # Delete the token.json file if it exists but is invalid
-        if os.path.exists("token.json"):
+        if os.path.exists(self.token_file):
             try:
-                credentials = Credentials.from_authorized_user_file("token.json", SCOPES)
+                credentials = Credentials.from_authorized_user_file(self.token_file, self.scopes)
                 if not credentials.valid:
                     if credentials.expired and credentials.refresh_token:
-                        credentials.refresh(Request())
+                        credentials.refresh(Request(self._session))
+                        self._save_token(credentials)
                     else:
                         # If refresh fails, remove the invalid token file
-                        os.remove("token.json")
+                        os.remove(self.token_file)
                         credentials = None
             except:
                 # If there's any error reading/refreshing the token, remove it
-                os.remove("token.json")
+                os.remove(self.token_file)
                 credentials = None
 
         # If no valid credentials, create new ones
         if not credentials:
-            if not os.path.exists("creds.json"):
+            if not os.path.exists(self.creds_file):
                 raise FileNotFoundError("creds.json file not found. Please ensure you have your Google Sheets credentials file.")
-            flow = InstalledAppFlow.from_client_secrets_file("creds.json", SCOPES)
+            flow = InstalledAppFlow.from_client_secrets_file(self.creds_file, self.scopes)
             credentials = flow.run_local_server(port=0)
             # Save the new credentials
-            with open("token.json", "w") as token:
-                token.write(credentials.to_json())
+            self._save_token(credentials)
+        return credentials
 
-        spreadsheet_list = ["M1_Finance", "Robinhood", "Schwab"]
-        dataframes = {}
-        
-        service = build("sheets", "v4", credentials=credentials)
-        sheet = service.spreadsheets()
-        
-        # Column mapping for each sheet
-        """ This could differ for other spreadsheets"""
-        column_mappings = {
-            'M1_Finance': {
-                'symbol': 0,      # Symbol column index
-                'name': 1,        # Name column index
-                'equity': 5,      # Equity column index
-                'cost': 6,        # Cost column index
-                'gl': 7,          # G/L column index
-                'allocation': 9,  # Allocation column index
-                'annual_div': 10, # Annual Dividend column index
-                'div_yield': 11   # Dividend Yield column index
-            },
-            'Robinhood': {
-                'symbol': 0,  # Symbol column index
-                'name': 1,    # Name column index
-                'equity': 5,  # Equity column index
-                'cost': 6,    # Cost column index
-                'gl': 7,      # G/L column index
-                'allocation': 9  # Allocation column index
-            },
-            'Schwab': {
-                'symbol': 'Ticker',
-                'name': 'Name',
-                'equity': 'Total Equity',
-                'cost': 'Total Cost',
-                'gl': 'Total Gain/Loss',
-                'allocation': 'Allocation'
-            }
-        }
-        
-        for sheet_name in spreadsheet_list:
+    def _save_token(self, credentials):
+        if self.service_account_file:
+            return
+        with open(self.token_file, "w") as token:
+            token.write(credentials.to_json())
+
+    def _seconds_until_refresh(self):
+        expiry = self._credentials.expiry
+        if expiry is None:
+            return None
+        remaining = (expiry - datetime.utcnow()).total_seconds()
+        return max(remaining - self.refresh_margin, 0)
+
+    def _refresh_loop(self):
+        while True:
+            wait = self._seconds_until_refresh()
+            if wait is None:
+                # Service account credentials have no expiry until their first refresh
+                wait = 0 if not self._credentials.valid else self.refresh_margin
+            time.sleep(wait)
             try:
-                result = sheet.values().get(
-                    spreadsheetId=SPREADSHEET_ID,
-                    range=f"{sheet_name}!A1:M41"
-                ).execute()
-                
-                if not result.get("values"):
-                    print(f"Warning: No data found in sheet {sheet_name}")
-                    continue
-                
-                df = pd.DataFrame(result.get("values", []))
-                if df.empty:
-                    print(f"Warning: Empty dataframe for sheet {sheet_name}")
-                    continue
-                
-                print(f"\nDebug: {sheet_name} raw data:")
-                print("First row (headers):")
-                print(df.iloc[0].tolist())
-                print("\nSecond row (first data row):")
-                print(df.iloc[1].tolist() if len(df) > 1 else "No data rows")
-                
-                # Handle headers differently for each sheet and cleaning for the spreadsheets
-                """ This could differ for other spreadsheets"""
-                if sheet_name == 'Schwab':
-                    headers = df.iloc[0]
-                    df = df.iloc[1:].reset_index(drop=True)
-                    df.columns = headers
-                    
-                    if 'Name' in df.columns:
-                        df['Name'] = df['Name'].apply(lambda x: ' '.join([p for p in str(x).split() if not any(c.isdigit() for c in p) and '%' not in p]))
-                else:
-                    df[1] = df[1].apply(lambda x: ' '.join([p for p in str(x).split() if not any(c.isdigit() for c in p) and '%' not in p]))
-                    df.columns = range(len(df.columns))
-                
-                print(f"\nDebug: {sheet_name} after setting headers:")
-                print("Columns:", df.columns.tolist())
-                print("First row:", df.iloc[0].tolist() if not df.empty else "No data")
-                
-                dataframes[sheet_name] = {
-                    'df': df,
-                    'mapping': column_mappings[sheet_name]
-                }
+                with self._lock:
+                    self._credentials.refresh(Request(self._session))
+                    self._save_token(self._credentials)
             except Exception as e:
-                print(f"Error reading sheet {sheet_name}: {str(e)}")
+                print(f"Error refreshing Google credentials: {str(e)}")
+                time.sleep(60)
+
+    def credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self._load_credentials()
+                self._discovery_doc = get_static_doc("sheets", "v4")
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+                self._refresher.start()
+        return self._credentials
+
+    def service(self):
+        """Return this thread's Sheets service, building it on first use."""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            credentials = self.credentials()
+            http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=60))
+            service = build_from_document(self._discovery_doc, http=http)
+            self._local.service = service
+        return service
+
+_sheets_client = None
+_sheets_client_lock = threading.Lock()
+
+def get_sheets_client():
+    """Return the process wide SheetsClient."""
+    global _sheets_client
+    with _sheets_client_lock:
+        if _sheets_client is None:
+            _sheets_client = SheetsClient()
+    return _sheets_client
+
+# Sheets reads run on these long lived threads so each keeps its service and connection
+# (SheetsClient.service is per thread) instead of building new ones on every read
+sheets_pool = ThreadPoolExecutor(max_workers=SHEETS_WORKERS, thread_name_prefix="sheets")
+
+def read_spreadsheet(spreadsheet_id, accounts, on_tab=None):
+    """Read the tabs of the given accounts from one spreadsheet. Returns {account name: data}.
+
+    on_tab(account name, data) is called as soon as each tab is parsed.
+    """
+    dataframes = {}
+    sheet = get_sheets_client().service().spreadsheets()
+
+    # Look up the real size of every tab once instead of guessing a fixed range
+    try:
+        dimensions = sheet_dimensions(sheet, spreadsheet_id)
+    except Exception as e:
+        print(f"Error reading spreadsheet {spreadsheet_id}: {str(e)}")
+        return dataframes
+
+    for account in accounts:
+        account_name = account['name']
+        sheet_name = account['tab']
+        try:
+            if sheet_name not in dimensions:
+                print(f"Warning: Sheet {sheet_name} not found in spreadsheet")
                 continue
 
+            df = read_sheet_columns(
+                sheet, spreadsheet_id, sheet_name,
+                account['mapping'], dimensions[sheet_name], header=account['header']
+            )
+            if df.empty:
+                print(f"Warning: No data found in sheet {sheet_name}")
+                continue
+
+            print(f"\nDebug: {sheet_name} loaded {len(df)} rows")
+            print("Columns:", df.columns.tolist())
+            print("First row:", df.iloc[0].tolist())
+
+            # Clean the name column so only the company name is left
+            """ This could differ for other spreadsheets"""
+            clean_names(df, account['mapping'])
+
+            dataframes[account_name] = {
+                'df': df,
+                'mapping': account['mapping'],
+                'own_dividends': account['own_dividends']
+            }
+            if on_tab:
+                on_tab(account_name, dataframes[account_name])
+        except Exception as e:
+            print(f"Error reading sheet {sheet_name}: {str(e)}")
+            continue
+    return dataframes
+
+def gs_reader(accounts=None):
+    try:
+        accounts = list(ACCOUNT_SETTINGS.values()) if accounts is None else accounts
+
+        # Accounts that live in the same spreadsheet are read together
+        spreadsheets = {}
+        for account in accounts:
+            spreadsheets.setdefault(account['spreadsheet_id'], []).append(account)
+
+        # Sign in once before the reads start so only one login flow can run
+        get_sheets_client().credentials()
+
+        results = {}
+        for result in sheets_pool.map(lambda item: read_spreadsheet(*item), spreadsheets.items()):
+            results.update(result)
+
+        # Keep the order the accounts are configured in
+        dataframes = {account['name']: results[account['name']] for account in accounts if account['name'] in results}
+
         if not dataframes:
             raise ValueError("No data could be retrieved from any sheets")
 
         
-        total_equity = 0
-        total_cost = 0
-        total_gl = 0
-        
-        for account_name, data in dataframes.items():
-            try:
-                df = data['df']
-                mapping = data['mapping']
-                if isinstance(mapping['equity'], int):
-                    equity = df[mapping['equity']].iloc[-1].replace("$", "").replace(",", "")
-                    cost = df[mapping['cost']].iloc[-1].replace("$", "").replace(",", "")
-                    gl = df[mapping['gl']].iloc[-1].replace("$", "").replace(",", "")
-                else:
-                    equity = df[mapping['equity']].iloc[-1].replace("$", "").replace(",", "")
-                    cost = df[mapping['cost']].iloc[-1].replace("$", "").replace(",", "")
-                    gl = df[mapping['gl']].iloc[-1].replace("$", "").replace(",", "")
-                
-                total_equity += float(equity)
-                total_cost += float(cost)
-                total_gl += float(gl)
-            except Exception as e:
-                print(f"Error processing totals for {account_name}: {str(e)}")
-
+        total_equity = portfolio_total(dataframes)
         return total_equity, dataframes
 
     except FileNotFoundError as e:
@@ -236,10 +626,264 @@ def gs_reader():
         print(f"Unexpected error in gs_reader: {str(e)}")
         raise
 
-def portfolio_analysis(dataframes):
-    print("\n=== Portfolio Analysis ===")
-    
-    # Combine all portfolios for total analysis
+# Dividend lookups that run while the remaining sheet tabs are still being read
+MARKET_DATA_WORKERS = 8
+
+def tab_symbols(data):
+    """Symbols of one account's rows (the totals row left out)."""
+    df = data['df']
+    column = df[data['mapping']['symbol']].iloc[:-1] if len(df) else []
+    return [s for s in (str(value).strip() for value in column) if s and s != 'nan']
+
+def stream_holdings(accounts=None):
+    """Read the accounts from Google Sheets and yield (account name, data, holdings table) as each one is ready.
+
+    As soon as a tab is parsed its symbols go to the dividend lookup pool (symbols
+    already queued by another tab are not looked up twice), so market data is fetched
+    while the other tabs are still being read. An account is yielded once its lookups
+    are done, in the order the accounts finish rather than the configured order.
+    """
+    accounts = list(ACCOUNT_SETTINGS.values()) if accounts is None else accounts
+    spreadsheets = {}
+    for account in accounts:
+        spreadsheets.setdefault(account['spreadsheet_id'], []).append(account)
+
+    # Sign in once before the reads start so only one login flow can run
+    get_sheets_client().credentials()
+
+    ready = queue.Queue()
+    lookups = {}
+    lookups_lock = threading.Lock()
+    market_pool = ThreadPoolExecutor(max_workers=MARKET_DATA_WORKERS)
+    enrich_pool = ThreadPoolExecutor(max_workers=max(1, len(accounts)))
+
+    def enrich(account_name, data):
+        # Every submitted tab must put exactly one 'account' message, or the loop below waits forever
+        try:
+            pending = []
+            if not data.get('own_dividends'):
+                with lookups_lock:
+                    for symbol in tab_symbols(data):
+                        if symbol not in lookups:
+                            lookups[symbol] = market_pool.submit(get_dividend_info, symbol)
+                        pending.append(lookups[symbol])
+            for future in pending:
+                future.result()
+            ready.put(('account', (account_name, data, holdings_table({account_name: data}))))
+        except Exception as e:
+            print(f"Error enriching {account_name}: {str(e)}")
+            ready.put(('account', None))
+
+    def read(spreadsheet_id, group):
+        # Only tabs handed to enrich are counted, so a tab that fails before that isn't waited for
+        submitted = []
+
+        def on_tab(account_name, data):
+            enrich_pool.submit(enrich, account_name, data)
+            submitted.append(account_name)
+
+        try:
+            read_spreadsheet(spreadsheet_id, group, on_tab)
+        finally:
+            ready.put(('spreadsheet', len(submitted)))
+
+    try:
+        for spreadsheet_id, group in spreadsheets.items():
+            sheets_pool.submit(read, spreadsheet_id, group)
+
+        expected = 0
+        finished_spreadsheets = 0
+        received = 0
+        while finished_spreadsheets < len(spreadsheets) or received < expected:
+            kind, item = ready.get()
+            if kind == 'spreadsheet':
+                finished_spreadsheets += 1
+                expected += item
+            else:
+                received += 1
+                if item is not None:
+                    yield item
+    finally:
+        enrich_pool.shutdown(wait=False)
+        market_pool.shutdown(wait=False)
+
+def pipelined_reader(accounts=None):
+    """Like gs_reader, with the dividend lookups overlapped with the sheet reads.
+
+    Returns (total_equity, dataframes, holdings) with the accounts in the configured order.
+    """
+    accounts = list(ACCOUNT_SETTINGS.values()) if accounts is None else accounts
+    results = {name: (data, table) for name, data, table in stream_holdings(accounts)}
+    order = [account['name'] for account in accounts if account['name'] in results]
+    if not order:
+        raise ValueError("No data could be retrieved from any sheets")
+    dataframes = {name: results[name][0] for name in order}
+    holdings = pd.concat([results[name][1] for name in order], ignore_index=True)
+    return portfolio_total(dataframes), dataframes, holdings
+
+# Parsed local exports keyed by path: (modified time, size, (mapping, header), dataframe)
+_local_export_cache = {}
+_local_export_lock = threading.Lock()
+
+def _export_columns(mapping):
+    return [value for value in mapping.values() if value is not None]
+
+def read_local_export(path, mapping, account_name=None, header=None):
+    """Read one broker export with the account's column mapping.
+
+    CSV goes through the pyarrow reader when it is installed, Parquet only loads the
+    mapped columns and XLSX reads the tab named after the account (or the first tab).
+    Like the sheet tabs, header=True skips the first row and header=None only skips it
+    for name mappings. If the export has no totals row one is added so the last row is
+    always the account total.
+    """
+    fields = _export_columns(mapping)
+    header_mode = any(isinstance(value, str) for value in fields)
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        engine = 'pyarrow' if pa is not None else 'c'
+        if header_mode:
+            df = pd.read_csv(path, usecols=fields, dtype=str, engine=engine)
+        else:
+            df = pd.read_csv(path, header=None, usecols=fields, dtype=str, engine=engine)
+            # The pyarrow engine numbers the selected columns from 0, keep the file positions
+            df.columns = sorted(fields)
+    elif extension in ('.xlsx', '.xls'):
+        with pd.ExcelFile(path) as workbook:
+            tab = account_name if account_name in workbook.sheet_names else workbook.sheet_names[0]
+            if header_mode:
+                df = workbook.parse(tab, usecols=fields, dtype=str)
+            else:
+                df = workbook.parse(tab, header=None, usecols=fields, dtype=str)
+                df.columns = sorted(fields)
+    elif extension == '.parquet':
+        if header_mode:
+            df = pd.read_parquet(path, columns=fields)
+        else:
+            names = pq.ParquetFile(path).schema_arrow.names
+            df = pd.read_parquet(path, columns=[names[i] for i in fields])
+            df.columns = fields
+    else:
+        raise ValueError(f"Unsupported export type {extension} for {path}")
+
+    if header and not header_mode and extension != '.parquet':
+        df = df.iloc[1:]
+    df = df.dropna(how='all').reset_index(drop=True)
+    if df.empty:
+        return df
+
+    # Broker exports usually don't have a totals row, the rest of the app expects one
+    if pd.notna(df[mapping['symbol']].iloc[-1]) and str(df[mapping['symbol']].iloc[-1]).strip():
+        totals = {column: None for column in df.columns}
+        for key in ('equity', 'cost', 'gl'):
+            column = mapping[key]
+            values = pd.to_numeric(df[column].astype(str).str.replace(r'[$,%]', '', regex=True), errors='coerce')
+            totals[column] = f"{values.sum():.2f}"
+        df = pd.concat([df, pd.DataFrame([totals])], ignore_index=True)
+
+    clean_names(df, mapping)
+    return df
+
+def local_reader(exports=None):
+    """Read every account from local broker exports. Same return value as gs_reader().
+
+    A file is only parsed again when its modified time or size changes.
+    """
+    exports = LOCAL_EXPORTS if exports is None else exports
+    dataframes = {}
+
+    for account_name, path in exports.items():
+        account = ACCOUNT_SETTINGS[account_name]
+        mapping = account['mapping']
+        try:
+            stat = os.stat(path)
+            with _local_export_lock:
+                cached = _local_export_cache.get(path)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size and cached[2] == (mapping, account['header']):
+                df = cached[3]
+            else:
+                df = read_local_export(path, mapping, account_name, account['header'])
+                with _local_export_lock:
+                    _local_export_cache[path] = (stat.st_mtime_ns, stat.st_size, (dict(mapping), account['header']), df)
+
+            if df.empty:
+                print(f"Warning: No data found in export {path}")
+                continue
+
+            dataframes[account_name] = {
+                'df': df,
+                'mapping': mapping,
+                'own_dividends': account['own_dividends']
+            }
+        except FileNotFoundError:
+            print(f"Warning: Export {path} for {account_name} not found")
+        except Exception as e:
+            print(f"Error reading export {path}: {str(e)}")
+
+    if not dataframes:
+        raise ValueError("No data could be retrieved from any local exports")
+
+    return portfolio_total(dataframes), dataframes
+
+# Column mapping of the account tables rebuilt from a snapshot
+SNAPSHOT_MAPPING = {
+    'symbol': 'symbol',
+    'name': 'name',
+    'equity': 'equity',
+    'cost': 'cost',
+    'gl': 'gain_loss',
+    'allocation': 'allocation',
+    'annual_div': 'annual_dividend',
+    'div_yield': 'dividend_yield'
+}
+
+def snapshot_reader(path=None):
+    """Read every account from the snapshot written by refresh.py. Same return value as gs_reader().
+
+    The dividend yields in the snapshot are put in the dividend cache so pages that
+    look them up don't go to yfinance.
+    """
+    holdings, metadata = load_snapshot(path) if path else load_snapshot()
+    if holdings is None or holdings.empty:
+        raise ValueError("No portfolio snapshot found, run refresh.py first")
+
+    expires = time.time() + DIVIDEND_TTL
+    with _dividend_lock:
+        for symbol, div_yield in holdings.groupby('symbol')['dividend_yield'].first().items():
+            _dividend_cache[symbol] = (div_yield / 100, expires)
+
+    columns = list(SNAPSHOT_MAPPING.values())
+    dataframes = {}
+    for account_name, rows in holdings.groupby('account', sort=False):
+        df = rows[columns].reset_index(drop=True)
+        # The rest of the app expects the account total in the last row
+        totals = {column: None for column in columns}
+        for column in ('equity', 'cost', 'gain_loss', 'annual_dividend'):
+            totals[column] = df[column].sum()
+        dataframes[account_name] = {
+            'df': pd.concat([df, pd.DataFrame([totals])], ignore_index=True),
+            'mapping': SNAPSHOT_MAPPING,
+            'own_dividends': True
+        }
+
+    return portfolio_total(dataframes), dataframes
+
+def read_holdings(source=None):
+    """Read every account from source ("sheets", "local" or "snapshot"), HOLDINGS_SOURCE by default."""
+    source = source or HOLDINGS_SOURCE
+    if source == "local":
+        return local_reader()
+    if source == "snapshot":
+        return snapshot_reader()
+    return gs_reader()
+
+# Columns of the normalized holdings table
+HOLDINGS_COLUMNS = ['symbol', 'name', 'equity', 'cost', 'gain_loss', 'return_pct',
+                    'dividend_yield', 'annual_dividend', 'account', 'allocation']
+
+def holdings_table(dataframes):
+    """Normalize every account's rows into one table with a row per (account, symbol)."""
     all_holdings = []
     total_portfolio_value = 0
     total_dividend_income = 0
@@ -287,7 +931,7 @@ def portfolio_analysis(dataframes):
                             allocation = 0
                     
                     
-                    if account_name == 'M1_Finance':
+                    if data.get('own_dividends'):
                         try:
                             div_yield_str = str(row[mapping['div_yield']]).replace('%', '').strip()
                             div_yield_pct = float(div_yield_str) if div_yield_str and div_yield_str != 'nan' else 0
@@ -330,6 +974,15 @@ def portfolio_analysis(dataframes):
                 print(f"Error processing row {i} in {account_name}: {str(e)}")
                 continue
 
+    return pd.DataFrame(all_holdings, columns=HOLDINGS_COLUMNS)
+
+def portfolio_analysis(dataframes):
+    print("\n=== Portfolio Analysis ===")
+    
+    # Combine all portfolios for total analysis
+    holdings = holdings_table(dataframes)
+    all_holdings = holdings.to_dict('records')
+
     # Combine duplicate stocks
     combined_holdings = {}
     for holding in all_holdings:
@@ -550,13 +1203,14 @@ def stock_analysis(ticker):
         return None
 
 def fire_calculator(retirement_age, annual_expenses, current_age, 
-                   monthly_investment, monthly_cash_savings, current_cash_savings=0, portfolio_dividend_yield=0.02):
+                   monthly_investment, monthly_cash_savings, current_cash_savings=0, portfolio_dividend_yield=0.02,
+                   withdrawal_rate=0.04):
     """Calculate FIRE (Financial Independence, Retire Early) metrics.
     Returns a dictionary containing all the calculated values."""
 
     try:
-        # Get current portfolio value from gs_reader
-        current_portfolio, _ = gs_reader()
+        # Get current portfolio value from the holdings source
+        current_portfolio, _ = read_holdings()
     except:
         # If there's an error reading the portfolio, start with 0
         current_portfolio = 0
@@ -603,14 +1257,14 @@ def fire_calculator(retirement_age, annual_expenses, current_age,
     # Project dividend income at retirement
     projected_dividend_income = future_portfolio_value * portfolio_dividend_yield
     
-    # Calculate safe withdrawal amount (4% rule)
-    safe_withdrawal_amount = future_portfolio_value * 0.04
+    # Calculate safe withdrawal amount (4% rule unless another rate is given)
+    safe_withdrawal_amount = future_portfolio_value * withdrawal_rate
     
     # Calculate total annual retirement income
     total_retirement_income = safe_withdrawal_amount + projected_dividend_income
     
     # Calculate required portfolio based on annual expenses
-    required_portfolio = annual_expenses * 25
+    required_portfolio = annual_expenses / withdrawal_rate
     
     # Calculate any shortfall
     shortfall = max(0, required_portfolio - total_future_value)
@@ -779,9 +1433,37 @@ def calculate_fair_value(ticker):
     except Exception as e:
         return None, f"Error accessing stock data: {str(e)}"
 
+# Load the snapshot at startup so the first request doesn't pay for reading it
+if HOLDINGS_SOURCE == "snapshot":
+    load_snapshot()
+
+_quote_engine = None
+_quote_engine_lock = threading.Lock()
+
+def get_quote_engine():
+    """Return the process wide live quote engine for the current holdings."""
+    global _quote_engine
+    with _quote_engine_lock:
+        if _quote_engine is None:
+            _quote_engine = QuoteEngine(lambda: holdings_table(read_holdings()[1]))
+        return _quote_engine
+
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app)
 
+@app.before_request
+def start_profile():
+    """Profile the request when ?profile= asks for it or PROFILE samples it."""
+    mode = profile_mode(request.args.get('profile'))
+    if mode:
+        g.profile = Profiler(f"flask-{request.endpoint}", mode).start()
+
+@app.teardown_request
+def stop_profile(error=None):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.stop()
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -789,26 +1471,18 @@ def home():
 @app.route('/api/portfolio')
 def get_portfolio():
     try:
-        total_equity, dataframes = gs_reader()
-        
-        # Get portfolio analysis data
-        all_holdings = []
-        for df in dataframes:
-            for i in range(1, len(df)):
-                try:
-                    row = df.iloc[i]
-                    if len(row) >= 8 and isinstance(row[0], str) and row[0].strip():
-                        equity = float(row[5].replace('$', '').replace(',', '')) if isinstance(row[5], str) else 0
-                        all_holdings.append({
-                            'symbol': row[0],
-                            'name': row[1],
-                            'equity': equity,
-                            'allocation': (equity / total_equity * 100) if total_equity > 0 else 0
-                        })
-                except (ValueError, IndexError) as e:
-                    print(f"Error processing row {i}: {str(e)}")
-                    continue
+        total_equity, dataframes = read_holdings()
         
+        # One row per symbol across the accounts
+        holdings = holdings_table(dataframes)
+        combined = holdings.groupby('symbol', sort=False).agg(name=('name', 'first'), equity=('equity', 'sum'))
+        all_holdings = [{
+            'symbol': symbol,
+            'name': row['name'],
+            'equity': float(row['equity']),
+            'allocation': float(row['equity'] / total_equity * 100) if total_equity > 0 else 0
+        } for symbol, row in combined.iterrows()]
+
         if not all_holdings:
             return jsonify({'error': 'No portfolio data could be processed'}), 500
         
@@ -825,6 +1499,46 @@ def get_portfolio():
         print(f"Error in get_portfolio: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/portfolio/stream')
+def portfolio_stream():
+    """Server-sent events: the full state first, then only the holdings whose price changed."""
+    engine = get_quote_engine()
+    subscriber = engine.subscribe()
+
+    def events():
+        try:
+            yield format_event('snapshot', engine.state())
+            while True:
+                try:
+                    event, payload = subscriber.get(timeout=15)
+                except queue.Empty:
+                    # Comment line so proxies don't close an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event, payload)
+        finally:
+            engine.unsubscribe(subscriber)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/export/<name>.<fmt>')
+def export_holdings(name, fmt):
+    """Holdings, per-symbol or per-account analytics as an Arrow IPC stream or Parquet file.
+
+    ?source= reads from another holdings source (sheets, local or snapshot).
+    """
+    if name not in EXPORT_SCHEMAS or fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Use /api/export/<{'|'.join(EXPORT_SCHEMAS)}>.<{'|'.join(EXPORT_FORMATS)}>"}), 404
+    try:
+        total_equity, dataframes = read_holdings(request.args.get('source'))
+        tables = export_tables(holdings_table(dataframes), {'total_equity': float(total_equity)})
+        return Response(serialize(tables[name], fmt).to_pybytes(), mimetype=EXPORT_FORMATS[fmt],
+                        headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'})
+    except Exception as e:
+        print(f"Error exporting {name}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/analyze_stock/<ticker>')
 def analyze_stock(ticker):
     try:
@@ -847,6 +1561,11 @@ def analyze_stock(ticker):
         print(f"Error analyzing stock {ticker}: {str(e)}")
         return jsonify({'error': f'Error analyzing stock {ticker}: {str(e)}'}), 500
 
+@app.route('/api/dividend_sources')
+def dividend_sources():
+    stats = dividend_source_stats()
+    return jsonify(stats.reset_index(names='source').to_dict('records'))
+
 @app.route('/api/calculate_fire', methods=['POST'])
 def calculate_fire():
     try:
@@ -854,21 +1573,26 @@ def calculate_fire():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
             
-        required_fields = ['retirement_age', 'desired_retirement_income', 'current_age', 
-                         'current_income', 'monthly_investment', 'monthly_cash_savings']
+        # desired_retirement_income is the older name of annual_expenses
+        if 'annual_expenses' not in data and 'desired_retirement_income' in data:
+            data['annual_expenses'] = data['desired_retirement_income']
+
+        required_fields = ['retirement_age', 'annual_expenses', 'current_age',
+                         'monthly_investment', 'monthly_cash_savings']
         
         missing_fields = [field for field in required_fields if field not in data]
         if missing_fields:
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
             
         result = fire_calculator(
-            retirement_age=data['retirement_age'],
-            desired_retirement_income=data['desired_retirement_income'],
-            current_age=data['current_age'],
-            current_income=data['current_income'],
-            monthly_investment=data['monthly_investment'],
-            monthly_cash_savings=data['monthly_cash_savings'],
-            current_cash_savings=data.get('current_cash_savings', 0)
+            retirement_age=float(data['retirement_age']),
+            annual_expenses=float(data['annual_expenses']),
+            current_age=float(data['current_age']),
+            monthly_investment=float(data['monthly_investment']),
+            monthly_cash_savings=float(data['monthly_cash_savings']),
+            current_cash_savings=float(data.get('current_cash_savings', 0)),
+            portfolio_dividend_yield=float(data.get('portfolio_dividend_yield', 0.02)),
+            withdrawal_rate=float(data.get('withdrawal_rate', 0.04))
         )
         return jsonify(result)
     except ValueError as e:
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+""" Historical backtest of a fixed allocation.
+    Takes target weights and a dates x symbols frame of adjusted closes (prices.py) and
+    computes the equity curve for buy-and-hold, calendar rebalancing or threshold
+    rebalancing. Between two rebalances the share counts are fixed, so every segment
+    is one matrix product of price relatives and weights; only the threshold search
+    steps from one rebalance to the next.
+"""
+TRADING_DAYS = 252
+BENCHMARK_SYMBOL = '^GSPC'
+
+# Pandas period for each calendar rebalancing schedule
+CALENDAR_PERIODS = {
+    'monthly': 'M',
+    'quarterly': 'Q',
+    'annually': 'Y'
+}
+
+def _calendar_starts(dates, period):
+    """Positions of the first trading day of every period after the first."""
+    periods = dates.to_period(period)
+    return np.flatnonzero(periods[1:] != periods[:-1]) + 1
+
+def _threshold_starts(prices, weights, threshold, lookahead=64):
+    """Positions where any weight has drifted more than threshold from its target.
+
+    The drift is only computed for a window after the last rebalance, which doubles
+    until the next breach is found, so the whole search stays close to one pass.
+    """
+    starts = []
+    start = 0
+    total = len(prices)
+    while start < total - 1:
+        window = lookahead
+        breach = None
+        while breach is None:
+            end = min(start + 1 + window, total)
+            holdings = weights * (prices[start + 1:end] / prices[start])
+            drift = holdings / holdings.sum(axis=1, keepdims=True) - weights
+            hits = np.flatnonzero(np.abs(drift).max(axis=1) > threshold)
+            if len(hits):
+                breach = start + 1 + hits[0]
+            elif end == total:
+                break
+            window *= 2
+        if breach is None:
+            break
+        starts.append(breach)
+        start = breach
+    return np.array(starts, dtype=int)
+
+def backtest(prices, weights, rebalance='none', threshold=0.05, initial=10000.0):
+    """Equity curve of holding weights over the dates in prices.
+
+    rebalance is 'none' (buy and hold), 'monthly', 'quarterly', 'annually' or
+    'threshold' (back to target whenever a weight drifts more than threshold, as a
+    fraction). Symbols without a price on the first date are left out and the other
+    weights rescaled. Returns (curve, rebalance_dates).
+    """
+    weights = weights[weights > 0]
+    prices = prices.sort_index().ffill()
+    symbols = [s for s in weights.index if s in prices.columns and pd.notna(prices[s].iloc[0])]
+    if not symbols:
+        raise ValueError("None of the holdings have prices at the start of the window")
+
+    values = prices[symbols].values
+    w = weights[symbols].values.astype(float)
+    w = w / w.sum()
+
+    if rebalance == 'threshold':
+        starts = _threshold_starts(values, w, threshold)
+    elif rebalance in CALENDAR_PERIODS:
+        starts = _calendar_starts(prices.index, CALENDAR_PERIODS[rebalance])
+    elif rebalance in (None, 'none'):
+        starts = np.array([], dtype=int)
+    else:
+        raise ValueError(f"Unknown rebalancing schedule {rebalance}")
+    starts = np.concatenate([[0], starts])
+
+    # Segment of every date: a rebalance day still belongs to the segment before it,
+    # the new weights apply from its close
+    positions = np.arange(len(values))
+    segment = np.clip(np.searchsorted(starts, positions, side='left') - 1, 0, None)
+    growth = (values / values[starts[segment]]) @ w
+    base = initial * np.cumprod(np.concatenate([[1.0], growth[starts[1:]]]))
+    curve = pd.Series(base[segment] * growth, index=prices.index, name='Portfolio')
+    return curve, prices.index[starts[1:]]
+
+def performance(curve):
+    """Total return, CAGR, volatility, max drawdown and Sharpe (no risk free rate) of an equity curve."""
+    curve = curve.dropna()
+    if len(curve) < 2:
+        return {'total_return': np.nan, 'cagr': np.nan, 'volatility': np.nan, 'max_drawdown': np.nan, 'sharpe': np.nan}
+    years = (curve.index[-1] - curve.index[0]).days / 365.25
+    daily = curve.pct_change().dropna()
+    volatility = daily.std() * np.sqrt(TRADING_DAYS)
+    cagr = (curve.iloc[-1] / curve.iloc[0]) ** (1 / years) - 1 if years > 0 else np.nan
+    return {
+        'total_return': curve.iloc[-1] / curve.iloc[0] - 1,
+        'cagr': cagr,
+        'volatility': volatility,
+        'max_drawdown': (curve / curve.cummax() - 1).min(),
+        'sharpe': daily.mean() * TRADING_DAYS / volatility if volatility > 0 else np.nan
+    }
+
+def benchmark_curve(prices, index, initial=10000.0, symbol=BENCHMARK_SYMBOL):
+    """The benchmark scaled to start at initial on the first date of index."""
+    if symbol not in prices.columns:
+        return pd.Series(np.nan, index=index, name=symbol)
+    benchmark = prices[symbol].reindex(index).ffill()
+    return (benchmark / benchmark.dropna().iloc[0] * initial).rename(symbol)
+
+def compare_strategies(prices, weights, strategies, initial=10000.0):
+    """performance() of several (label, rebalance, threshold) strategies as one table."""
+    rows = {}
+    for label, rebalance, threshold in strategies:
+        curve, dates = backtest(prices, weights, rebalance, threshold, initial)
+        rows[label] = {**performance(curve), 'rebalances': len(dates), 'ending_value': curve.iloc[-1]}
+    return pd.DataFrame.from_dict(rows, orient='index')
@@ -0,0 +1,166 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+""" Forward dividend calendar.
+    Dividend history for every held symbol is downloaded in one batch, each symbol's
+    payment frequency is inferred from the gaps between its ex-dates, and the next
+    payments are projected month by month for every holding at once. yfinance only has
+    ex-dates, so payments are placed in the month of the expected ex-date.
+
+    Schedules are cached per symbol until the next expected ex-date, after which the
+    history is downloaded again to pick up the new payment.
+"""
+
+# Payments per year for the typical number of days between ex-dates
+FREQUENCIES = [(45, 12), (120, 4), (240, 2), (500, 1)]
+
+_schedule_cache = {}
+_schedule_lock = threading.Lock()
+
+def infer_frequency(ex_dates):
+    """Payments per year from the median number of days between ex-dates (0 if unknown)."""
+    if len(ex_dates) < 2:
+        return 1 if len(ex_dates) == 1 else 0
+    gap = np.median(np.diff(np.asarray(ex_dates, dtype='datetime64[D]').astype(np.int64)))
+    for max_days, per_year in FREQUENCIES:
+        if gap <= max_days:
+            return per_year
+    return 0
+
+def dividend_growth(paid, frequency):
+    """Yearly growth of the trailing twelve month dividend, from the oldest to the latest full year of payments."""
+    if not frequency or len(paid) < 2:
+        return 0.0
+    dates = pd.DatetimeIndex(paid.index).tz_localize(None)
+    # Days before the latest ex-date, shifted half a period so ex-dates that drift a
+    # few days don't move a payment into the next year
+    before = (dates[-1] - dates).days.values + 365 / frequency / 2
+    # The first payment covers the period before it too
+    years = int((before[0] + 365 / frequency) // 365)
+    if years < 2:
+        return 0.0
+    totals = [paid.values[(before >= 365 * k) & (before < 365 * (k + 1))].sum() for k in (0, years - 1)]
+    if totals[0] <= 0 or totals[1] <= 0:
+        return 0.0
+    return float((totals[0] / totals[1]) ** (1 / (years - 1)) - 1)
+
+def _schedule(dividends, close):
+    """Build one symbol's schedule from its dividend and close price series."""
+    paid = dividends[dividends > 0]
+    price = close.dropna().iloc[-1] if not close.dropna().empty else np.nan
+    if paid.empty:
+        return {'frequency': 0, 'amount': 0.0, 'last_ex_date': pd.NaT,
+                'next_ex_date': pd.NaT, 'price': price, 'growth': 0.0}
+
+    frequency = infer_frequency(paid.index.values)
+    last_ex_date = pd.Timestamp(paid.index[-1]).tz_localize(None)
+    step = pd.DateOffset(months=12 // frequency) if frequency else pd.DateOffset(years=1)
+    next_ex_date = last_ex_date + step
+    today = pd.Timestamp.today().normalize()
+    # Skip payments that should already have happened but aren't in the data yet
+    while next_ex_date < today - pd.Timedelta(days=7):
+        next_ex_date += step
+
+    # A symbol that hasn't paid for two expected periods has probably stopped
+    if frequency and last_ex_date < today - 2 * pd.Timedelta(days=365 / frequency) - pd.Timedelta(days=30):
+        frequency = 0
+
+    return {
+        'frequency': frequency,
+        'amount': float(paid.iloc[-1]),
+        'last_ex_date': last_ex_date,
+        'next_ex_date': next_ex_date,
+        'price': price,
+        'growth': dividend_growth(paid, frequency)
+    }
+
+def dividend_schedules(symbols, period="5y"):
+    """Frequency, latest amount per share, last/next ex-date, price and dividend growth for every symbol.
+
+    Only symbols that aren't cached, or whose next ex-date has passed, are downloaded,
+    all in a single yf.download call.
+    """
+    symbols = sorted(set(s for s in symbols if s))
+    today = pd.Timestamp.today().normalize()
+    with _schedule_lock:
+        stale = [s for s in symbols
+                 if s not in _schedule_cache or _schedule_cache[s][1] <= today]
+
+    if stale:
+        try:
+            data = yf.download(stale, period=period, actions=True, progress=False,
+                               auto_adjust=False, group_by='column')
+        except Exception as e:
+            print(f"Error downloading dividend history: {str(e)}")
+            data = pd.DataFrame()
+
+        for symbol in stale:
+            try:
+                if isinstance(data.columns, pd.MultiIndex):
+                    dividends = data['Dividends'][symbol] if 'Dividends' in data.columns.get_level_values(0) else pd.Series(dtype=float)
+                    close = data['Close'][symbol]
+                else:
+                    dividends = data.get('Dividends', pd.Series(dtype=float))
+                    close = data['Close']
+                if close.dropna().empty:
+                    print(f"Warning: No price history for {symbol}")
+                    continue
+                schedule = _schedule(dividends.fillna(0), close)
+            except Exception as e:
+                print(f"Error building dividend schedule for {symbol}: {str(e)}")
+                continue
+
+            # Keep the schedule until the next ex-date, or a week for non payers
+            expires = schedule['next_ex_date'] if pd.notna(schedule['next_ex_date']) and schedule['frequency'] else today + pd.Timedelta(days=7)
+            with _schedule_lock:
+                _schedule_cache[symbol] = (schedule, max(expires, today + pd.Timedelta(days=1)))
+
+    with _schedule_lock:
+        rows = {s: _schedule_cache[s][0] for s in symbols if s in _schedule_cache}
+    return pd.DataFrame.from_dict(rows, orient='index',
+                                  columns=['frequency', 'amount', 'last_ex_date', 'next_ex_date', 'price', 'growth'])
+
+def dividend_calendar(holdings, months=12, schedules=None):
+    """Projected dividend cash per holding for each of the next `months` months.
+
+    holdings needs symbol, account and equity columns. Shares are estimated from equity
+    and the latest close. Returns a frame indexed by (account, symbol) with one column
+    per month.
+    """
+    if schedules is None:
+        schedules = dividend_schedules(holdings['symbol'].unique())
+
+    frame = holdings[['account', 'symbol', 'equity']].join(schedules, on='symbol')
+    frequency = frame['frequency'].fillna(0).to_numpy(dtype=int)
+    amount = frame['amount'].fillna(0).to_numpy(dtype=float)
+    price = frame['price'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(price > 0, frame['equity'].to_numpy(dtype=float) / price, 0.0)
+
+    start = pd.Timestamp.today().to_period('M')
+    month_index = pd.period_range(start, periods=months, freq='M')
+    next_ex = pd.to_datetime(frame['next_ex_date'])
+    first_month = ((next_ex.dt.year - start.year) * 12 + (next_ex.dt.month - start.month)).fillna(-1).to_numpy(dtype=int)
+
+    # Month offset of every projected payment: first payment plus a step per period
+    step = np.where(frequency > 0, 12 // np.maximum(frequency, 1), months + 1)
+    payment = first_month[:, None] + np.arange(months)[None, :] * step[:, None]
+    paid = (frequency[:, None] > 0) & (payment >= 0) & (payment < months)
+
+    schedule = np.zeros((len(frame), months))
+    rows = np.broadcast_to(np.arange(len(frame))[:, None], payment.shape)
+    cash = np.broadcast_to((shares * amount)[:, None], payment.shape)
+    np.add.at(schedule, (rows[paid], payment[paid]), cash[paid])
+
+    calendar = pd.DataFrame(schedule, columns=month_index.strftime('%Y-%m'))
+    calendar.index = pd.MultiIndex.from_frame(frame[['account', 'symbol']])
+    return calendar
+
+def monthly_income(calendar, by='account'):
+    """Sum a dividend calendar by account or symbol (or 'total'), one column per month."""
+    if by == 'total':
+        return calendar.sum(axis=0).to_frame('Total').T
+    return calendar.groupby(level=by).sum()
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from dividends import dividend_schedules
+from prices import price_history
+
+""" Per-holding dividend reinvestment projection.
+    Every holding keeps its own dividend yield, payment frequency, dividend growth and
+    price growth, taken from the cached dividend schedules and price history, instead of
+    one blended yield for the whole portfolio. The month by month DRIP recurrence
+    (shares grow by each payment over the month's price, plus new money) is solved in
+    closed form with cumulative products and sums over one holdings x months array, so
+    hundreds of holdings over 40 years take a few milliseconds.
+"""
+
+def holding_assumptions(holdings, years=5, default_price_growth=0.05, max_growth=0.15, schedules=None, prices=None):
+    """Equity, yield, payment frequency, first payment month, dividend and price growth per symbol.
+
+    Price growth is the annualized growth of the adjusted close over the last years,
+    less the current yield (adjusted closes already include the dividends). Symbols
+    with under a year of prices use default_price_growth. Growth rates are capped at
+    max_growth either way, since a few great years don't compound for decades.
+    """
+    combined = holdings.groupby('symbol', sort=False)['equity'].sum()
+    combined = combined[combined > 0]
+    symbols = list(combined.index)
+    if schedules is None:
+        schedules = dividend_schedules(symbols)
+    schedules = schedules.reindex(symbols)
+    if prices is None:
+        prices = price_history(symbols, pd.Timestamp.today() - pd.DateOffset(years=years))
+
+    frequency = schedules['frequency'].fillna(0).astype(int)
+    dividend_yield = (frequency * schedules['amount'] / schedules['price']).replace([np.inf, -np.inf], np.nan).fillna(0.0)
+
+    today = pd.Timestamp.today()
+    next_ex = pd.to_datetime(schedules['next_ex_date'])
+    first_month = ((next_ex.dt.year - today.year) * 12 + (next_ex.dt.month - today.month)).fillna(0).clip(lower=0)
+
+    price_growth = pd.Series(default_price_growth, index=symbols, dtype=float)
+    for symbol in prices.columns.intersection(symbols):
+        series = prices[symbol].dropna()
+        span = (series.index[-1] - series.index[0]).days / 365.25 if len(series) > 1 else 0
+        if span >= 1 and series.iloc[0] > 0:
+            price_growth[symbol] = (series.iloc[-1] / series.iloc[0]) ** (1 / span) - 1 - dividend_yield[symbol]
+
+    return pd.DataFrame({
+        'equity': combined,
+        'dividend_yield': dividend_yield,
+        'frequency': frequency,
+        'first_month': first_month.astype(int),
+        'dividend_growth': schedules['growth'].fillna(0.0).clip(-max_growth, max_growth),
+        'price_growth': price_growth.clip(-max_growth, max_growth)
+    }, index=pd.Index(symbols, name='symbol'))
+
+def drip_projection(equity, dividend_yield, dividend_growth, price_growth, months=480, frequency=12, first_month=0,
+                    monthly_contribution=0.0, weights=None, reinvest=True):
+    """Value and dividend income of every holding for every month, as holdings x months arrays.
+
+    Inputs are per holding (rates are yearly fractions). A holding paying frequency
+    times a year pays from first_month on; frequency 0 never pays. Dividends are paid on
+    the shares held at the start of the month and, when reinvested, buy shares at that
+    month's price, as does the holding's weight of monthly_contribution (weights default
+    to today's allocation). Returns {'value', 'income', 'contributions'}, value at the
+    end of each month and income paid in it.
+    """
+    equity = np.asarray(equity, dtype=float)
+    dividend_yield, dividend_growth, price_growth, frequency, first_month = [
+        np.broadcast_to(np.asarray(x, dtype=float), equity.shape)
+        for x in (dividend_yield, dividend_growth, price_growth, frequency, first_month)
+    ]
+    if weights is None:
+        weights = equity / equity.sum() if equity.sum() > 0 else np.full(equity.shape, 1 / max(len(equity), 1))
+    month = np.arange(months)
+
+    # Prices and dividends per unit of today's price
+    price = (1 + price_growth[:, None]) ** ((month + 1) / 12)
+    step = np.where(frequency > 0, 12 // np.maximum(frequency, 1), 1)
+    paid = (frequency[:, None] > 0) & (month >= first_month[:, None]) & ((month - first_month[:, None]) % step[:, None] == 0)
+    per_payment = np.where(frequency > 0, dividend_yield / np.maximum(frequency, 1), 0.0)
+    dividend = np.where(paid, per_payment[:, None] * (1 + dividend_growth[:, None]) ** (month / 12), 0.0)
+
+    # units[t + 1] = units[t] * growth[t] + bought[t], solved with a cumulative product and sum
+    growth = 1 + dividend / price if reinvest else np.ones_like(price)
+    bought = monthly_contribution * np.asarray(weights, dtype=float)[:, None] / price
+    compounded = np.concatenate([np.ones((len(equity), 1)), np.cumprod(growth, axis=1)], axis=1)
+    added = np.concatenate([np.zeros((len(equity), 1)), np.cumsum(bought / compounded[:, 1:], axis=1)], axis=1)
+    units = compounded * (equity[:, None] + added)
+
+    return {
+        'value': units[:, 1:] * price,
+        'income': units[:, :-1] * dividend,
+        'contributions': np.cumsum(np.broadcast_to(monthly_contribution * np.asarray(weights, dtype=float)[:, None],
+                                                   price.shape), axis=1)
+    }
+
+def project_holdings(assumptions, years=40, monthly_contribution=0.0, reinvest=True):
+    """drip_projection of holding_assumptions as DataFrames: {'value', 'income'} symbols x months."""
+    projection = drip_projection(
+        assumptions['equity'].values, assumptions['dividend_yield'].values, assumptions['dividend_growth'].values,
+        assumptions['price_growth'].values, months=int(years * 12), frequency=assumptions['frequency'].values,
+        first_month=assumptions['first_month'].values, monthly_contribution=monthly_contribution, reinvest=reinvest
+    )
+    months = pd.period_range(pd.Timestamp.today().to_period('M'), periods=int(years * 12), freq='M')
+    return {name: pd.DataFrame(projection[name], index=assumptions.index, columns=months)
+            for name in ('value', 'income')}
+
+def yearly(projection):
+    """Year end value and income paid during each year, per symbol (symbols x years from now)."""
+    years = np.arange(projection['value'].shape[1]) // 12 + 1
+    return {
+        'value': projection['value'].T.groupby(years).last().T,
+        'income': projection['income'].T.groupby(years).sum().T
+    }
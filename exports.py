@@ -0,0 +1,123 @@
+import json
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+""" Arrow IPC and Parquet exports of the holdings and their analytics.
+    The normalized holdings table (one row per account and symbol), the per-symbol
+    rollup and the per-account totals are converted straight from pandas to typed
+    Arrow tables, so notebooks and other services can load them with pandas, Polars or
+    any Arrow reader without parsing JSON. Arrow IPC streams can be read zero-copy.
+"""
+HOLDINGS_SCHEMA = pa.schema([
+    ('account', pa.dictionary(pa.int32(), pa.string())),
+    ('symbol', pa.string()),
+    ('name', pa.string()),
+    ('equity', pa.float64()),
+    ('cost', pa.float64()),
+    ('gain_loss', pa.float64()),
+    ('return_pct', pa.float64()),
+    ('dividend_yield', pa.float64()),
+    ('annual_dividend', pa.float64()),
+    ('allocation', pa.float64()),
+    ('portfolio_weight', pa.float64())
+])
+
+SYMBOLS_SCHEMA = pa.schema([
+    ('symbol', pa.string()),
+    ('name', pa.string()),
+    ('accounts', pa.int32()),
+    ('equity', pa.float64()),
+    ('cost', pa.float64()),
+    ('gain_loss', pa.float64()),
+    ('return_pct', pa.float64()),
+    ('dividend_yield', pa.float64()),
+    ('annual_dividend', pa.float64()),
+    ('portfolio_weight', pa.float64())
+])
+
+ACCOUNTS_SCHEMA = pa.schema([
+    ('account', pa.string()),
+    ('holdings', pa.int32()),
+    ('equity', pa.float64()),
+    ('cost', pa.float64()),
+    ('gain_loss', pa.float64()),
+    ('return_pct', pa.float64()),
+    ('annual_dividend', pa.float64()),
+    ('dividend_yield', pa.float64()),
+    ('portfolio_weight', pa.float64())
+])
+
+EXPORT_SCHEMAS = {
+    'holdings': HOLDINGS_SCHEMA,
+    'symbols': SYMBOLS_SCHEMA,
+    'accounts': ACCOUNTS_SCHEMA
+}
+
+# Content type for each export format
+EXPORT_FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+def _rollup(holdings, by):
+    grouped = holdings.groupby(by, sort=False)
+    rollup = grouped[['equity', 'cost', 'gain_loss', 'annual_dividend']].sum()
+    rollup['return_pct'] = (rollup['gain_loss'] / rollup['cost'].where(rollup['cost'] != 0) * 100).fillna(0.0)
+    rollup['dividend_yield'] = (rollup['annual_dividend'] / rollup['equity'].where(rollup['equity'] != 0) * 100).fillna(0.0)
+    return grouped, rollup
+
+def analytics_tables(holdings):
+    """{'holdings', 'symbols', 'accounts'} pandas frames matching EXPORT_SCHEMAS."""
+    total = holdings['equity'].sum()
+    holdings = holdings.assign(portfolio_weight=holdings['equity'] / total * 100 if total else 0.0)
+
+    grouped, symbols = _rollup(holdings, 'symbol')
+    symbols['name'] = grouped['name'].first()
+    symbols['accounts'] = grouped['account'].nunique()
+    symbols['portfolio_weight'] = symbols['equity'] / total * 100 if total else 0.0
+
+    grouped, accounts = _rollup(holdings, 'account')
+    accounts['holdings'] = grouped.size()
+    accounts['portfolio_weight'] = accounts['equity'] / total * 100 if total else 0.0
+
+    return {
+        'holdings': holdings,
+        'symbols': symbols.sort_values('equity', ascending=False).reset_index(),
+        'accounts': accounts.reset_index()
+    }
+
+def to_arrow(frame, schema, metadata=None):
+    """Typed Arrow table from a pandas frame, with metadata (JSON encoded values) on the schema."""
+    table = pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False)
+    info = {'created_at': datetime.now().isoformat(timespec='seconds')}
+    info.update({k: json.dumps(v) for k, v in (metadata or {}).items()})
+    return table.replace_schema_metadata({k.encode(): v.encode() for k, v in info.items()})
+
+def export_tables(holdings, metadata=None):
+    """Every export as a typed Arrow table, keyed like EXPORT_SCHEMAS."""
+    return {name: to_arrow(frame, EXPORT_SCHEMAS[name], metadata)
+            for name, frame in analytics_tables(holdings).items()}
+
+def serialize(table, fmt='arrow'):
+    """Arrow IPC stream or Parquet bytes of a table."""
+    sink = pa.BufferOutputStream()
+    if fmt == 'arrow':
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == 'parquet':
+        pq.write_table(table, sink)
+    else:
+        raise ValueError(f"Unknown export format {fmt}, use one of {', '.join(EXPORT_FORMATS)}")
+    return sink.getvalue()
+
+def write_exports(holdings, directory='.', fmt='parquet', metadata=None):
+    """Write every export to directory as <name>.<fmt>. Returns the paths."""
+    paths = []
+    for name, table in export_tables(holdings, metadata).items():
+        path = f"{directory.rstrip('/')}/{name}.{fmt}"
+        with open(path, 'wb') as f:
+            f.write(serialize(table, fmt))
+        paths.append(path)
+    return paths
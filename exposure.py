@@ -0,0 +1,188 @@
+import os
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+import yfinance as yf
+
+""" Sector, industry, asset class and country exposure of the holdings.
+    Each symbol's classification is fetched from yfinance once and kept in a local JSON
+    file, and only refreshed after CLASSIFICATION_MAX_AGE_DAYS. Lookups run on a small
+    thread pool and failed ones are retried after CLASSIFICATION_RETRY_SECONDS. ETF top
+    holdings are cached in the same file so ETFs can optionally be looked through to
+    their constituents. Rollups are plain groupbys on the holdings table.
+"""
+CLASSIFICATION_FILE = os.environ.get("CLASSIFICATION_FILE", "classifications.json")
+CLASSIFICATION_MAX_AGE_DAYS = 90
+# Failed lookups are kept in memory and only retried after this many seconds
+CLASSIFICATION_RETRY_SECONDS = 900
+CLASSIFICATION_WORKERS = 8
+
+# Asset class for each yfinance quoteType
+ASSET_CLASSES = {
+    'EQUITY': 'Stock',
+    'ETF': 'ETF',
+    'MUTUALFUND': 'Mutual Fund',
+    'CRYPTOCURRENCY': 'Crypto',
+    'MONEYMARKET': 'Cash',
+    'INDEX': 'Index'
+}
+
+CLASSIFICATION_FIELDS = ['sector', 'industry', 'asset_class', 'country']
+
+_index = None
+_index_lock = threading.Lock()
+# (kind, symbol) -> time of the last failed lookup
+_failed = {}
+
+def _load_index():
+    global _index
+    if _index is None:
+        try:
+            with open(CLASSIFICATION_FILE) as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {}
+        _index.setdefault('symbols', {})
+        _index.setdefault('constituents', {})
+    return _index
+
+def _save_index():
+    try:
+        with open(CLASSIFICATION_FILE, 'w') as f:
+            json.dump(_index, f, indent=2, sort_keys=True)
+    except OSError as e:
+        print(f"Error saving classifications: {str(e)}")
+
+def _is_stale(entry):
+    try:
+        fetched = date.fromisoformat(entry['fetched'])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return (date.today() - fetched).days > CLASSIFICATION_MAX_AGE_DAYS
+
+def _recently_failed(kind, symbol):
+    failed = _failed.get((kind, symbol))
+    return failed is not None and time.time() - failed < CLASSIFICATION_RETRY_SECONDS
+
+def _fetch_classification(symbol):
+    info = yf.Ticker(symbol).info or {}
+    quote_type = info.get('quoteType', '')
+    asset_class = ASSET_CLASSES.get(quote_type, quote_type.title() or 'Unknown')
+    if asset_class == 'ETF':
+        # Funds don't have a sector, their category (e.g. "Large Blend") is closer
+        sector = info.get('category') or 'Fund'
+    else:
+        sector = info.get('sector') or 'Unknown'
+    return {
+        'sector': sector,
+        'industry': info.get('industry') or 'Unknown',
+        'asset_class': asset_class,
+        'country': info.get('country') or 'Unknown',
+        'fetched': date.today().isoformat()
+    }
+
+def _fetch_constituents(symbol):
+    top = yf.Ticker(symbol).funds_data.top_holdings
+    if top is None or top.empty:
+        return {}
+    return {str(s): float(w) for s, w in top['Holding Percent'].items() if w and w > 0}
+
+def classifications(symbols):
+    """Classification (sector, industry, asset_class, country) for every symbol."""
+    symbols = sorted(set(s for s in symbols if s))
+    with _index_lock:
+        index = _load_index()
+        stale = [s for s in symbols if (s not in index['symbols'] or _is_stale(index['symbols'][s]))
+                 and not _recently_failed('symbols', s)]
+
+    def lookup(symbol):
+        try:
+            return symbol, _fetch_classification(symbol)
+        except Exception as e:
+            print(f"Error classifying {symbol}: {str(e)}")
+            _failed[('symbols', symbol)] = time.time()
+            return symbol, None
+
+    fetched = {}
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(len(stale), CLASSIFICATION_WORKERS)) as pool:
+            fetched = {symbol: entry for symbol, entry in pool.map(lookup, stale) if entry}
+
+    with _index_lock:
+        if fetched:
+            index['symbols'].update(fetched)
+            _save_index()
+        rows = {s: index['symbols'].get(s, {}) for s in symbols}
+
+    table = pd.DataFrame.from_dict(rows, orient='index').reindex(columns=CLASSIFICATION_FIELDS)
+    return table.fillna('Unknown')
+
+def constituents(symbol):
+    """Cached top holdings of a fund as {symbol: weight}, weights are fractions."""
+    with _index_lock:
+        entry = _load_index()['constituents'].get(symbol)
+    if entry and not _is_stale(entry):
+        return entry['holdings']
+    if _recently_failed('constituents', symbol):
+        return entry['holdings'] if entry else {}
+
+    try:
+        holdings = _fetch_constituents(symbol)
+    except Exception as e:
+        print(f"Error getting holdings for {symbol}: {str(e)}")
+        holdings = {}
+    if not holdings:
+        # Retried after CLASSIFICATION_RETRY_SECONDS instead of cached for 90 days
+        _failed[('constituents', symbol)] = time.time()
+        return entry['holdings'] if entry else {}
+
+    with _index_lock:
+        _index['constituents'][symbol] = {'holdings': holdings, 'fetched': date.today().isoformat()}
+        _save_index()
+    return holdings
+
+def look_through(holdings, funds=None):
+    """Split fund rows into their top constituents.
+
+    Each fund row becomes one row per top holding (its weight x the fund's equity) plus
+    a row for the rest of the fund, which keeps the fund's symbol. funds defaults to
+    every holding classified as an ETF or mutual fund.
+    """
+    if funds is None:
+        classes = classifications(holdings['symbol'].unique())['asset_class']
+        funds = classes[classes.isin(['ETF', 'Mutual Fund'])].index
+
+    rows = [holdings[~holdings['symbol'].isin(funds)]]
+    for fund in funds:
+        weights = constituents(fund)
+        fund_rows = holdings[holdings['symbol'] == fund]
+        if fund_rows.empty or not weights:
+            rows.append(fund_rows)
+            continue
+        weight = pd.Series(weights)
+        expanded = fund_rows[['account', 'equity']].merge(weight.rename('weight').rename_axis('symbol').reset_index(), how='cross')
+        expanded['equity'] = expanded['equity'] * expanded['weight']
+        rest = fund_rows[['account', 'equity']].assign(symbol=fund, equity=fund_rows['equity'] * (1 - weight.sum()))
+        rows.append(expanded[['account', 'symbol', 'equity']])
+        rows.append(rest)
+
+    return pd.concat([r[['account', 'symbol', 'equity']] for r in rows], ignore_index=True)
+
+def exposure(holdings, by=('sector',), include_funds=False):
+    """Equity and % of total by any mix of account, sector, industry, asset_class and country.
+
+    With include_funds=True, funds are looked through to their top holdings first.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    table = look_through(holdings) if include_funds else holdings[['account', 'symbol', 'equity']]
+    table = table.join(classifications(table['symbol'].unique()), on='symbol')
+    table[CLASSIFICATION_FIELDS] = table[CLASSIFICATION_FIELDS].fillna('Unknown')
+
+    rollup = table.groupby(by, as_index=False)['equity'].sum()
+    total = rollup['equity'].sum()
+    rollup['percent'] = rollup['equity'] / total * 100 if total > 0 else 0
+    return rollup.sort_values('equity', ascending=False).reset_index(drop=True)
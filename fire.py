@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+""" Year-by-year (or month-by-month) FIRE cash-flow ledger.
+    Every input can be a single value or an array, one entry per scenario. Balances are
+    stepped forward one period at a time with every scenario in the same arrays, so a
+    grid of thousands of input sets costs about as much as one. Each period records
+    contributions, growth, dividends, Social Security, pension, taxes, spending and
+    withdrawals from the current age until life expectancy.
+
+    Rules: before retirement contributions go in and dividends are reinvested. From the
+    retirement age, spending (indexed to inflation when account_for_inflation is set) is
+    paid from dividends, Social Security and pension first, then cash, then portfolio
+    withdrawals. Dividends, Social Security, pension and portfolio withdrawals are taxed
+    at tax_rate, so withdrawals are grossed up for tax. Social Security rises with
+    inflation, the pension is a fixed amount. Income that starts before retirement is
+    saved as cash.
+"""
+FIRE_DEFAULTS = {
+    'current_age': 30,
+    'retirement_age': 65,
+    'life_expectancy': 90,
+    'current_portfolio': 0.0,
+    'current_cash_savings': 0.0,
+    'annual_expenses': 40000.0,
+    'retirement_expenses_modifier': 1.0,
+    'monthly_investment': 500.0,
+    'monthly_cash_savings': 200.0,
+    'investment_return': 0.07,
+    'cash_return': 0.02,
+    'dividend_yield': 0.02,
+    'inflation_rate': 0.03,
+    'account_for_inflation': True,
+    'tax_rate': 0.15,
+    'social_security': 0.0,
+    'social_security_age': 67,
+    'pension': 0.0,
+    'pension_age': 65
+}
+
+LEDGER_COLUMNS = ['scenario', 'period', 'age', 'retired', 'contributions', 'growth', 'dividends',
+                  'cash_interest', 'social_security', 'pension', 'expenses', 'cash_withdrawal',
+                  'portfolio_withdrawal', 'taxes', 'shortfall', 'portfolio', 'cash', 'net_worth',
+                  'inflation_index', 'real_net_worth']
+
+def _inputs(scenarios):
+    """Broadcast the inputs (dict or DataFrame, defaults filled in) to float arrays."""
+    if isinstance(scenarios, pd.DataFrame):
+        scenarios = {column: scenarios[column].values for column in scenarios.columns}
+    unknown = set(scenarios) - set(FIRE_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown FIRE inputs: {', '.join(sorted(unknown))}")
+    values = {key: scenarios.get(key, default) for key, default in FIRE_DEFAULTS.items()}
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in values.values()])
+    return dict(zip(values.keys(), arrays))
+
+def _simulate(x, periods_per_year=1, record=False):
+    """Step every scenario to life expectancy.
+
+    Returns (ending real net worth, real shortfall, ages, columns); ages and columns are
+    periods x scenarios arrays and only filled in when record is set.
+    """
+    count = len(x['current_age'])
+    horizon = int(np.ceil(np.max(x['life_expectancy'] - x['current_age']) * periods_per_year))
+    if horizon <= 0:
+        raise ValueError("Life expectancy must be after the current age")
+
+    # Per period rates; the total return is split into price growth and dividends
+    total_return = (1 + x['investment_return']) ** (1 / periods_per_year) - 1
+    dividend_rate = x['dividend_yield'] / periods_per_year
+    price_growth = total_return - dividend_rate
+    cash_rate = (1 + x['cash_return']) ** (1 / periods_per_year) - 1
+    inflation = (1 + x['inflation_rate'] * x['account_for_inflation']) ** (1 / periods_per_year)
+    tax = np.clip(x['tax_rate'], 0, 0.99)
+    spending = x['annual_expenses'] * x['retirement_expenses_modifier'] / periods_per_year
+    social_security = x['social_security'] * 12 / periods_per_year
+    pension = x['pension'] * 12 / periods_per_year
+    investment = x['monthly_investment'] * 12 / periods_per_year
+    saving = x['monthly_cash_savings'] * 12 / periods_per_year
+
+    portfolio = x['current_portfolio'].copy()
+    cash = x['current_cash_savings'].copy()
+    index = np.ones(count)
+    ending = np.zeros(count)
+    unfunded = np.zeros(count)
+    names = LEDGER_COLUMNS[3:]
+    out = {name: np.full((horizon, count), np.nan) for name in names} if record else None
+    ages = np.empty((horizon, count)) if record else None
+
+    for t in range(horizon):
+        age = x['current_age'] + t / periods_per_year
+        retired = age >= x['retirement_age']
+        alive = age < x['life_expectancy']
+
+        dividends = portfolio * dividend_rate
+        growth = portfolio * price_growth
+        interest = cash * cash_rate
+        ss = np.where(age >= x['social_security_age'], social_security * index, 0.0)
+        pen = np.where(age >= x['pension_age'], pension, 0.0)
+        contributions = np.where(retired, 0.0, investment)
+        expenses = np.where(retired, spending * index, 0.0)
+
+        # Dividends and fixed income after tax cover spending first, any surplus is saved
+        income = (np.where(retired, dividends, 0.0) + ss + pen) * (1 - tax)
+        need = np.maximum(expenses - income, 0.0)
+        cash = cash + interest + np.where(retired, 0.0, saving) + np.maximum(income - expenses, 0.0)
+        cash_withdrawal = np.minimum(need, cash)
+        cash -= cash_withdrawal
+
+        available = portfolio + growth + np.where(retired, 0.0, dividends) + contributions
+        portfolio_withdrawal = np.minimum((need - cash_withdrawal) / (1 - tax), np.maximum(available, 0.0))
+        portfolio = available - portfolio_withdrawal
+        shortfall = np.maximum(need - cash_withdrawal - portfolio_withdrawal * (1 - tax), 0.0)
+
+        ending = np.where(alive, (portfolio + cash) / index, ending)
+        unfunded += np.where(alive, shortfall / index, 0.0)
+        if record:
+            ages[t] = age
+            taxes = tax * (np.where(retired, dividends, 0.0) + ss + pen + portfolio_withdrawal)
+            row = {
+                'retired': retired, 'contributions': contributions, 'growth': growth, 'dividends': dividends,
+                'cash_interest': interest, 'social_security': ss, 'pension': pen, 'expenses': expenses,
+                'cash_withdrawal': cash_withdrawal, 'portfolio_withdrawal': portfolio_withdrawal, 'taxes': taxes,
+                'shortfall': shortfall, 'portfolio': portfolio, 'cash': cash,
+                'net_worth': portfolio + cash, 'inflation_index': index, 'real_net_worth': (portfolio + cash) / index
+            }
+            for name in names:
+                out[name][t] = np.where(alive, row[name], np.nan)
+        index = index * inflation
+
+    return ending, unfunded, ages, out
+
+def fire_ledger(scenarios, periods_per_year=1):
+    """Cash-flow ledger for one or many input sets (see FIRE_DEFAULTS for the inputs).
+
+    Rates are annual fractions, social_security and pension are monthly amounts in
+    today's dollars. Returns one row per scenario and period (LEDGER_COLUMNS); amounts
+    are nominal, real_net_worth is in today's dollars.
+    """
+    _, _, ages, out = _simulate(_inputs(scenarios), periods_per_year, record=True)
+
+    alive = ~np.isnan(out['net_worth'])
+    scenario, period = np.nonzero(alive.T)
+    ledger = pd.DataFrame({'scenario': scenario, 'period': period, 'age': ages.T[alive.T]})
+    for name in LEDGER_COLUMNS[3:]:
+        ledger[name] = out[name].T[alive.T]
+    ledger['retired'] = ledger['retired'].astype(bool)
+    return ledger[LEDGER_COLUMNS]
+
+def fire_outcome(scenarios, periods_per_year=1):
+    """Net worth left at life expectancy minus any spending that couldn't be paid, in today's dollars.
+
+    Positive (or zero) means the plan is funded all the way. This is what the goal
+    seek solver inverts, it skips building the ledger.
+    """
+    ending, unfunded, _, _ = _simulate(_inputs(scenarios), periods_per_year)
+    return ending - unfunded
+
+def ledger_summary(ledger):
+    """Per scenario: net worth at retirement and at the end, and the age the money runs out (NaN if it doesn't)."""
+    grouped = ledger.groupby('scenario')
+    working = ledger[~ledger['retired']].groupby('scenario')['net_worth'].last()
+    short = ledger[ledger['shortfall'] > 0.01]
+    return pd.DataFrame({
+        'retirement_net_worth': working.combine_first(grouped['net_worth'].first()),
+        'ending_net_worth': grouped['net_worth'].last(),
+        'ending_real_net_worth': grouped['real_net_worth'].last(),
+        'total_taxes': grouped['taxes'].sum(),
+        'depletion_age': short.groupby('scenario')['age'].first()
+    }).reindex(grouped.size().index)
@@ -0,0 +1,118 @@
+import numpy as np
+
+from fire import FIRE_DEFAULTS, fire_outcome
+
+""" Goal seek for the FIRE and compound interest projections.
+    Solves for one unknown input (retirement age, monthly contribution, return, spending)
+    given everything else. Every row is a separate scenario and all rows are bisected
+    together, so each step is one forward evaluation of the whole batch: solving
+    thousands of what-if rows costs about as much as a few projections.
+"""
+
+def bisect(func, low, high, target=0.0, increasing=True, tolerance=1e-6, iterations=60):
+    """Smallest x in [low, high] with func(x) >= target (largest x if not increasing), per row.
+
+    func takes an array of x values (one per row) and returns an array. Rows where even
+    the best end of the bracket misses the target are NaN; rows that already meet it at
+    the worst end get that end.
+    """
+    low, high = np.broadcast_arrays(np.asarray(low, dtype=float), np.asarray(high, dtype=float))
+    low, high = low.copy(), high.copy()
+
+    # Check the ends of every bracket once
+    worst, best = (low.copy(), high.copy()) if increasing else (high.copy(), low.copy())
+    meets_best = func(best) >= target
+    meets_worst = func(worst) >= target
+
+    for _ in range(iterations):
+        if np.all(high - low <= tolerance):
+            break
+        middle = (low + high) / 2
+        meets = func(middle) >= target
+        if increasing:
+            high = np.where(meets, middle, high)
+            low = np.where(meets, low, middle)
+        else:
+            low = np.where(meets, middle, low)
+            high = np.where(meets, high, middle)
+
+    result = high if increasing else low
+    result = np.where(meets_worst, worst, result)
+    return np.where(meets_best, result, np.nan)
+
+# Unknowns the FIRE solver can find: (bracket, funding goes up with the value, tolerance)
+FIRE_UNKNOWNS = {
+    'retirement_age': (None, True, 1e-3),
+    'monthly_investment': ((0.0, 100000.0), True, 0.01),
+    'investment_return': ((-0.05, 0.30), True, 1e-6),
+    'annual_expenses': ((0.0, 10000000.0), False, 0.01)
+}
+
+def solve_fire(unknown, scenarios, legacy=0.0, periods_per_year=1):
+    """Value of unknown that leaves at least legacy (today's dollars) at life expectancy.
+
+    unknown is 'retirement_age' (earliest age), 'monthly_investment' (least needed),
+    'investment_return' (lowest return needed) or 'annual_expenses' (most you can spend
+    in retirement, today's dollars). scenarios takes the same inputs as fire_ledger and
+    any of them may be arrays. Returns one value per scenario, NaN if out of reach.
+    """
+    if unknown not in FIRE_UNKNOWNS:
+        raise ValueError(f"Can't solve for {unknown}, choose one of {', '.join(FIRE_UNKNOWNS)}")
+    bracket, increasing, tolerance = FIRE_UNKNOWNS[unknown]
+
+    inputs = {key: np.atleast_1d(np.asarray(scenarios.get(key, default), dtype=float))
+              for key, default in FIRE_DEFAULTS.items()}
+    inputs = dict(zip(inputs, np.broadcast_arrays(*inputs.values())))
+    if bracket is None:
+        bracket = (inputs['current_age'], inputs['life_expectancy'])
+
+    def evaluate(values):
+        return fire_outcome({**inputs, unknown: values}, periods_per_year)
+
+    result = bisect(evaluate, bracket[0], bracket[1], legacy, increasing, tolerance)
+    if unknown == 'retirement_age':
+        # Retirement only starts on a whole period, round up to it
+        periods = np.ceil((result - inputs['current_age']) * periods_per_year - 1e-9)
+        result = inputs['current_age'] + periods / periods_per_year
+    return result
+
+def compound_growth(initial, monthly_contribution, years, annual_return, dividend_yield=0.0, reinvest_dividends=True):
+    """Value after years of monthly contributions, the same monthly steps as the compound interest page.
+
+    Every month the contribution goes in, then the month's return (and the dividend
+    when reinvested) is added. Any input may be an array.
+    """
+    months = np.asarray(years, dtype=float) * 12
+    growth = (1 + np.asarray(annual_return, dtype=float) / 12)
+    growth = growth * np.where(reinvest_dividends, 1 + np.asarray(dividend_yield, dtype=float) / 12, 1.0)
+    compounded = growth ** months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(np.isclose(growth, 1), months, growth * (compounded - 1) / (growth - 1))
+    return initial * compounded + monthly_contribution * annuity
+
+# Unknowns the compound interest solver can find: (bracket, tolerance)
+COMPOUND_UNKNOWNS = {
+    'monthly_contribution': ((0.0, 1000000.0), 0.01),
+    'annual_return': ((-0.5, 1.0), 1e-6),
+    'years': ((0.0, 100.0), 1 / 12),
+    'initial': ((0.0, 1e9), 0.01)
+}
+
+def solve_compound(unknown, target_value, initial=0.0, monthly_contribution=0.0, years=10, annual_return=0.07,
+                   dividend_yield=0.0, reinvest_dividends=True):
+    """Value of unknown needed to grow to target_value (monthly_contribution, annual_return, years or initial)."""
+    if unknown not in COMPOUND_UNKNOWNS:
+        raise ValueError(f"Can't solve for {unknown}, choose one of {', '.join(COMPOUND_UNKNOWNS)}")
+    (low, high), tolerance = COMPOUND_UNKNOWNS[unknown]
+    inputs = {'initial': initial, 'monthly_contribution': monthly_contribution, 'years': years,
+              'annual_return': annual_return, 'dividend_yield': dividend_yield,
+              'reinvest_dividends': reinvest_dividends}
+    shape = np.broadcast(*[np.asarray(v) for v in inputs.values()], np.asarray(target_value)).shape
+
+    def evaluate(values):
+        return compound_growth(**{**inputs, unknown: values})
+
+    result = bisect(evaluate, np.full(shape, low), np.full(shape, high), target_value, True, tolerance)
+    if unknown == 'years':
+        result = np.ceil(result * 12 - 1e-9) / 12
+    return result
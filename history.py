@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from datetime import date
+
+import pandas as pd
+
+""" Local history of portfolio snapshots.
+    Every refresh of the holdings table is saved to a SQLite file, one snapshot per day,
+    so changes in equity, allocation and dividend income can be looked up later without
+    touching Google Sheets or yfinance. A snapshot is only written when something changed
+    since the previous one.
+"""
+HISTORY_DB = os.environ.get("PORTFOLIO_HISTORY_DB", "portfolio_history.db")
+
+# Columns of the holdings table that are kept in the history
+SNAPSHOT_COLUMNS = ['account', 'symbol', 'name', 'equity', 'cost', 'gain_loss',
+                    'dividend_yield', 'annual_dividend']
+
+_write_lock = threading.Lock()
+
+def connect(db_path=HISTORY_DB):
+    """Open the history database, creating the tables and indexes on first use."""
+    connection = sqlite3.connect(db_path)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS holdings (
+            date TEXT NOT NULL,
+            account TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            name TEXT,
+            equity REAL,
+            cost REAL,
+            gain_loss REAL,
+            dividend_yield REAL,
+            annual_dividend REAL,
+            PRIMARY KEY (date, account, symbol)
+        );
+        CREATE INDEX IF NOT EXISTS holdings_symbol_date ON holdings (symbol, date);
+        CREATE INDEX IF NOT EXISTS holdings_account_date ON holdings (account, date);
+        CREATE TABLE IF NOT EXISTS snapshots (
+            date TEXT PRIMARY KEY,
+            digest TEXT NOT NULL
+        );
+    """)
+    return connection
+
+def snapshot_digest(holdings):
+    """Hash of a holdings table that doesn't depend on row order."""
+    frame = holdings[SNAPSHOT_COLUMNS].sort_values(['account', 'symbol']).round(4)
+    return hashlib.sha1(pd.util.hash_pandas_object(frame, index=False).values.tobytes()).hexdigest()
+
+def record_snapshot(holdings, snapshot_date=None, db_path=HISTORY_DB):
+    """Save the holdings table as the snapshot for snapshot_date (today by default).
+
+    Returns True if a snapshot was written and False if nothing changed since the
+    most recent snapshot. Saving twice on the same day replaces that day's snapshot.
+    """
+    if holdings is None or holdings.empty:
+        return False
+
+    snapshot_date = (snapshot_date or date.today()).isoformat()
+    frame = holdings[SNAPSHOT_COLUMNS].copy()
+    frame = frame.groupby(['account', 'symbol'], as_index=False).agg({
+        'name': 'first', 'equity': 'sum', 'cost': 'sum', 'gain_loss': 'sum',
+        'dividend_yield': 'first', 'annual_dividend': 'sum'
+    })[SNAPSHOT_COLUMNS]
+    digest = snapshot_digest(frame)
+
+    try:
+        with _write_lock:
+            connection = connect(db_path)
+            try:
+                latest = connection.execute(
+                    "SELECT date, digest FROM snapshots WHERE date <= ? ORDER BY date DESC LIMIT 1",
+                    (snapshot_date,)
+                ).fetchone()
+                if latest and latest[1] == digest:
+                    return False
+
+                with connection:
+                    connection.execute("DELETE FROM holdings WHERE date = ?", (snapshot_date,))
+                    frame.insert(0, 'date', snapshot_date)
+                    connection.executemany(
+                        "INSERT INTO holdings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        frame.itertuples(index=False, name=None)
+                    )
+                    connection.execute(
+                        "INSERT OR REPLACE INTO snapshots (date, digest) VALUES (?, ?)",
+                        (snapshot_date, digest)
+                    )
+            finally:
+                connection.close()
+        return True
+    except Exception as e:
+        print(f"Error saving portfolio snapshot: {str(e)}")
+        return False
+
+def _date_range(start, end):
+    start = pd.Timestamp(start).date().isoformat() if start is not None else '0000-01-01'
+    end = pd.Timestamp(end).date().isoformat() if end is not None else '9999-12-31'
+    return start, end
+
+def _query(sql, params, db_path):
+    connection = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, connection, params=params, parse_dates=['date'])
+    finally:
+        connection.close()
+
+def _fill_daily(series, start, end):
+    """Forward fill a snapshot series onto every day, since unchanged days aren't stored."""
+    if series.empty:
+        return series
+    end = pd.Timestamp(end) if end is not None else series.index.max()
+    days = pd.date_range(series.index.min(), max(end, series.index.max()), freq='D')
+    series = series.reindex(days).ffill()
+    if start is not None:
+        series = series[series.index >= pd.Timestamp(start)]
+    return series
+
+def portfolio_value_series(start=None, end=None, account=None, field='equity', fill=False, db_path=HISTORY_DB):
+    """Total of a holdings column (equity by default) for each snapshot between start and end.
+
+    With fill=True the result has a value for every day, carrying the last snapshot
+    forward (including the one taken before start).
+    """
+    if field not in ('equity', 'cost', 'gain_loss', 'annual_dividend'):
+        raise ValueError(f"Unknown field {field}")
+    first, last = _date_range(start, end)
+    if fill:
+        # Start from the last snapshot before the range so the first days have a value
+        lower = "(SELECT COALESCE(MAX(date), ?) FROM snapshots WHERE date <= ?)"
+        params = [first, first, last]
+    else:
+        lower = "?"
+        params = [first, last]
+
+    sql = f"SELECT date, SUM({field}) AS value FROM holdings WHERE date >= {lower} AND date <= ?"
+    if account:
+        sql += " AND account = ?"
+        params.append(account)
+    sql += " GROUP BY date ORDER BY date"
+
+    series = _query(sql, params, db_path).set_index('date')['value']
+    return _fill_daily(series, start, end) if fill else series
+
+def symbol_series(symbol, start=None, end=None, fields=('equity', 'cost', 'gain_loss', 'annual_dividend'), db_path=HISTORY_DB):
+    """Per snapshot values of one symbol summed across accounts, indexed by date."""
+    first, last = _date_range(start, end)
+    columns = ", ".join(f"SUM({field}) AS {field}" for field in fields)
+    sql = (f"SELECT date, {columns} FROM holdings WHERE symbol = ? AND date >= ? AND date <= ? "
+           "GROUP BY date ORDER BY date")
+    return _query(sql, [symbol, first, last], db_path).set_index('date')
+
+def allocation_history(start=None, end=None, db_path=HISTORY_DB):
+    """Allocation (% of total equity) of every symbol for each snapshot, dates x symbols."""
+    first, last = _date_range(start, end)
+    frame = _query(
+        "SELECT date, symbol, SUM(equity) AS equity FROM holdings "
+        "WHERE date >= ? AND date <= ? GROUP BY date, symbol",
+        [first, last], db_path
+    )
+    if frame.empty:
+        return pd.DataFrame()
+    table = frame.pivot(index='date', columns='symbol', values='equity').fillna(0)
+    return table.div(table.sum(axis=1), axis=0) * 100
+
+def load_holdings(start=None, end=None, db_path=HISTORY_DB):
+    """Every stored holdings row between start and end."""
+    first, last = _date_range(start, end)
+    return _query(
+        "SELECT * FROM holdings WHERE date >= ? AND date <= ? ORDER BY date",
+        [first, last], db_path
+    )
+
+def holdings_on(snapshot_date, db_path=HISTORY_DB):
+    """Holdings table as of a date (the most recent snapshot on or before it)."""
+    day = pd.Timestamp(snapshot_date).date().isoformat()
+    return _query(
+        "SELECT * FROM holdings WHERE date = (SELECT MAX(date) FROM snapshots WHERE date <= ?)",
+        [day], db_path
+    )
@@ -0,0 +1,359 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+import yfinance
+from werkzeug.serving import make_server
+
+import backend
+from backend import ACCOUNT_SETTINGS
+
+""" Load test for the Flask API.
+    Starts backend.app on a local threaded server with Google Sheets and yfinance
+    replaced by in-process stand-ins that answer after a configurable latency and fail
+    at a configurable rate, then drives the API routes with concurrent clients and
+    reports throughput, p50/p95/p99 latency and error rate per route:
+
+        python loadtest.py --clients 32 --duration 30 --sheets-latency 0.2 --yf-latency 0.3
+        python loadtest.py --json > before.json
+
+    Nothing leaves the machine, so runs are repeatable and serving or caching changes
+    can be compared by the numbers.
+"""
+SYMBOLS = ['SCHD', 'VTI', 'VXUS', 'VIG', 'O', 'AAPL', 'MSFT', 'NVDA', 'TSLA', 'JNJ', 'KO', 'PEP',
+           'XOM', 'JPM', 'HD', 'PG', 'ABBV', 'AVGO', 'COST', 'MO']
+
+FIRE_REQUEST = {
+    'retirement_age': 50,
+    'annual_expenses': 60000,
+    'current_age': 30,
+    'monthly_investment': 2000,
+    'monthly_cash_savings': 500,
+    'current_cash_savings': 10000
+}
+
+# Route name: (method, path, weight). {symbol} is filled with a random held symbol
+ROUTES = {
+    'portfolio': ('GET', '/api/portfolio', 1),
+    'analyze_stock': ('GET', '/api/analyze_stock/{symbol}', 2),
+    'calculate_fire': ('POST', '/api/calculate_fire', 2)
+}
+
+class ProviderStub:
+    """Sleeps for about latency seconds and fails at error_rate, like a remote API."""
+
+    def __init__(self, name, latency=0.0, error_rate=0.0, seed=None):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * self._random.uniform(0.5, 1.5)
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise ConnectionError(f"Stubbed {self.name} error")
+
+def _field_value(field, symbol, row):
+    shares = 10 + row
+    price = 20 + 7 * (SYMBOLS.index(symbol) if symbol in SYMBOLS else row)
+    equity = shares * price
+    cost = equity * 0.85
+    return {
+        'symbol': symbol,
+        'name': f"{symbol} Inc 2%",
+        'shares': str(shares),
+        'avg_cost': f"{price * 0.85:.2f}",
+        'price': f"${price:,.2f}",
+        'equity': f"${equity:,.2f}",
+        'cost': f"${cost:,.2f}",
+        'gl': f"${equity - cost:,.2f}",
+        'gl_percent': "17.65%",
+        'allocation': "5%",
+        'annual_div': f"{equity * 0.02:.2f}",
+        'div_yield': "2%"
+    }.get(field, '')
+
+def account_grid(account, rows):
+    """Rows of cells for one account tab: optional header, holdings, then a totals row."""
+    fields = {**account['sync'], **account['mapping']}
+    fields = {field: value for field, value in fields.items() if value is not None}
+    named = any(isinstance(value, str) for value in fields.values())
+    # Named columns are laid out after the highest positional one
+    position = max([v for v in fields.values() if isinstance(v, int)], default=-1) + 1
+    columns = {}
+    for field, value in fields.items():
+        if isinstance(value, str):
+            columns[field] = position
+            position += 1
+        else:
+            columns[field] = value
+    width = max(columns.values()) + 1
+
+    grid = []
+    if named or account['header']:
+        header = [''] * width
+        for field, index in columns.items():
+            header[index] = fields[field] if isinstance(fields[field], str) else field
+        grid.append(header)
+    for row in range(rows):
+        symbol = SYMBOLS[row % len(SYMBOLS)]
+        cells = [''] * width
+        for field, index in columns.items():
+            cells[index] = _field_value(field, symbol, row)
+        grid.append(cells)
+    totals = [''] * width
+    if 'equity' in columns:
+        totals[columns['equity']] = "$100,000.00"
+    grid.append(totals)
+    return grid
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+class _Request:
+    def __init__(self, stub, result):
+        self.stub = stub
+        self.result = result
+
+    def execute(self):
+        self.stub.call()
+        return self.result()
+
+class StubValues:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def _range(self, a1, major="ROWS"):
+        tab, cells = a1.rsplit('!', 1)
+        start_col, start_row, end_col, end_row = re.match(r"([A-Z]+)(\d+):([A-Z]+)(\d+)", cells).groups()
+        start_col, end_col = _column_index(start_col), _column_index(end_col)
+        grid = self.spreadsheet.tabs[tab.strip("'")]
+        rows = [[row[c] if c < len(row) else '' for c in range(start_col, end_col + 1)]
+                for row in grid[int(start_row) - 1:int(end_row)]]
+        return [list(column) for column in zip(*rows)] if major == "COLUMNS" and rows else rows
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return _Request(self.spreadsheet.stub, lambda: {'values': self._range(range)})
+
+    def batchGet(self, spreadsheetId, ranges, majorDimension="ROWS", **kwargs):
+        return _Request(self.spreadsheet.stub,
+                        lambda: {'valueRanges': [{'values': self._range(r, majorDimension)} for r in ranges]})
+
+    def batchUpdate(self, spreadsheetId, body):
+        return _Request(self.spreadsheet.stub, lambda: {'totalUpdatedCells': sum(len(d['values']) for d in body['data'])})
+
+class StubSpreadsheet:
+    """The spreadsheets() resource of the Sheets API over in-memory tabs."""
+
+    def __init__(self, tabs, stub):
+        self.tabs = tabs
+        self.stub = stub
+
+    def values(self):
+        return StubValues(self)
+
+    def get(self, spreadsheetId, fields=None, **kwargs):
+        return _Request(self.stub, lambda: {'sheets': [
+            {'properties': {'title': title, 'gridProperties': {'rowCount': len(grid) + 100,
+                                                               'columnCount': max(len(grid[0]), 26)}}}
+            for title, grid in self.tabs.items()
+        ]})
+
+class StubSheetsClient:
+    """Stands in for backend.SheetsClient: every configured account tab filled with rows holdings."""
+
+    def __init__(self, stub, rows=20):
+        self.stub = stub
+        self.tabs = {account['tab']: account_grid(account, rows) for account in ACCOUNT_SETTINGS.values()}
+
+    def credentials(self):
+        return None
+
+    def service(self):
+        client = self
+
+        class Service:
+            def spreadsheets(self):
+                return StubSpreadsheet(client.tabs, client.stub)
+        return Service()
+
+class StubFastInfo:
+    def __init__(self, price):
+        self.last_price = price
+        self.last_dividend = price * 0.005
+        self.trailing_pe = 20.0
+
+class StubTicker:
+    """Stands in for yfinance.Ticker with the attributes the backend reads."""
+    stub = ProviderStub("yfinance")
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.price = 20.0 + 7 * (SYMBOLS.index(symbol) if symbol in SYMBOLS else len(symbol))
+
+    @property
+    def info(self):
+        self.stub.call()
+        return {'longName': f"{self.symbol} Inc", 'currentPrice': self.price, 'regularMarketPrice': self.price,
+                'fiftyTwoWeekHigh': self.price * 1.2, 'fiftyTwoWeekLow': self.price * 0.8,
+                'dividendYield': 0.02, 'trailingPE': 20.0, 'quoteType': 'EQUITY'}
+
+    @property
+    def fast_info(self):
+        self.stub.call()
+        return StubFastInfo(self.price)
+
+    def history(self, period='1y', **kwargs):
+        self.stub.call()
+        index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=252 if period != '1d' else 1)
+        dividends = np.zeros(len(index))
+        dividends[::63] = self.price * 0.005
+        return pd.DataFrame({'Close': self.price, 'Dividends': dividends}, index=index)
+
+def stub_download(tickers, start=None, end=None, period=None, **kwargs):
+    """Stands in for yfinance.download: flat prices with quarterly dividends."""
+    StubTicker.stub.call()
+    tickers = tickers.split() if isinstance(tickers, str) else list(tickers)
+    index = pd.bdate_range(start=start or pd.Timestamp.today() - pd.DateOffset(years=2),
+                           end=end or pd.Timestamp.today())
+    frames = {}
+    for symbol in tickers:
+        price = StubTicker(symbol).price
+        dividends = np.zeros(len(index))
+        dividends[::63] = price * 0.005
+        frames[('Close', symbol)] = np.full(len(index), price)
+        frames[('Adj Close', symbol)] = np.full(len(index), price)
+        frames[('Dividends', symbol)] = dividends
+    data = pd.DataFrame(frames, index=index)
+    data.columns = pd.MultiIndex.from_tuples(data.columns)
+    return data
+
+def install_stubs(sheets_latency=0.0, yf_latency=0.0, error_rate=0.0, rows=20, seed=0):
+    """Point the backend at the Sheets and yfinance stand-ins. Returns (sheets stub, yfinance stub)."""
+    sheets = ProviderStub("Sheets", sheets_latency, error_rate, seed)
+    market = ProviderStub("yfinance", yf_latency, error_rate, seed + 1)
+    StubTicker.stub = market
+    client = StubSheetsClient(sheets, rows)
+
+    yfinance.Ticker = StubTicker
+    yfinance.download = stub_download
+    backend.download = stub_download
+    backend.get_sheets_client = lambda: client
+    backend.HOLDINGS_SOURCE = "sheets"
+    return sheets, market
+
+def start_server(host="127.0.0.1", port=0):
+    """Serve backend.app from a background thread with a thread per request. Returns (server, base url)."""
+    server = make_server(host, port, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+def _client(base_url, routes, deadline, seed, results, timeout):
+    picker = random.Random(seed)
+    names = list(routes)
+    weights = [routes[name][2] for name in names]
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        name = picker.choices(names, weights)[0]
+        method, path, _ = routes[name]
+        url = base_url + path.format(symbol=picker.choice(SYMBOLS))
+        started = time.perf_counter()
+        try:
+            if method == 'POST':
+                response = session.post(url, json=FIRE_REQUEST, timeout=timeout)
+            else:
+                response = session.get(url, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = 0
+        results.append((name, started, time.perf_counter() - started, status))
+
+def run_load(base_url, clients=8, duration=10.0, warmup=1.0, routes=None, seed=0, timeout=30.0):
+    """Drive the routes with concurrent clients. Returns one row per request (route, start, seconds, status)."""
+    routes = routes or ROUTES
+    results = []
+    started = time.perf_counter()
+    deadline = started + warmup + duration
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for client in range(clients):
+            pool.submit(_client, base_url, routes, deadline, seed + client, results, timeout)
+    requests_made = pd.DataFrame(results, columns=['route', 'start', 'seconds', 'status'])
+    # Requests started during the warmup only fill caches and connection pools
+    return requests_made[requests_made['start'] >= started + warmup]
+
+def summarize(results, duration):
+    """Requests, throughput, latency percentiles (ms) and error rate per route and overall."""
+    def stats(rows):
+        seconds = rows['seconds'].values * 1000
+        return {
+            'requests': len(rows),
+            'throughput': len(rows) / duration,
+            'p50_ms': float(np.percentile(seconds, 50)) if len(rows) else np.nan,
+            'p95_ms': float(np.percentile(seconds, 95)) if len(rows) else np.nan,
+            'p99_ms': float(np.percentile(seconds, 99)) if len(rows) else np.nan,
+            'error_rate': float(((rows['status'] == 0) | (rows['status'] >= 400)).mean()) if len(rows) else np.nan
+        }
+    summary = {route: stats(rows) for route, rows in results.groupby('route')}
+    summary['all'] = stats(results)
+    return pd.DataFrame(summary).T
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Flask API against stubbed Sheets and yfinance.")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds run before measuring")
+    parser.add_argument("--sheets-latency", type=float, default=0.1, help="mean seconds per Sheets request")
+    parser.add_argument("--yf-latency", type=float, default=0.1, help="mean seconds per yfinance request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of provider requests that fail")
+    parser.add_argument("--rows", type=int, default=20, help="holdings per account tab")
+    parser.add_argument("--route", action="append", choices=list(ROUTES), help="only drive these routes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's request log and error output")
+    args = parser.parse_args()
+
+    sheets, market = install_stubs(args.sheets_latency, args.yf_latency, args.error_rate, args.rows, args.seed)
+    server, base_url = start_server()
+    routes = {name: ROUTES[name] for name in args.route} if args.route else ROUTES
+    # The backend prints every failed request, keep that out of the report unless asked
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    if not args.verbose:
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    try:
+        with quiet:
+            results = run_load(base_url, args.clients, args.duration, args.warmup, routes, args.seed)
+    finally:
+        server.shutdown()
+
+    summary = summarize(results, args.duration)
+    if args.json:
+        print(json.dumps({'config': vars(args), 'sheets_calls': sheets.calls, 'yfinance_calls': market.calls,
+                          'routes': summary.to_dict('index')}, indent=2, default=float))
+        return
+    print(f"{args.clients} clients for {args.duration:.0f}s, Sheets {args.sheets_latency * 1000:.0f}ms, "
+          f"yfinance {args.yf_latency * 1000:.0f}ms, {args.error_rate:.0%} provider errors")
+    print(summary.to_string(float_format=lambda v: f"{v:,.1f}" if v >= 1 else f"{v:.3f}"))
+    print(f"Provider calls: Sheets {sheets.calls}, yfinance {market.calls}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+""" Mean-variance optimizer for the current holdings.
+    Expected returns and covariance come from daily price history (annualized). The
+    efficient frontier is traced by solving
+        maximize  w.mu - risk_aversion / 2 * w' cov w
+        subject to sum(w) = 1, 0 <= w <= cap
+    for a few hundred risk aversion values at once with projected gradient steps, so
+    every frontier point is updated in the same matrix product. Passing the weights of a
+    previous run as warm_start makes re-solving after a small change (new cap, one more
+    symbol) take only a few iterations.
+"""
+TRADING_DAYS = 252
+
+def return_statistics(prices, shrinkage=0.1):
+    """Annualized expected returns and covariance from a dates x symbols price frame.
+
+    The covariance is shrunk toward its diagonal (shrinkage=0 keeps the sample
+    covariance), which keeps it well conditioned when there are many symbols.
+    """
+    daily = prices.sort_index().pct_change(fill_method=None).dropna(how='all')
+    daily = daily.dropna(axis=1, thresh=max(int(len(daily) * 0.5), 2))
+    mu = daily.mean() * TRADING_DAYS
+    cov = daily.cov() * TRADING_DAYS
+    cov = cov.fillna(0)
+    diagonal = np.diag(np.diag(cov.values))
+    cov = pd.DataFrame((1 - shrinkage) * cov.values + shrinkage * diagonal, index=cov.index, columns=cov.columns)
+    return mu, cov
+
+def project_capped_simplex(points, cap=1.0, iterations=40):
+    """Project each row onto {w : sum(w) = 1, 0 <= w <= cap} (bisection on the shift)."""
+    low = points.min(axis=1) - cap
+    high = points.max(axis=1)
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        total = np.clip(points - middle[:, None], 0, cap).sum(axis=1)
+        low = np.where(total > 1, middle, low)
+        high = np.where(total > 1, high, middle)
+    return np.clip(points - ((low + high) / 2)[:, None], 0, cap)
+
+def solve_batch(mu, cov, risk_aversion, cap=1.0, warm_start=None, iterations=300, tolerance=1e-6):
+    """Optimal weights (points x symbols) for every risk aversion value at once."""
+    mu = np.asarray(mu, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    risk_aversion = np.asarray(risk_aversion, dtype=float)
+    n = len(mu)
+    if cap * n < 1:
+        raise ValueError(f"A cap of {cap:.0%} can't be fully invested across {n} symbols")
+
+    largest_eigenvalue = np.linalg.eigvalsh(cov)[-1]
+    step = 1 / (risk_aversion * largest_eigenvalue + 1e-12)
+    step = np.minimum(step, 1e3)[:, None]
+
+    if warm_start is not None and np.shape(warm_start) == (len(risk_aversion), n):
+        weights = project_capped_simplex(np.asarray(warm_start, dtype=float), cap)
+    else:
+        weights = project_capped_simplex(np.full((len(risk_aversion), n), 1 / n), cap)
+
+    # Accelerated projected gradient (FISTA) on all points together. Points stop being
+    # updated once their weights stop moving, and the momentum restarts whenever it
+    # points uphill, which keeps the batch from oscillating.
+    momentum = weights.copy()
+    t = np.ones(len(risk_aversion))
+    active = np.arange(len(risk_aversion))
+    for _ in range(iterations):
+        y = momentum[active]
+        gradient = mu[None, :] - risk_aversion[active, None] * (y @ cov)
+        updated = project_capped_simplex(y + step[active] * gradient, cap)
+        previous = weights[active]
+
+        restart = ((y - updated) * (updated - previous)).sum(axis=1) > 0
+        t_next = (1 + np.sqrt(1 + 4 * t[active] ** 2)) / 2
+        beta = np.where(restart, 0.0, (t[active] - 1) / t_next)
+        t[active] = np.where(restart, 1.0, t_next)
+
+        weights[active] = updated
+        momentum[active] = updated + beta[:, None] * (updated - previous)
+        moving = np.abs(updated - previous).max(axis=1) >= tolerance
+        active = active[moving]
+        if not len(active):
+            break
+    return weights
+
+def efficient_frontier(mu, cov, points=200, cap=1.0, risk_free_rate=0.0, warm_start=None):
+    """Trace the long-only efficient frontier.
+
+    Returns (frontier, weights): frontier has risk, return and sharpe per point and
+    weights is a points x symbols frame. The minimum variance point is the last one
+    and the maximum Sharpe point is frontier['sharpe'].idxmax().
+    """
+    symbols = list(mu.index)
+    mu_values = mu.values
+    cov_values = cov.loc[symbols, symbols].values
+    risk_aversion = np.logspace(-1, 4, points)
+
+    weights = solve_batch(mu_values, cov_values, risk_aversion, cap=cap, warm_start=warm_start)
+    expected = weights @ mu_values
+    risk = np.sqrt(np.einsum('ij,jk,ik->i', weights, cov_values, weights))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(risk > 0, (expected - risk_free_rate) / risk, np.nan)
+
+    frontier = pd.DataFrame({'risk_aversion': risk_aversion, 'risk': risk,
+                             'return': expected, 'sharpe': sharpe})
+    return frontier, pd.DataFrame(weights, columns=symbols)
+
+def portfolio_point(weights, mu, cov):
+    """Risk and expected return of a weights Series (aligned to mu's symbols)."""
+    w = weights.reindex(mu.index).fillna(0).values
+    w = w / w.sum() if w.sum() > 0 else w
+    return float(np.sqrt(w @ cov.loc[mu.index, mu.index].values @ w)), float(w @ mu.values)
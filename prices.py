@@ -0,0 +1,145 @@
+import os
+import json
+import threading
+
+import pandas as pd
+import yfinance as yf
+
+from quotes import fetch_quotes
+
+""" Local cache of daily adjusted close prices.
+    Prices are kept in one dates x symbols Parquet file. A request only downloads the
+    symbols that aren't cached yet (from the requested start) and the days since the
+    cache was last updated, both in a single yf.download call each. Updates overlap the
+    cache by a day, and symbols whose close on that day changed (a split or dividend
+    since) have their cached history rescaled to the new adjustment. The cache is only
+    caught up once a full business day has passed, so its last row is the previous
+    session's close (or older): fine for returns and backtests, but current prices
+    come from latest_prices.
+"""
+PRICE_CACHE_FILE = os.environ.get("PRICE_CACHE_FILE", "price_cache.parquet")
+# Relative difference between a cached and a fresh close that means the history was re-adjusted
+ADJUSTMENT_TOLERANCE = 1e-4
+
+_prices = None
+# Earliest start date each symbol has been downloaded from, so young symbols aren't refetched
+_requested_from = None
+_prices_lock = threading.Lock()
+
+def _load_cache():
+    global _prices, _requested_from
+    if _requested_from is None:
+        try:
+            with open(PRICE_CACHE_FILE + ".json") as f:
+                _requested_from = {s: pd.Timestamp(d) for s, d in json.load(f).items()}
+        except (OSError, ValueError):
+            _requested_from = {}
+    if _prices is None:
+        if os.path.exists(PRICE_CACHE_FILE):
+            try:
+                _prices = pd.read_parquet(PRICE_CACHE_FILE)
+            except Exception as e:
+                print(f"Error reading price cache: {str(e)}")
+                _prices = pd.DataFrame()
+        else:
+            _prices = pd.DataFrame()
+    return _prices
+
+def _download(symbols, start):
+    """Adjusted closes for symbols from start, dates x symbols."""
+    data = yf.download(list(symbols), start=start, auto_adjust=True, progress=False, group_by='column')
+    if data.empty:
+        return pd.DataFrame()
+    close = data['Close']
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbols[0])
+    close.index = pd.to_datetime(close.index).tz_localize(None).normalize()
+    return close.dropna(how='all')
+
+def _readjust(prices, new, day):
+    """Rescale cached closes to the adjustment of a fresh download that overlaps them on day.
+
+    Yahoo re-adjusts every past close after a split or dividend. Those events all come
+    after the cached history, so the whole column is off by one factor: the ratio of
+    the fresh close on day to the cached one.
+    """
+    if day not in new.index:
+        return prices
+    ratio = (new.loc[day] / prices.loc[day].reindex(new.columns)).dropna()
+    ratio = ratio[(ratio - 1).abs() > ADJUSTMENT_TOLERANCE]
+    if ratio.empty:
+        return prices
+    prices = prices.copy()
+    prices[ratio.index] = prices[ratio.index] * ratio
+    return prices
+
+def price_history(symbols, start, end=None):
+    """Daily adjusted close prices for symbols between start and end (dates x symbols).
+
+    The last row can lag today by a session or more, use latest_prices for current prices.
+    """
+    global _prices
+    symbols = sorted(set(s for s in symbols if s))
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize() if end is not None else pd.Timestamp.today().normalize()
+
+    with _prices_lock:
+        prices = _load_cache()
+        changed = False
+
+        # Symbols that aren't cached, or aren't cached back to start
+        missing = [s for s in symbols if s not in prices.columns
+                   or _requested_from.get(s, pd.Timestamp.max) > start]
+        if missing:
+            try:
+                new = _download(missing, start)
+                prices = new.combine_first(prices) if not prices.empty else new
+                changed = not new.empty
+                for symbol in missing:
+                    _requested_from[symbol] = min(start, _requested_from.get(symbol, start))
+            except Exception as e:
+                print(f"Error downloading prices: {str(e)}")
+
+        # Catch up on the days since the last update
+        if not prices.empty:
+            last = prices.index.max()
+            cached = [s for s in symbols if s in prices.columns and s not in missing]
+            if cached and last < end - pd.tseries.offsets.BDay(1):
+                try:
+                    # From the last cached day on, so its close can be compared with the cached one
+                    new = _download(cached, last)
+                    if not new.empty:
+                        prices = _readjust(prices, new, last)
+                        prices = new.combine_first(prices)
+                        changed = True
+                except Exception as e:
+                    print(f"Error updating prices: {str(e)}")
+
+        if changed:
+            prices = prices.sort_index()
+            try:
+                prices.to_parquet(PRICE_CACHE_FILE)
+                with open(PRICE_CACHE_FILE + ".json", "w") as f:
+                    json.dump({s: d.date().isoformat() for s, d in _requested_from.items()}, f)
+            except Exception as e:
+                print(f"Error saving price cache: {str(e)}")
+            _prices = prices
+
+    available = [s for s in symbols if s in prices.columns]
+    return prices.loc[(prices.index >= start) & (prices.index <= end), available]
+
+def latest_prices(symbols, history=None):
+    """Current price of every symbol from one quote download, as a Series.
+
+    Symbols without a quote (delisted, or the download failed) fall back to their
+    last close in history (dates x symbols) when it is given.
+    """
+    symbols = sorted(set(s for s in symbols if s))
+    try:
+        quotes = fetch_quotes(symbols)
+    except Exception as e:
+        print(f"Error fetching quotes: {str(e)}")
+        quotes = pd.Series(dtype=float)
+    if history is not None and not history.empty:
+        quotes = quotes.combine_first(history.ffill().iloc[-1])
+    return quotes.reindex(symbols).rename('price')
@@ -0,0 +1,159 @@
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+""" On-demand profiling of one Streamlit rerun or Flask request.
+    A profiled run is wrapped in a stack sampler (or cProfile) plus tracemalloc and
+    writes to PROFILE_DIR:
+
+        <time>-<name>.folded     sampled stacks in the collapsed format read by
+                                 flamegraph.pl, speedscope and inferno
+        <time>-<name>.prof       cProfile stats (PROFILE=cprofile), for pstats or snakeviz
+        <time>-<name>.alloc.txt  peak traced memory and the top allocation sites
+
+    Runs are profiled when asked for (?profile=1 on a Flask request or the Streamlit
+    page, or the sidebar toggle), or for a PROFILE_SAMPLE_RATE share of all runs when
+    the PROFILE environment variable names a profiler. When off, the only cost is
+    checking the flag. One run is profiled at a time; overlapping runs are skipped
+    since tracemalloc is process wide.
+"""
+PROFILE_MODE = os.environ.get("PROFILE", "").lower()
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "1.0"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+PROFILE_TOP_ALLOCATIONS = int(os.environ.get("PROFILE_TOP_ALLOCATIONS", "25"))
+
+PROFILERS = ['sample', 'cprofile']
+
+_active = threading.Lock()
+
+def profile_mode(requested=None):
+    """Profiler for this run: the requested one, else PROFILE's for a sampled share of runs, else None."""
+    if requested:
+        requested = str(requested).lower()
+        if requested in PROFILERS:
+            return requested
+        if requested in ('1', 'true', 'yes', 'on'):
+            return PROFILE_MODE if PROFILE_MODE in PROFILERS else 'sample'
+    if PROFILE_MODE in PROFILERS and random.random() < PROFILE_SAMPLE_RATE:
+        return PROFILE_MODE
+    return None
+
+class StackSampler:
+    """Samples one thread's Python stack every interval seconds and counts identical stacks."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        """Collapsed stacks, one "outer;...;inner count" line per distinct stack."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class Profiler:
+    """Profile the calling thread between start() and stop(), or as a with block."""
+
+    def __init__(self, name, mode='sample', directory=PROFILE_DIR, top=PROFILE_TOP_ALLOCATIONS):
+        self.name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'run'
+        self.mode = mode
+        self.directory = directory
+        self.top = top
+        self.paths = []
+        self._profiler = None
+        self._tracing = False
+        self._started = None
+
+    def start(self):
+        if not _active.acquire(blocking=False):
+            # Another run is being profiled, its tracemalloc data would mix with this one
+            self.mode = None
+            return self
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(threading.get_ident())
+            self._profiler.start()
+        return self
+
+    def stop(self):
+        """Stop profiling and write the output files. Returns their paths."""
+        if self.mode is None or self._started is None:
+            return []
+        try:
+            if self.mode == 'cprofile':
+                self._profiler.disable()
+            else:
+                self._profiler.stop()
+            elapsed = time.perf_counter() - self._started
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if self._tracing:
+                tracemalloc.stop()
+
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{self.name}")
+            if self.mode == 'cprofile':
+                self._profiler.dump_stats(base + ".prof")
+                self.paths.append(base + ".prof")
+            else:
+                with open(base + ".folded", "w") as f:
+                    f.write(self._profiler.folded())
+                self.paths.append(base + ".folded")
+
+            # Leave out the profiler's own allocations
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                               tracemalloc.Filter(False, __file__)])
+            with open(base + ".alloc.txt", "w") as f:
+                f.write(f"{self.name}: {elapsed:.3f}s, peak traced memory {peak / 1024 / 1024:.1f} MiB, "
+                        f"{current / 1024 / 1024:.1f} MiB still allocated\n\n")
+                for stat in snapshot.statistics('lineno')[:self.top]:
+                    frame = stat.traceback[0]
+                    f.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}\n")
+            self.paths.append(base + ".alloc.txt")
+        except Exception as e:
+            print(f"Error writing profile {self.name}: {str(e)}")
+        finally:
+            self._started = None
+            _active.release()
+        return self.paths
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
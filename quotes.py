@@ -0,0 +1,201 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, time as clock
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+""" Live quote engine.
+    A background thread polls the latest price of every held symbol in one yf.download
+    call per interval, only while the US market is open. Each tick is compared with the
+    previous one and only the holdings whose price moved are pushed to subscribers
+    (the Flask SSE endpoint and the Streamlit live view), with their new equity and
+    gain/loss, so clients get near-live values without re-sending the whole portfolio.
+"""
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_OPEN = clock(9, 30)
+MARKET_CLOSE = clock(16, 0)
+
+def market_open(now=None):
+    """True on weekdays between the regular session open and close (holidays aren't known)."""
+    now = (now or datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+def fetch_quotes(symbols):
+    """Latest one minute close of every symbol from a single download, as a Series."""
+    if not symbols:
+        return pd.Series(dtype=float)
+    data = yf.download(list(symbols), period='1d', interval='1m', progress=False, group_by='column', auto_adjust=False)
+    if data.empty:
+        return pd.Series(dtype=float)
+    close = data['Close']
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbols[0])
+    return close.ffill().iloc[-1].dropna().astype(float)
+
+def format_event(event, payload):
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+class QuoteEngine:
+    """Polls quotes for the held symbols and broadcasts what changed.
+
+    load_holdings returns the holdings table (account, symbol, equity, cost and
+    optionally price). Share counts are taken from it the first time a holding is
+    priced, so the first tick matches the sheet and later ticks move with the price.
+    Reloads keep those share counts while a holding's equity in the table stays the
+    same, and refit them when it changes (a trade) or the table has its own prices.
+    """
+
+    def __init__(self, load_holdings, interval=15, holdings_ttl=900, tolerance=1e-4, fetch=fetch_quotes):
+        self.load_holdings = load_holdings
+        self.interval = interval
+        self.holdings_ttl = holdings_ttl
+        self.tolerance = tolerance
+        self.fetch = fetch
+        self._holdings = None
+        self._holdings_loaded = 0
+        self._prices = pd.Series(dtype=float)
+        self._updated = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quote-engine", daemon=True)
+                self._thread.start()
+        return self
+
+    def subscribe(self, maxsize=100):
+        """Queue of (event, payload) tuples for one client. Starts the engine if needed."""
+        subscriber = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        self.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _publish(self, event, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, payload))
+            except queue.Full:
+                # A slow client missed deltas, replace its backlog with the full state
+                while not subscriber.empty():
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        break
+                subscriber.put_nowait(('snapshot', self.state()))
+
+    def _refresh_holdings(self, now):
+        holdings = self.load_holdings().reset_index(drop=True)
+        holdings['shares'] = np.nan
+        if 'price' in holdings:
+            priced = holdings['price'] > 0
+            holdings.loc[priced, 'shares'] = holdings.loc[priced, 'equity'] / holdings.loc[priced, 'price']
+        # The equity the share count is fitted from, to tell a trade from a stale price
+        holdings['sheet_equity'] = holdings['equity']
+        with self._lock:
+            previous = self._holdings
+        if previous is not None:
+            # Without a price in the table the sheet's equity is at an older price, so holdings
+            # already priced keep their share counts instead of being refit to the latest quote,
+            # unless their sheet equity changed (shares bought or sold since the last load)
+            before = previous.groupby(['account', 'symbol'])[['shares', 'sheet_equity']].first()
+            before = before.reindex(pd.MultiIndex.from_frame(holdings[['account', 'symbol']]))
+            unchanged = np.abs(before['sheet_equity'].to_numpy() - holdings['sheet_equity'].to_numpy()) <= 0.005
+            kept = np.where(unchanged, before['shares'].to_numpy(), np.nan)
+            holdings['shares'] = holdings['shares'].fillna(pd.Series(kept, index=holdings.index))
+        holdings['price'] = holdings['symbol'].map(self._prices)
+        # New holdings without a price in the table: the sheet's equity is taken to be at the last quote
+        known = holdings['shares'].isna() & holdings['price'].notna()
+        holdings.loc[known, 'shares'] = holdings.loc[known, 'equity'] / holdings.loc[known, 'price']
+        holdings.loc[holdings['shares'].notna() & holdings['price'].notna(), 'equity'] = holdings['shares'] * holdings['price']
+        with self._lock:
+            self._holdings = holdings[['account', 'symbol', 'shares', 'price', 'equity', 'cost',
+                                       'sheet_equity']].reset_index(drop=True)
+            self._holdings_loaded = now
+        if previous is not None:
+            # Holdings may have been added, removed or changed cost, clients get the whole state again
+            self._publish('snapshot', self.state())
+
+    def _rows(self, holdings):
+        gl = holdings['equity'] - holdings['cost']
+        return [{
+            'account': row.account,
+            'symbol': row.symbol,
+            'price': None if pd.isna(row.price) else round(float(row.price), 4),
+            'equity': round(float(row.equity), 2),
+            'gl': round(float(g), 2),
+            'gl_percent': round(float(g / row.cost * 100), 2) if row.cost > 0 else 0.0
+        } for row, g in zip(holdings.itertuples(), gl)]
+
+    def _totals(self, holdings):
+        return {
+            'total_equity': round(float(holdings['equity'].sum()), 2),
+            'total_gl': round(float((holdings['equity'] - holdings['cost']).sum()), 2)
+        }
+
+    def state(self):
+        """Every holding with its latest price, equity and gain/loss."""
+        with self._lock:
+            holdings = self._holdings
+            updated = self._updated
+        if holdings is None:
+            return {'time': None, 'market_open': market_open(), 'holdings': [], 'total_equity': 0.0, 'total_gl': 0.0}
+        return {'time': updated, 'market_open': market_open(), 'holdings': self._rows(holdings), **self._totals(holdings)}
+
+    def tick(self, now=None):
+        """Fetch quotes once and publish the holdings whose price changed. Returns the number of changed symbols."""
+        now = now or datetime.now(MARKET_TIMEZONE).timestamp()
+        if self._holdings is None or now - self._holdings_loaded > self.holdings_ttl:
+            self._refresh_holdings(now)
+        holdings = self._holdings
+        symbols = sorted(holdings['symbol'].unique())
+
+        prices = self.fetch(symbols)
+        previous = self._prices.reindex(prices.index)
+        changed = prices[~(np.abs(prices - previous) <= self.tolerance * previous.abs())]
+        if changed.empty:
+            return 0
+
+        holdings = holdings.copy()
+        moved = holdings['symbol'].isin(changed.index)
+        new_price = holdings['symbol'].map(changed)
+        # Symbols priced for the first time keep the sheet's equity and fix the share count
+        first = moved & holdings['shares'].isna()
+        holdings.loc[first, 'shares'] = holdings.loc[first, 'equity'] / new_price[first]
+        holdings.loc[moved, 'price'] = new_price[moved]
+        holdings.loc[moved, 'equity'] = holdings.loc[moved, 'shares'] * new_price[moved]
+
+        stamp = datetime.fromtimestamp(now, MARKET_TIMEZONE).isoformat(timespec='seconds')
+        with self._lock:
+            self._prices = pd.concat([self._prices.drop(changed.index, errors='ignore'), changed])
+            self._holdings = holdings
+            self._updated = stamp
+        self._publish('quotes', {'time': stamp, 'holdings': self._rows(holdings[moved]), **self._totals(holdings)})
+        return len(changed)
+
+    def _run(self):
+        seeded = False
+        while True:
+            try:
+                # Price everything once at start so there is a state outside market hours too
+                if market_open() or not seeded:
+                    self.tick()
+                    seeded = True
+            except Exception as e:
+                print(f"Error updating quotes: {str(e)}")
+            time.sleep(self.interval)
@@ -0,0 +1,88 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from alerts import check_alerts, notify
+from backend import HOLDINGS_SOURCE, read_holdings, pipelined_reader, holdings_table, calculate_fair_value
+from history import record_snapshot
+from prices import latest_prices, price_history
+from snapshot import SNAPSHOT_FILE, write_snapshot
+
+""" Headless refresh of the portfolio snapshot.
+    Reads every account, resolves dividends, prices, betas and fair values in bulk and
+    writes one snapshot file for the app and the API to serve. Meant to run from cron,
+    for example every 30 minutes on weekdays:
+
+        */30 * * * 1-5 cd /path/to/Portfolio-Analysis && python refresh.py
+"""
+MARKET_SYMBOL = '^GSPC'
+
+def bulk_betas(symbols, start):
+    """Beta of every symbol against the S&P 500 from one price download. Returns (betas, prices)."""
+    prices = price_history(list(symbols) + [MARKET_SYMBOL], start)
+    if MARKET_SYMBOL not in prices.columns:
+        return pd.Series(np.nan, index=symbols), prices
+    returns = prices.pct_change(fill_method=None)
+    covariance = returns.cov()[MARKET_SYMBOL]
+    return (covariance / returns[MARKET_SYMBOL].var()).reindex(symbols), prices
+
+def bulk_fair_values(symbols, workers=8):
+    """Fair value and valuation ratio for every symbol, looked up concurrently."""
+    def lookup(symbol):
+        result, error = calculate_fair_value(symbol)
+        if error or not result:
+            return symbol, np.nan, np.nan
+        return symbol, result['fair_value'], result['valuation_ratio']
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(lookup, symbols))
+    return pd.DataFrame(rows, columns=['symbol', 'fair_value', 'valuation_ratio']).set_index('symbol')
+
+def build_snapshot(source="sheets", fair_values=True, workers=8):
+    """Read and enrich the holdings table. Returns (holdings, metadata)."""
+    if source == "sheets":
+        # Dividend lookups start while the other tabs are still being read
+        total_equity, dataframes, holdings = pipelined_reader()
+    else:
+        total_equity, dataframes = read_holdings(source)
+        holdings = holdings_table(dataframes)
+    symbols = sorted(holdings['symbol'].unique())
+
+    betas, prices = bulk_betas(symbols, pd.Timestamp.today() - pd.DateOffset(years=1))
+    holdings['price'] = holdings['symbol'].map(latest_prices(symbols, prices))
+    holdings['beta'] = holdings['symbol'].map(betas)
+
+    if fair_values:
+        values = bulk_fair_values(symbols, workers)
+        holdings = holdings.join(values, on='symbol')
+    else:
+        holdings['fair_value'] = np.nan
+        holdings['valuation_ratio'] = np.nan
+
+    metadata = {'total_equity': total_equity, 'accounts': list(dataframes.keys())}
+    return holdings, metadata
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the portfolio snapshot for the app and API.")
+    parser.add_argument("--output", default=SNAPSHOT_FILE, help="snapshot file to write")
+    parser.add_argument("--source", choices=["sheets", "local"],
+                        default="local" if HOLDINGS_SOURCE == "local" else "sheets",
+                        help="where to read the holdings from")
+    parser.add_argument("--skip-fair-value", action="store_true", help="don't look up fair values")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent fair value lookups")
+    args = parser.parse_args()
+
+    started = time.time()
+    holdings, metadata = build_snapshot(args.source, fair_values=not args.skip_fair_value, workers=args.workers)
+    write_snapshot(holdings, args.output, metadata)
+    record_snapshot(holdings)
+    # The year of closes was just downloaded for the betas, so this read hits the price cache
+    symbols = sorted(holdings['symbol'].unique())
+    notify(check_alerts(holdings, price_history(symbols, pd.Timestamp.today() - pd.DateOffset(years=1))))
+    print(f"Wrote {len(holdings)} holdings to {args.output} in {time.time() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
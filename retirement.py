@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+""" Historical rolling-window retirement test (Trinity study style).
+    Every start year of a long annual series of stock returns, bond returns and
+    inflation is replayed through the retirement phase for each withdrawal strategy.
+    All windows x strategies are one batch of rows and the years are stepped together,
+    so adding strategies or windows only makes the arrays longer.
+
+    The series is kept in MARKET_HISTORY_FILE (columns year, stock_return, bond_return,
+    inflation as fractions). When the file is missing it is built from Robert Shiller's
+    monthly S&P 500, dividend, CPI and 10 year Treasury data, which goes back to 1871.
+"""
+MARKET_HISTORY_FILE = os.environ.get("MARKET_HISTORY_FILE", "market_history.csv")
+SHILLER_DATA_URL = "http://www.econ.yale.edu/~shiller/data/ie_data.xls"
+
+# Withdrawal strategies compared on the FIRE page
+DEFAULT_STRATEGIES = [
+    {'name': 'Fixed 4%', 'rule': 'fixed', 'rate': 0.04},
+    {'name': 'Constant 4%', 'rule': 'percent', 'rate': 0.04},
+    {'name': 'Guardrails', 'rule': 'guardrails', 'rate': 0.05, 'band': 0.2, 'adjustment': 0.1}
+]
+
+RULES = ['fixed', 'percent', 'guardrails']
+
+def _bond_returns(yields):
+    """Total return of a 10 year par bond bought at each year's yield and sold a year later."""
+    bought, sold = yields[:-1], yields[1:]
+    # A 10 year bond is a 9 year bond after one year, priced at the new yield
+    price = np.where(sold > 0, bought / sold * (1 - (1 + sold) ** -9) + (1 + sold) ** -9, 1.0)
+    return np.concatenate([price + bought - 1, [np.nan]])
+
+def _download_shiller():
+    monthly = pd.read_excel(SHILLER_DATA_URL, sheet_name='Data', skiprows=7, usecols=[0, 1, 2, 4, 6],
+                            names=['date', 'price', 'dividend', 'cpi', 'gs10'])
+    monthly = monthly.dropna(subset=['date', 'price', 'cpi'])
+    monthly['year'] = monthly['date'].astype(float).astype(int)
+    monthly['month'] = ((monthly['date'].astype(float) - monthly['year']) * 100).round().astype(int)
+
+    # Total return index with the annual dividend paid out evenly over the months
+    monthly['total'] = ((monthly['price'] + monthly['dividend'].fillna(0) / 12) / monthly['price'].shift(1)).fillna(1).cumprod()
+    january = monthly[monthly['month'] == 1].set_index('year')
+
+    history = pd.DataFrame({
+        'stock_return': january['total'].shift(-1) / january['total'] - 1,
+        'bond_return': _bond_returns(january['gs10'].values / 100),
+        'inflation': january['cpi'].shift(-1) / january['cpi'] - 1
+    })
+    return history.dropna().rename_axis('year').reset_index()
+
+def market_history(path=MARKET_HISTORY_FILE):
+    """Annual stock return, bond return and inflation by year, from the cache file or downloaded."""
+    if os.path.exists(path):
+        history = pd.read_csv(path)
+    else:
+        try:
+            history = _download_shiller()
+        except Exception as e:
+            raise ValueError(f"No market history available, add {path} (year, stock_return, bond_return, inflation): {str(e)}")
+        try:
+            history.to_csv(path, index=False)
+        except OSError as e:
+            print(f"Error saving market history: {str(e)}")
+    return history.sort_values('year').set_index('year')[['stock_return', 'bond_return', 'inflation']]
+
+def retirement_windows(history, years=30, initial=1000000.0, stock_allocation=0.6, strategies=None):
+    """Replay every start year for every strategy.
+
+    Strategies are dicts with a name and a rule: 'fixed' withdraws rate x initial every
+    year, raised with inflation; 'percent' withdraws rate x the current balance;
+    'guardrails' starts at rate x initial, raised with inflation, and cuts (raises) it
+    by adjustment whenever the current withdrawal rate is more than band above (below)
+    the starting rate. Withdrawals are taken at the start of each year. All amounts are
+    in start-year dollars. Returns one row per strategy and start year.
+    """
+    strategies = strategies or DEFAULT_STRATEGIES
+    if len(history) < years:
+        raise ValueError(f"Market history covers {len(history)} years, fewer than the {years} year retirement")
+
+    # Real portfolio returns for every window: windows x years
+    nominal = stock_allocation * history['stock_return'].values + (1 - stock_allocation) * history['bond_return'].values
+    real = (1 + nominal) / (1 + history['inflation'].values) - 1
+    starts = history.index.values[:len(history) - years + 1]
+    windows = np.lib.stride_tricks.sliding_window_view(real, years)
+
+    # One row per strategy x window
+    count = len(strategies)
+    returns = np.tile(windows, (count, 1))
+    rule = np.repeat([RULES.index(s['rule']) for s in strategies], len(starts))
+    rate = np.repeat([s['rate'] for s in strategies], len(starts))
+    band = np.repeat([s.get('band', 0.2) for s in strategies], len(starts))
+    adjustment = np.repeat([s.get('adjustment', 0.1) for s in strategies], len(starts))
+
+    balance = np.full(len(rule), float(initial))
+    spending = rate * initial
+    withdrawals = np.zeros((len(rule), years))
+    failed_year = np.full(len(rule), -1)
+    for year in range(years):
+        current_rate = np.divide(spending, balance, out=np.full_like(balance, np.inf), where=balance > 0)
+        cut = (rule == 2) & (current_rate > rate * (1 + band))
+        raise_ = (rule == 2) & (current_rate < rate * (1 - band))
+        spending = np.where(cut, spending * (1 - adjustment), np.where(raise_, spending * (1 + adjustment), spending))
+        wanted = np.where(rule == 1, rate * balance, spending)
+
+        paid = np.minimum(wanted, balance)
+        failed_year = np.where((failed_year < 0) & (paid < wanted - 1e-6), year, failed_year)
+        withdrawals[:, year] = paid
+        balance = (balance - paid) * (1 + returns[:, year])
+
+    return pd.DataFrame({
+        'strategy': np.repeat([s['name'] for s in strategies], len(starts)),
+        'start_year': np.tile(starts, count),
+        'terminal_value': balance,
+        'success': failed_year < 0,
+        'years_funded': np.where(failed_year < 0, years, failed_year),
+        'lowest_withdrawal': withdrawals.min(axis=1),
+        'average_withdrawal': withdrawals.mean(axis=1)
+    })
+
+def strategy_summary(windows):
+    """Success rate, terminal values and withdrawals per strategy."""
+    grouped = windows.groupby('strategy', sort=False)
+    return pd.DataFrame({
+        'success_rate': grouped['success'].mean(),
+        'worst_terminal_value': grouped['terminal_value'].min(),
+        'median_terminal_value': grouped['terminal_value'].median(),
+        'worst_start_year': windows.loc[grouped['terminal_value'].idxmin(), ['strategy', 'start_year']].set_index('strategy')['start_year'],
+        'lowest_withdrawal': grouped['lowest_withdrawal'].min(),
+        'average_withdrawal': grouped['average_withdrawal'].mean()
+    })
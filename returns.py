@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+""" Time weighted (TWR) and money weighted (XIRR) returns.
+    Both work on a dates x series matrix of market values and a matching matrix of
+    external cash flows (money put in is positive, money taken out is negative), so
+    every symbol, account or the whole portfolio is computed in the same pass.
+
+    The snapshot history has no transaction log, so flows_from_history() infers the
+    flows from changes in cost basis: a higher cost basis is a purchase at cost and a
+    lower one is a sale of that fraction of the position at its last market value.
+"""
+
+def flows_from_history(values, costs):
+    """Infer external cash flows from the change in cost basis between snapshots."""
+    values = values.fillna(0)
+    costs = costs.fillna(0)
+    previous_value = values.shift(1).fillna(0)
+    previous_cost = costs.shift(1).fillna(0)
+    change = costs - previous_cost
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_ratio = np.where(previous_cost > 0, previous_value / previous_cost, 1.0)
+    flows = np.where(change >= 0, change, change * price_ratio)
+    flows = pd.DataFrame(flows, index=values.index, columns=values.columns)
+
+    # Returns are measured from the first snapshot, so the opening flow is its market value
+    flows.iloc[0] = values.iloc[0]
+    return flows
+
+def time_weighted_returns(values, flows):
+    """Cumulative and annualized TWR of every column.
+
+    Flows are treated as happening at the start of the period they're recorded in,
+    so each period's return is value / (previous value + flow) - 1.
+    """
+    v = values.fillna(0).to_numpy(dtype=float)
+    f = flows.fillna(0).to_numpy(dtype=float)
+    previous = np.vstack([np.zeros((1, v.shape[1])), v[:-1]])
+    invested = previous + f
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        period = np.where(invested > 0, v / invested - 1, 0.0)
+    growth = np.prod(1 + period, axis=0)
+
+    # Annualize over the time each column actually held money
+    held = (v > 0) | (invested > 0)
+    dates = values.index.values.astype('datetime64[D]').astype(np.int64)
+    first = np.where(held.any(axis=0), dates[held.argmax(axis=0)], dates[0])
+    years = (dates[-1] - first) / 365.25
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        annualized = np.where(years > 0, growth ** (1 / np.where(years > 0, years, 1)) - 1, np.nan)
+
+    return pd.DataFrame({'twr': growth - 1, 'twr_annualized': annualized}, index=values.columns)
+
+def xirr(amounts, dates, guess=0.1, tolerance=1e-9, max_iterations=100):
+    """Solve XIRR for every row of an (series x dates) array of cash flows at once.
+
+    Uses Newton's method on all rows together and falls back to bisection for rows
+    where Newton leaves the valid range. Rows without both a positive and a negative
+    flow have no solution and return NaN.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    amounts = np.nan_to_num(amounts)
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    years = (days - days[0]) / 365.0
+
+    def npv(rates, flows):
+        return (flows * (1 + rates[:, None]) ** -years).sum(axis=1)
+
+    def npv_derivative(rates, flows):
+        return (-years * flows * (1 + rates[:, None]) ** (-years - 1)).sum(axis=1)
+
+    solvable = (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)
+    rates = np.full(amounts.shape[0], guess)
+    done = ~solvable
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iterations):
+            active = ~done
+            if not active.any():
+                break
+            value = npv(rates[active], amounts[active])
+            slope = npv_derivative(rates[active], amounts[active])
+            step = np.where(slope != 0, value / slope, 0.0)
+            updated = rates[active] - step
+            # Keep rates above -100%, bisection picks these up below
+            updated = np.where(np.isfinite(updated) & (updated > -0.9999), updated, np.nan)
+            rates[active] = updated
+            done[active] = (np.abs(step) < tolerance) | np.isnan(updated)
+
+        # Bisection for anything Newton couldn't solve
+        residual = np.abs(npv(np.nan_to_num(rates), amounts))
+        failed = solvable & (~np.isfinite(rates) | (residual > 1e-6 * np.abs(amounts).sum(axis=1)))
+        if failed.any():
+            low = np.full(failed.sum(), -0.9999)
+            high = np.full(failed.sum(), 10.0)
+            subset = amounts[failed]
+            low_value = npv(low, subset)
+            for _ in range(100):
+                middle = (low + high) / 2
+                value = npv(middle, subset)
+                same_sign = np.sign(value) == np.sign(low_value)
+                low = np.where(same_sign, middle, low)
+                low_value = np.where(same_sign, value, low_value)
+                high = np.where(same_sign, high, middle)
+            rates[failed] = (low + high) / 2
+
+    rates[~solvable] = np.nan
+    return rates
+
+def money_weighted_returns(values, flows):
+    """Annual XIRR of every column, treating the last market value as a final withdrawal."""
+    amounts = -flows.fillna(0).to_numpy(dtype=float)
+    amounts[-1] += values.fillna(0).to_numpy(dtype=float)[-1]
+    rates = xirr(amounts.T, values.index.values)
+    return pd.Series(rates, index=values.columns, name='mwr')
+
+def history_returns(history, by='symbol'):
+    """TWR and MWR from a history frame (date, account, symbol, equity, cost).
+
+    by is 'symbol', 'account' or 'portfolio'. Flows are inferred per (account, symbol)
+    before they are added up, so moving money between holdings isn't a contribution.
+    """
+    if history.empty:
+        return pd.DataFrame(columns=['twr', 'twr_annualized', 'mwr'])
+
+    keys = history['account'] + '|' + history['symbol']
+    frame = history.assign(key=keys)
+    values = frame.pivot_table(index='date', columns='key', values='equity', aggfunc='sum').sort_index().fillna(0)
+    costs = frame.pivot_table(index='date', columns='key', values='cost', aggfunc='sum').reindex_like(values).fillna(0)
+    flows = flows_from_history(values, costs)
+
+    if by == 'portfolio':
+        groups = pd.Index(['Portfolio'] * len(values.columns))
+    elif by == 'account':
+        groups = pd.Index([key.split('|', 1)[0] for key in values.columns])
+    elif by == 'symbol':
+        groups = pd.Index([key.split('|', 1)[1] for key in values.columns])
+    else:
+        raise ValueError(f"Unknown grouping {by}")
+
+    values = values.T.groupby(groups).sum().T
+    flows = flows.T.groupby(groups).sum().T
+
+    result = time_weighted_returns(values, flows)
+    result['mwr'] = money_weighted_returns(values, flows)
+    return result
@@ -0,0 +1,66 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+import pyarrow as pa
+
+""" Precomputed portfolio snapshot.
+    refresh.py writes the enriched holdings table (dividends, prices, betas and fair
+    values) to one Arrow IPC file. The app and the Flask API read it with a memory map,
+    so serving never has to wait for Google Sheets or yfinance. The file is reloaded
+    when it changes on disk.
+"""
+SNAPSHOT_FILE = os.environ.get("PORTFOLIO_SNAPSHOT", "portfolio_snapshot.arrow")
+
+# Bump when the columns of the snapshot change, older files are ignored
+SNAPSHOT_VERSION = 1
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def write_snapshot(holdings, path=SNAPSHOT_FILE, metadata=None):
+    """Write the holdings table to path, replacing the old file in one step."""
+    table = pa.Table.from_pandas(holdings, preserve_index=False)
+    info = {'version': str(SNAPSHOT_VERSION), 'created_at': datetime.now().isoformat(timespec='seconds')}
+    info.update({k: json.dumps(v) for k, v in (metadata or {}).items()})
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **{k.encode(): v.encode() for k, v in info.items()}})
+
+    temp_path = f"{path}.tmp"
+    with pa.OSFile(temp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+    return path
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """Return (holdings, metadata) from the snapshot file, or (None, None) if there isn't a usable one."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1], cached[2]
+
+    try:
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        raw = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+        if raw.get('version') != str(SNAPSHOT_VERSION):
+            print(f"Warning: Snapshot {path} has version {raw.get('version')}, expected {SNAPSHOT_VERSION}")
+            return None, None
+        metadata = {'version': SNAPSHOT_VERSION, 'created_at': raw.get('created_at')}
+        for key, value in raw.items():
+            if key not in ('version', 'created_at', 'pandas'):
+                metadata[key] = json.loads(value)
+        holdings = table.to_pandas()
+    except Exception as e:
+        print(f"Error reading snapshot {path}: {str(e)}")
+        return None, None
+
+    with _loaded_lock:
+        _loaded[path] = ((stat.st_mtime_ns, stat.st_size), holdings, metadata)
+    return holdings, metadata
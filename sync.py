@@ -0,0 +1,222 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backend import (ACCOUNT_SETTINGS, SHEETS_WORKERS, get_sheets_client, sheets_pool, sheet_dimensions,
+                     read_sheet_columns, column_letter, to_number, get_dividend_info)
+from prices import latest_prices, price_history
+
+""" Write live prices and the columns derived from them back to the Google Sheet.
+    Every account tab is read once (raw values), prices are fetched in one download and
+    dividend yields from the cache, and share price, equity, cost, gain/loss, % gain/loss,
+    allocation (and annual dividend and yield for tabs that have them) are recomputed
+    for every row. Only the cells whose value changed are sent, in one
+    values.batchUpdate per spreadsheet. Run it from cron next to refresh.py:
+
+        */30 * * * 1-5 cd /path/to/Portfolio-Analysis && python sync.py
+"""
+# Columns written by the sync and how close a value has to be to count as unchanged
+WRITE_TOLERANCES = {
+    'price': 0.0001,
+    'equity': 0.005,
+    'cost': 0.005,
+    'gl': 0.005,
+    'gl_percent': 0.000001,
+    'allocation': 0.000001,
+    'annual_div': 0.005,
+    'div_yield': 0.000001
+}
+
+def _column_indices(sheet, spreadsheet_id, account, column_count):
+    """{field: column index} for the account's mapping and sync columns, header names looked up once."""
+    columns = {**account['sync'], **account['mapping']}
+    columns = {field: value for field, value in columns.items() if value is not None}
+    if any(isinstance(value, str) for value in columns.values()):
+        header = sheet.values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{account['tab']}!A1:{column_letter(column_count - 1)}1"
+        ).execute().get("values", [[]])
+        header = [str(h).strip() for h in (header[0] if header else [])]
+        for field, value in list(columns.items()):
+            if isinstance(value, str):
+                if value in header:
+                    columns[field] = header.index(value)
+                else:
+                    del columns[field]
+    return columns
+
+def derived_columns(table, prices, yields, own_dividends=False):
+    """New values for every written column of one tab.
+
+    table has one numeric column per field (symbol as text). Its last row is the totals
+    row, as in holdings_table. Rows without a price keep their current values.
+    """
+    updated = pd.DataFrame(index=table.index)
+    symbols = table['symbol'].fillna('').astype(str).str.strip()
+    rows = table.index[:-1]
+    rows = rows[symbols[rows] != '']
+
+    price = symbols[rows].map(prices)
+    priced = rows[price.notna().values]
+    shares = table.loc[priced, 'shares']
+    price = price[priced]
+
+    updated.loc[priced, 'price'] = price
+    updated.loc[priced, 'equity'] = shares * price
+    if 'avg_cost' in table:
+        updated.loc[priced, 'cost'] = shares * table.loc[priced, 'avg_cost']
+    equity = updated['equity'].combine_first(table['equity'])[rows]
+    if 'cost' in table:
+        # Without an average cost column the sheet's cost is kept as it is
+        cost = (updated['cost'].combine_first(table['cost']) if 'cost' in updated else table['cost'])[rows]
+    else:
+        cost = pd.Series(np.nan, index=rows)
+
+    updated.loc[rows, 'gl'] = equity - cost
+    updated.loc[rows, 'gl_percent'] = np.where(cost > 0, (equity - cost) / cost.where(cost > 0), 0.0)
+    total = equity.sum()
+    updated.loc[rows, 'allocation'] = equity / total if total > 0 else 0.0
+    if own_dividends:
+        dividend_yield = symbols[rows].map(yields).fillna(0.0)
+        updated.loc[rows, 'div_yield'] = dividend_yield
+        updated.loc[rows, 'annual_div'] = equity * dividend_yield
+
+    last = table.index[-1]
+    updated.loc[last, 'equity'] = total
+    updated.loc[last, 'cost'] = cost.sum()
+    updated.loc[last, 'gl'] = total - cost.sum()
+    updated.loc[last, 'gl_percent'] = (total - cost.sum()) / cost.sum() if cost.sum() > 0 else 0.0
+    if own_dividends:
+        updated.loc[last, 'annual_div'] = updated.loc[rows, 'annual_div'].sum()
+        updated.loc[last, 'div_yield'] = updated.loc[last, 'annual_div'] / total if total > 0 else 0.0
+    return updated
+
+def changed_ranges(tab, table, updated, columns):
+    """batchUpdate data entries for the cells that changed, consecutive rows merged into one range.
+
+    table and updated are indexed by sheet row number.
+    """
+    data = []
+    for field, tolerance in WRITE_TOLERANCES.items():
+        if field not in updated or field not in columns:
+            continue
+        new = updated[field]
+        current = table[field] if field in table else pd.Series(np.nan, index=table.index)
+        changed = new.notna() & ~(np.abs(new - current) <= tolerance)
+        rows = changed.index[changed.values].values
+        if not len(rows):
+            continue
+        letter = column_letter(columns[field])
+        # Split the changed rows into runs of consecutive rows
+        for run in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+            data.append({
+                'range': f"{tab}!{letter}{run[0]}:{letter}{run[-1]}",
+                'values': [[round(float(v), 6)] for v in new.loc[run]]
+            })
+    return data
+
+def read_tab(sheet, spreadsheet_id, account, dimensions):
+    """Raw values of every column the sync needs, indexed by sheet row. Returns (table, {field: column index})."""
+    columns = _column_indices(sheet, spreadsheet_id, account, dimensions[1])
+    if 'symbol' not in columns or 'shares' not in columns:
+        raise ValueError(f"{account['name']} needs symbol and shares columns to be synced")
+    header = account['header'] or any(isinstance(v, str) for v in account['mapping'].values())
+    raw = read_sheet_columns(sheet, spreadsheet_id, account['tab'], columns, dimensions,
+                             header=header, value_render="UNFORMATTED_VALUE")
+    if raw.empty:
+        return pd.DataFrame(), columns
+
+    table = pd.DataFrame({field: raw[index] if index in raw else None for field, index in columns.items()})
+    table.index = table.index + (2 if header else 1)
+    for field in table.columns:
+        if field not in ('symbol', 'name'):
+            table[field] = table[field].map(lambda value: to_number(value) if pd.notna(value) and str(value).strip() else np.nan)
+
+    # Drop the blank rows after the last filled one
+    blank = table.isna() | (table.astype(str).apply(lambda c: c.str.strip()) == '')
+    filled = ~blank.all(axis=1)
+    return table.loc[:filled[filled].index.max()] if filled.any() else table.iloc[:0], columns
+
+def read_spreadsheet_tabs(spreadsheet_id, accounts):
+    """{account name: (table, columns)} for the account tabs of one spreadsheet."""
+    sheet = get_sheets_client().service().spreadsheets()
+    dimensions = sheet_dimensions(sheet, spreadsheet_id)
+    tabs = {}
+    for account in accounts:
+        if account['tab'] not in dimensions:
+            print(f"Warning: Sheet {account['tab']} not found in spreadsheet")
+            continue
+        try:
+            table, columns = read_tab(sheet, spreadsheet_id, account, dimensions[account['tab']])
+            if not table.empty:
+                tabs[account['name']] = (table, columns)
+        except Exception as e:
+            print(f"Error reading sheet {account['tab']}: {str(e)}")
+    return tabs
+
+def write_spreadsheet(spreadsheet_id, accounts, tabs, prices, yields, dry_run=False):
+    """Recompute the account tabs of one spreadsheet and write the changes in one request. Returns cells changed."""
+    data = []
+    for account in accounts:
+        if account['name'] not in tabs:
+            continue
+        table, columns = tabs[account['name']]
+        try:
+            updated = derived_columns(table, prices, yields, account['own_dividends'])
+            data.extend(changed_ranges(account['tab'], table, updated, columns))
+        except Exception as e:
+            print(f"Error syncing sheet {account['tab']}: {str(e)}")
+
+    cells = sum(len(entry['values']) for entry in data)
+    if data and not dry_run:
+        get_sheets_client().service().spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'valueInputOption': 'RAW', 'data': data}
+        ).execute()
+    return cells
+
+def sync(accounts=None, dry_run=False):
+    """Sync every account, one batchUpdate per spreadsheet. Returns {spreadsheet id: cells changed}."""
+    accounts = list(ACCOUNT_SETTINGS.values()) if accounts is None else accounts
+    spreadsheets = {}
+    for account in accounts:
+        spreadsheets.setdefault(account['spreadsheet_id'], []).append(account)
+
+    # Sign in once before the reads start so only one login flow can run
+    get_sheets_client().credentials()
+    tabs = dict(zip(spreadsheets, sheets_pool.map(lambda item: read_spreadsheet_tabs(*item), spreadsheets.items())))
+
+    # Prices and yields for every symbol in one go
+    symbols = sorted(set(
+        str(symbol).strip()
+        for spreadsheet in tabs.values() for table, _ in spreadsheet.values()
+        for symbol in table['symbol'].dropna() if str(symbol).strip()
+    ))
+    # Current quotes, the cached closes only fill in symbols without one
+    history = price_history(symbols, pd.Timestamp.today() - pd.DateOffset(days=10))
+    prices = latest_prices(symbols, history).dropna()
+    with ThreadPoolExecutor(max_workers=SHEETS_WORKERS) as pool:
+        yields = pd.Series(dict(zip(symbols, pool.map(get_dividend_info, symbols))), dtype=float)
+
+    counts = sheets_pool.map(lambda item: write_spreadsheet(item[0], item[1], tabs[item[0]], prices, yields, dry_run),
+                             spreadsheets.items())
+    return dict(zip(spreadsheets, counts))
+
+def main():
+    parser = argparse.ArgumentParser(description="Write live prices and derived columns back to the Google Sheet.")
+    parser.add_argument("--account", action="append", choices=list(ACCOUNT_SETTINGS), help="only sync these accounts")
+    parser.add_argument("--dry-run", action="store_true", help="count the changed cells without writing them")
+    args = parser.parse_args()
+
+    started = time.time()
+    accounts = [ACCOUNT_SETTINGS[name] for name in args.account] if args.account else None
+    counts = sync(accounts, dry_run=args.dry_run)
+    for spreadsheet_id, cells in counts.items():
+        print(f"{spreadsheet_id}: {cells} cells {'would change' if args.dry_run else 'updated'}")
+    print(f"Done in {time.time() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
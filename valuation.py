@@ -0,0 +1,54 @@
+import numpy as np
+
+""" Sensitivity of the fair value estimate to its inputs.
+    calculate_fair_value gives one number from one EPS growth rate and one PEG ratio,
+    both noisy. fair_value_grid reuses the fundamentals it already fetched and evaluates
+    the same formula, Fair Value = (P/E / PEG) x (EPS Growth + Dividend Yield), over a
+    grid of growth rates and PEG multiples in one broadcast, without any network calls.
+"""
+PERCENTILES = [5, 25, 50, 75, 95]
+
+def growth_range(result, size=100):
+    """Default EPS growth axis (percent): from no growth to twice the estimate, at least 0-30%."""
+    return np.linspace(0.0, max(30.0, 2 * result['eps_growth']), size)
+
+def multiple_range(result, size=100):
+    """Default PEG axis: 0.5 to 3, widened to take in the estimate's own PEG."""
+    peg = result['peg_ratio']
+    return np.linspace(min(0.5, peg / 2), max(3.0, peg * 1.5), size)
+
+def implied_growth(result):
+    """EPS growth (percent) at which the point estimate's formula gives the current price.
+
+    The point estimate uses PEG = P/E / growth, so its fair value is growth x (growth +
+    yield) and the implied growth is the positive root of that quadratic.
+    """
+    dividend_yield = result['dividend_yield']
+    return (-dividend_yield + np.sqrt(dividend_yield ** 2 + 4 * result['current_price'])) / 2
+
+def fair_value_grid(result, growth=None, multiples=None):
+    """Fair value over every (PEG multiple, growth) pair, plus its percentiles.
+
+    result is what calculate_fair_value returns. growth (percent) and multiples (PEG
+    ratios) default to growth_range and multiple_range. Returns a dict with the matrix
+    (multiples x growth, NaN where the value isn't positive), both axes, the percentiles
+    of the grid, the share of the grid above the current price, the implied growth and
+    the growth each PEG needs to justify the current price.
+    """
+    growth = growth_range(result) if growth is None else np.asarray(growth, dtype=float)
+    multiples = multiple_range(result) if multiples is None else np.asarray(multiples, dtype=float)
+    price = result['current_price']
+
+    values = result['pe_ratio'] / multiples[:, None] * (growth[None, :] + result['dividend_yield'])
+    values = np.where(values > 0, values, np.nan)
+    valid = values[~np.isnan(values)]
+
+    return {
+        'values': values,
+        'growth': growth,
+        'multiples': multiples,
+        'percentiles': dict(zip(PERCENTILES, np.percentile(valid, PERCENTILES))) if valid.size else {},
+        'undervalued_share': float((valid > price).mean()) if valid.size else 0.0,
+        'implied_growth': float(implied_growth(result)),
+        'implied_growth_by_multiple': price * multiples / result['pe_ratio'] - result['dividend_yield']
+    }
@@ -0,0 +1,142 @@
+from bisect import bisect_left, insort
+
+import pandas as pd
+
+""" What-if trades on the cached holdings.
+    Proposed buys and sells (in dollars, at today's price) are applied as deltas to a
+    per-symbol copy of the holdings table. Portfolio totals are kept as running sums and
+    the rankings behind the top/bottom lists as sorted lists, so applying or undoing a
+    trade only touches the traded symbol: no re-read of the sheet, no price or dividend
+    lookups and no pass over the whole portfolio.
+"""
+RANKINGS = ['return_pct', 'equity', 'dividend_yield']
+
+class WhatIf:
+    """Holdings combined by symbol with trades applied on top.
+
+    Buys add to equity and cost at today's price. Sells take equity out and cost and
+    gain/loss with it in proportion (average cost), and can't sell more than is held.
+    A symbol's dividend yield stays what it was; bought symbols that aren't held use the
+    trade's dividend_yield (percent), 0 without one.
+    """
+
+    def __init__(self, holdings):
+        combined = holdings.groupby('symbol', sort=False).agg(
+            name=('name', 'first'), equity=('equity', 'sum'), cost=('cost', 'sum'),
+            gain_loss=('gain_loss', 'sum'), annual_dividend=('annual_dividend', 'sum')
+        )
+        self.rows = {}
+        for symbol, row in combined.iterrows():
+            self.rows[symbol] = self._row(row['name'], row['equity'], row['cost'], row['gain_loss'],
+                                          row['annual_dividend'] / row['equity'] * 100 if row['equity'] else 0.0)
+        self.totals = {field: float(combined[field].sum()) for field in ['equity', 'cost', 'gain_loss', 'annual_dividend']}
+        self.baseline = dict(self.totals)
+        self.base_allocation = {symbol: row['equity'] for symbol, row in self.rows.items()}
+        self._rankings = {field: sorted((row[field], symbol) for symbol, row in self.rows.items() if row['equity'] > 0)
+                          for field in RANKINGS}
+        # (trade, symbol, row before the trade) for every applied trade, in order
+        self.applied = []
+
+    @staticmethod
+    def _row(name, equity, cost, gain_loss, dividend_yield):
+        return {
+            'name': name,
+            'equity': float(equity),
+            'cost': float(cost),
+            'gain_loss': float(gain_loss),
+            'return_pct': float(gain_loss / cost * 100) if cost else 0.0,
+            'dividend_yield': float(dividend_yield),
+            'annual_dividend': float(equity * dividend_yield / 100)
+        }
+
+    def _replace(self, symbol, new):
+        """Swap one symbol's row, updating the totals and rankings by the difference."""
+        old = self.rows.get(symbol)
+        for field in self.totals:
+            self.totals[field] += (new[field] if new else 0.0) - (old[field] if old else 0.0)
+        for field, ranking in self._rankings.items():
+            if old and old['equity'] > 0:
+                del ranking[bisect_left(ranking, (old[field], symbol))]
+            if new and new['equity'] > 0:
+                insort(ranking, (new[field], symbol))
+        if new is None:
+            del self.rows[symbol]
+        else:
+            self.rows[symbol] = new
+
+    def apply(self, trade):
+        """Apply {'symbol', 'amount' (dollars, negative to sell), 'dividend_yield' (optional, %)}."""
+        symbol = str(trade['symbol']).strip().upper()
+        amount = float(trade['amount'])
+        old = self.rows.get(symbol)
+        if old is None:
+            old = self._row(trade.get('name') or symbol, 0.0, 0.0, 0.0, trade.get('dividend_yield') or 0.0)
+
+        if amount >= 0:
+            new = self._row(old['name'], old['equity'] + amount, old['cost'] + amount, old['gain_loss'],
+                            old['dividend_yield'])
+        elif old['equity'] > 0:
+            kept = 1 - min(-amount, old['equity']) / old['equity']
+            new = self._row(old['name'], old['equity'] * kept, old['cost'] * kept, old['gain_loss'] * kept,
+                            old['dividend_yield'])
+        else:
+            # Nothing held to sell, the row stays as it is
+            new = dict(old)
+
+        self.applied.append((trade, symbol, self.rows.get(symbol)))
+        self._replace(symbol, new)
+
+    def undo(self):
+        """Take back the last applied trade."""
+        trade, symbol, previous = self.applied.pop()
+        self._replace(symbol, previous)
+        return trade
+
+    def set_trades(self, trades):
+        """Make the applied trades equal to trades, undoing and applying only from the first difference."""
+        common = 0
+        while common < min(len(trades), len(self.applied)) and self.applied[common][0] == trades[common]:
+            common += 1
+        while len(self.applied) > common:
+            self.undo()
+        for trade in trades[common:]:
+            self.apply(trade)
+
+    @staticmethod
+    def _summarize(totals):
+        return {
+            'total_equity': totals['equity'],
+            'total_cost': totals['cost'],
+            'gain_loss': totals['gain_loss'],
+            'return_pct': totals['gain_loss'] / totals['cost'] * 100 if totals['cost'] else 0.0,
+            'annual_dividend': totals['annual_dividend'],
+            'dividend_yield': totals['annual_dividend'] / totals['equity'] * 100 if totals['equity'] else 0.0
+        }
+
+    def summary(self):
+        """Portfolio totals with the trades applied."""
+        return self._summarize(self.totals)
+
+    def baseline_summary(self):
+        """Portfolio totals before any trade."""
+        return self._summarize(self.baseline)
+
+    def ranked(self, field, count=5, largest=True):
+        """The count symbols with the largest (smallest) field, as a DataFrame."""
+        ranking = self._rankings[field]
+        picked = ranking[-count:][::-1] if largest else ranking[:count]
+        return self.table([symbol for _, symbol in picked])
+
+    def table(self, symbols=None):
+        """Rows for the given symbols (all held by default) with their allocation before and after."""
+        symbols = list(self.rows) if symbols is None else symbols
+        total = self.totals['equity']
+        base_total = self.baseline['equity']
+        frame = pd.DataFrame([{'symbol': symbol, **self.rows[symbol]} for symbol in symbols],
+                             columns=['symbol', 'name', 'equity', 'cost', 'gain_loss', 'return_pct',
+                                      'dividend_yield', 'annual_dividend'])
+        frame['allocation'] = frame['equity'] / total * 100 if total else 0.0
+        frame['allocation_change'] = frame['allocation'] - (
+            frame['symbol'].map(self.base_allocation).fillna(0.0) / base_total * 100 if base_total else 0.0
+        )
+        return frame